@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+
+class DocumentArchive:
+    """
+    Content-addressed on-disk store of downloaded PDF bytes.
+
+    Each document is stored once under its SHA-256, sharded by the first two bytes of
+    the digest (`ab/cd/abcd....pdf`), so identical documents published under several
+    URLs or feeds share one file. Writes go through a temporary file and a rename, so a
+    reader never sees a partial document.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.pdf")
+
+    def put(self, data: bytes) -> str:
+        """Stores `data` if it is not archived yet and returns its digest."""
+        digest = self.digest(data)
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Returns the archived bytes, or None if the document is not in the archive."""
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
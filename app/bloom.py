@@ -0,0 +1,97 @@
+import hashlib
+import math
+import os
+import struct
+from typing import Iterable, Optional
+
+
+class BloomFilter:
+    """
+    A compact, file-backed Bloom filter used as a fast path for link deduplication.
+
+    A negative answer is definitive (the link was never added), while a positive
+    answer may be a false positive and must be confirmed against the database.
+    """
+
+    _MAGIC = b'BLM1'
+    # magic, number of bits, number of hashes, capacity, item count, id watermark
+    _HEADER = struct.Struct('>4sQIQQQ')
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(int(capacity), 1024)
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+
+        self.capacity = capacity
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = 0
+        # Highest all_links.id folded into the filter, used for incremental catch-up
+        self.watermark = 0
+        self.bits = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('>QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """Adds an item. Returns True if the item was not already present."""
+        added = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    @property
+    def is_saturated(self) -> bool:
+        return self.count > self.capacity
+
+    def save(self, path: str):
+        """Atomically writes the filter to disk."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._HEADER.pack(
+                self._MAGIC, self.num_bits, self.num_hashes,
+                self.capacity, self.count, self.watermark
+            ))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['BloomFilter']:
+        """Loads a filter from disk, returning None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(cls._HEADER.size)
+                magic, num_bits, num_hashes, capacity, count, watermark = cls._HEADER.unpack(header)
+                if magic != cls._MAGIC:
+                    return None
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+
+        if len(bits) != (num_bits + 7) // 8:
+            return None
+
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom.watermark = watermark
+        bloom.bits = bits
+        return bloom
@@ -0,0 +1,254 @@
+"""
+Token accounting for LLM cleanup.
+
+Each crawl run may spend at most a configured number of tokens on cleanup. Documents
+reserve their estimated cost after extraction and settle it with the tokens actually
+used; a document that does not fit is deferred to a later run rather than cleaned.
+
+A crawl in one process keeps its budget in memory (TokenBudget). Queue workers share
+the budget of the newest crawl run through its crawl_runs row (RunTokenBudget).
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import psycopg2
+
+from app.llm_batch import estimate_tokens
+
+try:
+    from langchain_community.callbacks import get_openai_callback
+except ImportError:  # Usage is estimated from text length instead
+    get_openai_callback = None
+
+# Tokens of the cleanup prompt around each chunk, on top of the text itself
+PROMPT_OVERHEAD_TOKENS = 150
+
+# Below this many remaining tokens no document is worth claiming
+MIN_CLEANUP_TOKENS = 500
+
+# Once less than this fraction of the budget is left, the budget is tight
+TIGHT_FRACTION = 0.25
+
+# Before a PDF has been downloaded its cleanup cost is guessed from its size. Scanned
+# pages carry the least text per byte, so the guess is low for text PDFs; it only
+# orders jobs and never defers one.
+PDF_BYTES_PER_TOKEN = 300
+# Guessed cost of a PDF whose size the server did not report
+UNKNOWN_PDF_TOKENS = 4000
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a document's estimated cleanup cost does not fit the run's budget."""
+
+    def __init__(self, estimate: int, remaining: int):
+        super().__init__(
+            f"Cleanup needs about {estimate} tokens, {max(remaining, 0)} left in this run")
+        self.estimate = estimate
+        self.remaining = remaining
+
+
+def allowance(limit: int, remaining: int) -> int:
+    """The most tokens one document may reserve with `remaining` of `limit` left."""
+    if remaining < TIGHT_FRACTION * limit:
+        return remaining // 2
+    return remaining
+
+
+def estimate_cleanup_tokens(text: str, chunk_size: int) -> int:
+    """Estimated prompt plus completion tokens of cleaning `text` in `chunk_size` chunks."""
+    chunks = max(1, -(-len(text) // chunk_size))
+    return 2 * estimate_tokens(text) + PROMPT_OVERHEAD_TOKENS * chunks
+
+
+class _Usage:
+    __slots__ = ('total_tokens',)
+
+    def __init__(self):
+        self.total_tokens = 0
+
+
+@contextmanager
+def measure_tokens():
+    """
+    Collects the tokens OpenAI reports for LLM calls made in the block on this thread.
+    total_tokens stays 0 when usage is not reported, as with stand-in chains.
+    """
+    usage = _Usage()
+    if get_openai_callback is None:
+        yield usage
+        return
+    with get_openai_callback() as callback:
+        try:
+            yield usage
+        finally:
+            usage.total_tokens = callback.total_tokens
+
+
+class TokenBudget:
+    """
+    A thread-safe per-run token budget. A `limit` of 0 is unlimited.
+
+    While more than TIGHT_FRACTION of the budget remains, any document that fits is
+    admitted. Once the budget is tight, a document may only take up to half of what
+    is left, so a few large packets cannot crowd out the small ones queued behind them.
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = max(0, limit)
+        self.used = 0
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.used = 0
+            self._reserved = 0
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return self.limit - self.used - self._reserved
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.limit) and self.remaining < MIN_CLEANUP_TOKENS
+
+    def fits(self, estimate: int) -> bool:
+        """True if a document estimated at `estimate` tokens could be reserved now."""
+        return not self.limit or estimate <= allowance(self.limit, self.remaining)
+
+    def reserve(self, estimate: int):
+        """Reserves a document's estimated cost. Raises TokenBudgetExceeded if it does not fit."""
+        if not self.limit:
+            return
+        with self._lock:
+            remaining = self.limit - self.used - self._reserved
+            if estimate > allowance(self.limit, remaining):
+                raise TokenBudgetExceeded(estimate, remaining)
+            self._reserved += estimate
+
+    def settle(self, estimate: int, used: int):
+        """Replaces a reservation with the tokens the document actually used."""
+        with self._lock:
+            if self.limit:
+                self._reserved -= estimate
+            self.used += used
+
+
+class RunTokenBudget:
+    """
+    The token budget of the newest crawl run, shared by every worker on every host
+    through its crawl_runs row: llm_token_budget is the limit (NULL is unlimited),
+    llm_tokens the tokens used and llm_tokens_reserved the estimates of documents
+    being cleaned. Reservations are a single conditional UPDATE ... RETURNING, so
+    concurrent workers can never jointly overspend, and follow the same rules as
+    TokenBudget. Tokens are added to llm_tokens as they are settled, making it the
+    run's total.
+
+    sync() switches to the newest run; a reservation is always settled against the
+    run it was made on. Database errors while reserving are raised; errors while
+    settling are logged, so a lost connection costs the accounting of one document.
+    """
+
+    def __init__(self, connect: Callable, logger: Optional[logging.Logger] = None):
+        self._connect = connect
+        self.logger = logger or logging.getLogger(__name__)
+        self.run_id: Optional[int] = None
+        self.limit = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _query(self, query: str, params=()):
+        """Runs one statement on the budget's own connection and returns its first row."""
+        with self._lock:
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = self._connect()
+                cursor = self._conn.cursor()
+                cursor.execute(query, params)
+                row = cursor.fetchone() if cursor.description else None
+                self._conn.commit()
+                cursor.close()
+                return row
+            except psycopg2.Error:
+                if self._conn is not None and not self._conn.closed:
+                    self._conn.close()
+                self._conn = None
+                raise
+
+    def sync(self) -> bool:
+        """Follows the newest crawl run. Returns True if it changed."""
+        row = self._query(
+            "SELECT id, COALESCE(llm_token_budget, 0) FROM crawl_runs ORDER BY id DESC LIMIT 1")
+        run_id, limit = row if row else (None, 0)
+        changed = run_id != self.run_id
+        self.run_id, self.limit = run_id, limit
+        return changed
+
+    def reset(self):
+        self.sync()
+
+    @property
+    def used(self) -> int:
+        if self.run_id is None:
+            return 0
+        row = self._query("SELECT llm_tokens FROM crawl_runs WHERE id = %s", (self.run_id,))
+        return row[0] if row else 0
+
+    @property
+    def remaining(self) -> int:
+        if self.run_id is None or not self.limit:
+            return 0
+        row = self._query("""
+            SELECT llm_token_budget - llm_tokens - llm_tokens_reserved
+            FROM crawl_runs WHERE id = %s
+        """, (self.run_id,))
+        return row[0] if row else 0
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.limit) and self.remaining < MIN_CLEANUP_TOKENS
+
+    def fits(self, estimate: int) -> bool:
+        """True if a document estimated at `estimate` tokens could be reserved now."""
+        return not self.limit or estimate <= allowance(self.limit, self.remaining)
+
+    def reserve(self, estimate: int):
+        """Reserves a document's estimated cost. Raises TokenBudgetExceeded if it does not fit."""
+        run_id, reserved = self.run_id, 0
+        if run_id is not None and self.limit:
+            row = self._query("""
+                UPDATE crawl_runs SET llm_tokens_reserved = llm_tokens_reserved + %(estimate)s
+                WHERE id = %(run_id)s
+                  AND %(estimate)s <= CASE
+                      WHEN llm_token_budget - llm_tokens - llm_tokens_reserved
+                           < %(tight)s * llm_token_budget
+                      THEN (llm_token_budget - llm_tokens - llm_tokens_reserved) / 2
+                      ELSE llm_token_budget - llm_tokens - llm_tokens_reserved
+                  END
+                RETURNING id
+            """, {'estimate': estimate, 'run_id': run_id, 'tight': TIGHT_FRACTION})
+            if row is None:
+                raise TokenBudgetExceeded(estimate, self.remaining)
+            reserved = estimate
+        self._local.reservation = (run_id, reserved)
+
+    def settle(self, estimate: int, used: int):
+        """Replaces this thread's last reservation with the tokens the document actually used."""
+        run_id, reserved = getattr(self._local, 'reservation', None) or (self.run_id, 0)
+        self._local.reservation = None
+        if run_id is None:
+            return
+        try:
+            self._query("""
+                UPDATE crawl_runs SET
+                    llm_tokens_reserved = GREATEST(llm_tokens_reserved - %s, 0),
+                    llm_tokens = llm_tokens + %s
+                WHERE id = %s
+            """, (reserved, used, run_id))
+        except psycopg2.Error as e:
+            self.logger.error("Failed to record %s LLM tokens for crawl run %s: %s",
+                              used, run_id, e)
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import psycopg2
+
+
+class CrawlGenerationTracker:
+    """
+    Tracks the crawl generation number stored in crawl_state. The crawler bumps it
+    whenever it writes new data, so anything cached under an older generation is stale.
+
+    The database is consulted at most once per `check_interval` seconds per process.
+    If it cannot be reached the last known generation is kept, so cached responses are
+    still served during an outage.
+    """
+
+    def __init__(self, connect: Callable, check_interval: float = 5.0,
+                 logger: Optional[logging.Logger] = None):
+        self._connect = connect
+        self.check_interval = check_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[int]:
+        with self._lock:
+            if self._generation is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._generation
+
+        try:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT generation FROM crawl_state")
+                row = cursor.fetchone()
+                cursor.close()
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            self.logger.error("Failed to check the crawl generation, keeping %s: %s",
+                              self._generation, e)
+            with self._lock:
+                # Wait a full interval before trying the database again
+                self._checked_at = time.monotonic()
+                return self._generation
+
+        with self._lock:
+            self._generation = row[0] if row else 0
+            self._checked_at = time.monotonic()
+            return self._generation
+
+
+class CachedResponse:
+    __slots__ = ('body', 'mimetype', 'stored_at', 'size')
+
+    def __init__(self, body: bytes, mimetype: str, key: str):
+        self.body = body
+        self.mimetype = mimetype
+        self.stored_at = time.monotonic()
+        self.size = len(body) + len(key)
+
+
+class ResponseCache:
+    """
+    A bounded LRU cache of pre-serialized response bodies, kept in each worker process.
+
+    Entries expire after `ttl` seconds and are dropped wholesale whenever the crawl
+    generation changes, since cached data can only go stale when the crawler writes.
+    """
+
+    def __init__(self, generation: CrawlGenerationTracker, max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.generation = generation
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._bytes = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self):
+        generation = self.generation.current()
+        with self._lock:
+            if generation != self._generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._generation = generation
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        self._check_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    @property
+    def current_generation(self) -> Optional[int]:
+        """The generation the cached entries belong to, as of the last lookup."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key: str, body: bytes, mimetype: str, generation: Optional[int]):
+        """
+        Stores a response body computed under `generation`. Bodies from a generation
+        that has since been superseded are discarded.
+        """
+        entry = CachedResponse(body, mimetype, key)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'generation': self._generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
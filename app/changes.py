@@ -0,0 +1,124 @@
+from typing import Tuple
+
+CHANGE_TABLES = {
+    # Table -> bookkeeping columns whose updates are not reported as changes
+    'pdf_content': ('etag', 'last_modified', 'content_length', 'last_validated_at'),
+    'all_links': ('last_checked', 'times_seen'),
+}
+
+
+def parse_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Splits a change cursor into its transaction id and sequence number. A bare number is
+    a cursor from before transaction ids were recorded, when every row had xid 0.
+    Raises ValueError for anything else.
+    """
+    xid, _, seq = cursor.rpartition('-')
+    if not seq.isdigit() or (xid and not xid.isdigit()):
+        raise ValueError(f"Invalid change cursor '{cursor}'")
+    return int(xid or 0), int(seq)
+
+
+def format_cursor(xid: int, seq: int) -> str:
+    return f"{xid}-{seq}"
+
+
+def horizon_cursor(cursor, table: str = 'pdf_content') -> str:
+    """
+    The cursor of the last change to `table` by a transaction below the current
+    snapshot's xmin. Every change up to it has committed, so a reader that has seen them
+    all can resume from it without skipping a change still being written.
+    """
+    cursor.execute(f"""
+        SELECT change_xid::text, change_seq FROM {table}
+        WHERE change_xid < pg_snapshot_xmin(pg_current_snapshot())
+        ORDER BY change_xid DESC, change_seq DESC
+        LIMIT 1
+    """)
+    row = cursor.fetchone()
+    return format_cursor(*row) if row else format_cursor(0, 0)
+
+
+class ChangeLog:
+    """
+    Numbers every insert and meaningful update of pdf_content and all_links, so sync
+    clients can ask for everything after a cursor.
+
+    A BEFORE trigger records the writing transaction's id in change_xid and draws
+    change_seq from the change_seq sequence. Changes are read in (change_xid,
+    change_seq) order, and only from transactions older than the reader's snapshot
+    xmin, all of which have finished. A transaction still in progress has an id at
+    or above that xmin, and so sorts after anything already returned: a cursor never
+    skips a change, and writers never wait for each other.
+
+    Rows numbered before change_xid existed keep xid 0, so they sort first by their
+    change_seq, and old numeric cursors stay valid.
+    """
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("CREATE SEQUENCE IF NOT EXISTS change_seq")
+        # Earlier versions of the function serialized writers with an advisory lock
+        cursor.execute("""
+            SELECT prosrc FROM pg_proc
+            WHERE oid = to_regprocedure('record_change_seq()')
+        """)
+        row = cursor.fetchone()
+        if row is None or 'pg_current_xact_id' not in row[0]:
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION record_change_seq() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'UPDATE'
+                       AND (to_jsonb(NEW) - TG_ARGV) = (to_jsonb(OLD) - TG_ARGV) THEN
+                        RETURN NEW;
+                    END IF;
+                    NEW.change_xid := pg_current_xact_id();
+                    NEW.change_seq := nextval('change_seq');
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+        for table, ignored in CHANGE_TABLES.items():
+            cursor.execute(f"""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = '{table}' AND column_name = 'change_seq'
+                  AND table_schema = current_schema()
+            """)
+            if not cursor.fetchone():
+                # Number existing rows in id order, before the trigger exists
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN change_seq BIGINT")
+                cursor.execute(f"""
+                    UPDATE {table} t SET change_seq = n.seq
+                    FROM (
+                        SELECT id, nextval('change_seq') AS seq
+                        FROM (SELECT id FROM {table} ORDER BY id) ordered
+                    ) n
+                    WHERE t.id = n.id
+                """)
+            cursor.execute(f"""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = '{table}' AND column_name = 'change_xid'
+                  AND table_schema = current_schema()
+            """)
+            if not cursor.fetchone():
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD COLUMN change_xid xid8 NOT NULL DEFAULT '0'")
+                # The trigger is recreated below with change_xid among its ignored columns
+                cursor.execute(f"DROP TRIGGER IF EXISTS {table}_change_seq ON {table}")
+                cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_change_seq")
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_change_cursor
+                ON {table} (change_xid, change_seq)
+            """)
+            cursor.execute(f"""
+                SELECT 1 FROM pg_trigger
+                WHERE tgname = '{table}_change_seq' AND tgrelid = '{table}'::regclass
+            """)
+            if not cursor.fetchone():
+                arguments = ', '.join(
+                    f"'{column}'" for column in ('change_seq', 'change_xid') + ignored)
+                cursor.execute(f"""
+                    CREATE TRIGGER {table}_change_seq
+                    BEFORE INSERT OR UPDATE ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION record_change_seq({arguments})
+                """)
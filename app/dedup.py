@@ -0,0 +1,221 @@
+"""
+Near-duplicate detection for extracted document text.
+
+Agenda revisions ("Amended Agenda", "Revised Packet") are usually almost identical to a
+document already stored. Each document's raw extracted text gets a MinHash signature
+over its word 5-shingles. The signature is cut into LSH bands, and documents sharing a
+band bucket are candidates, confirmed by the fraction of matching signature values.
+
+Text is cleaned in content-defined chunks that end on lines chosen by their content, so
+an edit early in a revision only changes the chunks around it and the rest can reuse
+the cleaned text of the earlier document.
+"""
+import hashlib
+import random
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import psycopg2.extras
+
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_WORDS = 5
+
+# Estimated Jaccard similarity above which a document counts as a near-duplicate
+DEFAULT_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+# A fixed seed, so signatures stored by earlier runs stay comparable
+_rng = random.Random(0x6d696e68)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_WORD_RE = re.compile(r'\w+')
+
+# On average one line in this many ends a chunk, once the chunk holds min_chars
+_BOUNDARY_MODULUS = 8
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """
+    MinHash signature of the text's word shingles, insensitive to case, punctuation
+    and line breaks. Returns None for text without words.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    shingles = {
+        _hash64(' '.join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    return [min((a * value + b) % _PRIME for value in shingles) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: Sequence[int]) -> List[Tuple[int, int]]:
+    """The (band, bucket) pairs of a signature, with buckets as signed 64-bit integers."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(','.join(map(str, rows)).encode(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return buckets
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    if len(a) != len(b) or not a:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def chunk_digest(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode()).hexdigest()
+
+
+def split_chunks(text: str, max_chars: int, min_chars: Optional[int] = None) -> List[str]:
+    """
+    Splits text into chunks of at most `max_chars`, cutting between lines. Once a chunk
+    holds `min_chars` (default half of `max_chars`), it ends after a line whose hash
+    picks it as a boundary, so boundaries depend on content rather than offsets. Text
+    that fits in one chunk is returned whole.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    min_chars = max_chars // 2 if min_chars is None else min_chars
+
+    chunks, current, size = [], [], 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                chunks.append(''.join(current))
+                current, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and size + len(line) > max_chars:
+            chunks.append(''.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+        if size >= min_chars and zlib.crc32(line.strip().encode()) % _BOUNDARY_MODULUS == 0:
+            chunks.append(''.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+class NearDuplicateIndex:
+    """
+    Stored signatures, LSH band buckets and cleaned chunk offsets of documents, in the
+    pdf_minhash, pdf_lsh and pdf_chunks tables. All methods work on the caller's
+    cursor and leave committing to the caller.
+    """
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_minhash (
+                id INTEGER PRIMARY KEY REFERENCES pdf_content(id) ON DELETE CASCADE,
+                signature BIGINT[] NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_lsh (
+                band SMALLINT NOT NULL,
+                bucket BIGINT NOT NULL,
+                pdf_id INTEGER NOT NULL REFERENCES pdf_content(id) ON DELETE CASCADE,
+                PRIMARY KEY (band, bucket, pdf_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pdf_lsh_pdf ON pdf_lsh (pdf_id)")
+        # Where each chunk's cleaned text sits in pdf_body.content, keyed by a digest of
+        # the raw chunk, so a revision can reuse the chunks it shares with this document
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_chunks (
+                pdf_id INTEGER NOT NULL REFERENCES pdf_content(id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                chunk_sha256 TEXT NOT NULL,
+                cleaned_start INTEGER NOT NULL,
+                cleaned_length INTEGER NOT NULL,
+                PRIMARY KEY (pdf_id, seq)
+            )
+        """)
+
+    @staticmethod
+    def find(cursor, signature: Sequence[int], threshold: float = DEFAULT_THRESHOLD,
+             before_id: Optional[int] = None,
+             max_candidates: int = 20) -> Optional[Tuple[int, int, float]]:
+        """
+        Finds the stored document most similar to `signature`, at least `threshold`,
+        among documents sharing an LSH bucket with it. Only documents with ids below
+        `before_id` are considered when it is given, so originals always predate their
+        duplicates. Returns the match's id, the id of the original it belongs to, and
+        the similarity; or None.
+        """
+        bands, buckets = zip(*lsh_buckets(signature))
+        cursor.execute("""
+            SELECT m.id, m.signature, COALESCE(p.duplicate_of, p.id)
+            FROM (
+                SELECT l.pdf_id, COUNT(*) AS bands
+                FROM pdf_lsh l
+                JOIN unnest(%s::smallint[], %s::bigint[]) AS q(band, bucket)
+                  ON l.band = q.band AND l.bucket = q.bucket
+                WHERE %s::integer IS NULL OR l.pdf_id < %s
+                GROUP BY l.pdf_id
+                ORDER BY bands DESC, l.pdf_id DESC
+                LIMIT %s
+            ) c
+            JOIN pdf_minhash m ON m.id = c.pdf_id
+            JOIN pdf_content p ON p.id = c.pdf_id
+        """, (list(bands), list(buckets), before_id, before_id, max_candidates))
+
+        best = None
+        for pdf_id, stored, original_id in cursor.fetchall():
+            score = similarity(signature, stored)
+            if score >= threshold and (best is None or score > best[2]):
+                best = (pdf_id, original_id, score)
+        return best
+
+    @staticmethod
+    def cleaned_chunks(cursor, pdf_ids: Sequence[int]) -> Dict[str, str]:
+        """Maps raw chunk digests of the given documents to their stored cleaned text."""
+        cursor.execute("SELECT id, content FROM pdf_body WHERE id = ANY(%s)", (list(pdf_ids),))
+        bodies = {pdf_id: content or '' for pdf_id, content in cursor.fetchall()}
+        cursor.execute("""
+            SELECT pdf_id, chunk_sha256, cleaned_start, cleaned_length
+            FROM pdf_chunks WHERE pdf_id = ANY(%s)
+        """, (list(pdf_ids),))
+        return {
+            digest: bodies[pdf_id][start:start + length]
+            for pdf_id, digest, start, length in cursor.fetchall()
+            if pdf_id in bodies
+        }
+
+    @staticmethod
+    def store(cursor, pdf_id: int, signature: Optional[Sequence[int]],
+              chunks: Sequence[Tuple[str, int, int]]):
+        """Replaces a document's signature, buckets and (digest, start, length) chunks."""
+        cursor.execute("DELETE FROM pdf_lsh WHERE pdf_id = %s", (pdf_id,))
+        cursor.execute("DELETE FROM pdf_chunks WHERE pdf_id = %s", (pdf_id,))
+        if signature:
+            cursor.execute("""
+                INSERT INTO pdf_minhash (id, signature) VALUES (%s, %s)
+                ON CONFLICT (id) DO UPDATE SET signature = EXCLUDED.signature
+            """, (pdf_id, list(signature)))
+            psycopg2.extras.execute_values(
+                cursor,
+                "INSERT INTO pdf_lsh (band, bucket, pdf_id) VALUES %s",
+                [(band, bucket, pdf_id) for band, bucket in lsh_buckets(signature)])
+        else:
+            cursor.execute("DELETE FROM pdf_minhash WHERE id = %s", (pdf_id,))
+        if chunks:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO pdf_chunks (pdf_id, seq, chunk_sha256, cleaned_start, cleaned_length)
+                VALUES %s
+            """, [(pdf_id, seq, digest, start, length)
+                  for seq, (digest, start, length) in enumerate(chunks)])
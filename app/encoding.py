@@ -0,0 +1,115 @@
+import gzip
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON is always available
+    msgpack = None
+
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Responses smaller than this are not worth the CPU and header overhead of compressing
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _parse_accept(header: str) -> dict:
+    """Parses an Accept or Accept-Encoding header into {token: q-value}."""
+    accepted = {}
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Picks the content coding for a response from the request's Accept-Encoding header.
+    Brotli is preferred over gzip when the client weights them equally.
+    """
+    accepted = _parse_accept(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+
+    candidates = []
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content coding '{coding}'")
+
+
+def wants_msgpack(accept: str) -> bool:
+    """True if msgpack is installed and the client prefers it over JSON."""
+    if msgpack is None:
+        return False
+    accepted = _parse_accept(accept)
+    msgpack_quality = max(accepted.get(MSGPACK_MIMETYPE, 0.0),
+                          accepted.get('application/x-msgpack', 0.0))
+    return msgpack_quality > 0 and msgpack_quality >= accepted.get('application/json', 0.0)
+
+
+def _msgpack_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+def pack_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def write_gzip_sibling(path: str) -> str:
+    """
+    Writes a precompressed `<path>.gz` next to a file so it can be served without
+    compressing on every request. Returns the sibling's path.
+    """
+    gz_path = f"{path}.gz"
+    tmp_path = f"{gz_path}.tmp"
+    with open(path, 'rb') as source:
+        data = source.read()
+    with open(tmp_path, 'wb') as target:
+        target.write(gzip.compress(data, compresslevel=9, mtime=0))
+    os.replace(tmp_path, gz_path)
+    return gz_path
+
+
+def accepts_coding(accept_encoding: str, coding: str) -> bool:
+    """True if the Accept-Encoding header allows the given content coding."""
+    accepted = _parse_accept(accept_encoding)
+    return accepted.get(coding, accepted.get('*', 0.0)) > 0
@@ -15,7 +15,7 @@ class APIErrorHandler:
             try:
                 return f(*args, **kwargs)
             except psycopg2.Error as e:
-                self.logger.error(f"Database error in {f.__name__}: {str(e)}")
+                self.logger.error("Database error in %s: %s", f.__name__, str(e))
                 return jsonify({
                     'error': 'Database error occurred',
                     'message': str(e),
@@ -23,14 +23,14 @@ class APIErrorHandler:
                 }), 500
             except ValueError as e:
                 self.logger.error(
-                    f"Validation error in {f.__name__}: {str(e)}")
+                    "Validation error in %s: %s", f.__name__, str(e))
                 return jsonify({
                     'error': 'Validation error',
                     'message': str(e),
                     'type': 'validation_error'
                 }), 400
             except FileNotFoundError as e:
-                self.logger.error(f"File not found in {f.__name__}: {str(e)}")
+                self.logger.error("File not found in %s: %s", f.__name__, str(e))
                 return jsonify({
                     'error': 'Resource not found',
                     'message': str(e),
@@ -38,7 +38,7 @@ class APIErrorHandler:
                 }), 404
             except Exception as e:
                 self.logger.error(
-                    f"Unexpected error in {f.__name__}: {str(e)}")
+                    "Unexpected error in %s: %s", f.__name__, str(e))
                 return jsonify({
                     'error': 'An unexpected error occurred',
                     'message': str(e),
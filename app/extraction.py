@@ -0,0 +1,241 @@
+"""
+Sandboxed PDF text extraction.
+
+PyPDF2 and OCR run in child processes so that a malformed or pathological document can
+only cost its own wall-clock and memory budget: a child that runs past its time limit
+or grows past its RSS limit is killed and replaced, and the document is reported as a
+failure instead of stalling the crawl.
+"""
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from app.dedup import minhash
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the parent-side RSS check still applies
+    resource = None
+
+# Scanned PDFs yield little or no text from PyPDF2 and are sent to OCR instead
+MIN_TEXT_CHARS = 50
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class ExtractionError(Exception):
+    """
+    Raised when a document cannot be extracted. `retryable` is False for failures that
+    would repeat on the same bytes: hitting the time or memory limit, or a parse error.
+    Only a failure of the extraction process itself, such as a broken pipe, is retried.
+    """
+
+    def __init__(self, message: str, reason: str = 'error', retryable: bool = True):
+        super().__init__(message)
+        self.reason = reason
+        self.retryable = retryable
+
+
+def _metadata_text(metadata, key: str) -> str:
+    value = metadata.get(key, '') if metadata else ''
+    return str(value) if value is not None else ''
+
+
+def extract_pdf(pdf_bytes: bytes, max_pages: int) -> Dict:
+    """
+    Extracts text and document metadata from up to `max_pages` pages, falling back to
+    OCR when the PDF has no usable text layer. Text is collected a page at a time and
+    joined once, and its MinHash signature is computed here to keep that CPU work off
+    the crawler's threads. Runs inside an extraction child process.
+    """
+    import PyPDF2
+
+    started = time.perf_counter()
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    number_of_pages = len(reader.pages)
+    pages_read = min(number_of_pages, max_pages)
+
+    page_texts = []
+    for index in range(pages_read):
+        page_texts.append(reader.pages[index].extract_text() or '')
+    text = '\n'.join(page_texts)
+    metadata = reader.metadata
+    extract_seconds = time.perf_counter() - started
+
+    ocr_seconds, ocr_pages, ocr_error = 0.0, 0, None
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        started = time.perf_counter()
+        try:
+            import pytesseract
+            from pdf2image import convert_from_bytes
+
+            ocr_texts = []
+            for image in convert_from_bytes(pdf_bytes, last_page=pages_read or None):
+                ocr_texts.append(pytesseract.image_to_string(image, lang='eng'))
+                ocr_pages += 1
+            ocr_text = '\n'.join(ocr_texts)
+            if ocr_text.strip():
+                text = ocr_text
+        except Exception as e:
+            ocr_error = str(e)
+        ocr_seconds = time.perf_counter() - started
+
+    return {
+        'content': text,
+        'title': _metadata_text(metadata, '/Title'),
+        'author': _metadata_text(metadata, '/Author'),
+        'creation_date': _metadata_text(metadata, '/CreationDate'),
+        'modification_date': _metadata_text(metadata, '/ModDate'),
+        'number_of_pages': number_of_pages,
+        'file_size_bytes': len(pdf_bytes),
+        'pages_extracted': pages_read,
+        'extract_seconds': extract_seconds,
+        'ocr_seconds': ocr_seconds,
+        'ocr_pages': ocr_pages,
+        'ocr_error': ocr_error,
+        'minhash': minhash(text),
+    }
+
+
+def _child_main(conn, max_address_space: Optional[int]):
+    """Serves extraction requests over a pipe until the parent closes it."""
+    if resource is not None and max_address_space:
+        # Backstop for platforms without /proc, where the parent cannot watch RSS
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (max_address_space, max_address_space))
+        except (ValueError, OSError):
+            pass
+    while True:
+        try:
+            pdf_bytes, max_pages = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(('ok', extract_pdf(pdf_bytes, max_pages)))
+        except MemoryError:
+            conn.send(('memory', 'Ran out of memory extracting PDF'))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Child:
+    def __init__(self, context, max_address_space: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_child_main, args=(child_conn, max_address_space), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+
+class ExtractionPool:
+    """
+    A pool of up to `size` extraction child processes, each handling one document at a
+    time. Children are started on demand and recycled after `max_tasks_per_child`
+    documents to bound memory growth.
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 120.0, max_rss_mb: int = 1024,
+                 max_pages: int = 500, max_tasks_per_child: int = 50, poll_interval: float = 0.1):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.max_pages = max_pages
+        self.max_tasks_per_child = max_tasks_per_child
+        self.poll_interval = poll_interval
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in methods else 'spawn')
+        self._idle: 'queue.LifoQueue[_Child]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _address_space_limit(self) -> Optional[int]:
+        # Virtual size runs well ahead of RSS, so the hard limit leaves generous headroom
+        return self.max_rss_bytes * 4 if self.max_rss_bytes else None
+
+    def _checkout(self) -> _Child:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _Child(self._context, self._address_space_limit())
+
+    def _wait(self, child: _Child):
+        deadline = time.monotonic() + self.timeout
+        while not child.conn.poll(self.poll_interval):
+            if not child.process.is_alive():
+                raise ExtractionError(
+                    f"Extraction process exited with code {child.process.exitcode}",
+                    reason='crashed', retryable=False)
+            if time.monotonic() > deadline:
+                raise ExtractionError(
+                    f"Extraction exceeded {self.timeout:.0f}s", reason='timeout', retryable=False)
+            rss = _rss_bytes(child.process.pid)
+            if self.max_rss_bytes and rss and rss > self.max_rss_bytes:
+                raise ExtractionError(
+                    f"Extraction exceeded {self.max_rss_bytes // 1_048_576} MB RSS",
+                    reason='memory', retryable=False)
+        try:
+            return child.conn.recv()
+        except EOFError:
+            raise ExtractionError(
+                "Extraction process exited unexpectedly", reason='crashed', retryable=False)
+
+    def extract(self, pdf_bytes: bytes) -> Dict:
+        """Extracts one PDF in a child process. Raises ExtractionError on any failure."""
+        with self._slots:
+            child = self._checkout()
+            try:
+                child.conn.send((pdf_bytes, self.max_pages))
+                status, result = self._wait(child)
+            except ExtractionError:
+                child.kill()
+                raise
+            except (OSError, EOFError) as e:
+                child.kill()
+                raise ExtractionError(f"Extraction process failed: {e}", reason='crashed')
+
+            child.tasks += 1
+            if status == 'memory':
+                # A child that hit its address space limit may be left fragmented
+                child.kill()
+            elif child.tasks >= self.max_tasks_per_child:
+                child.close()
+            else:
+                self._idle.put(child)
+
+        if status == 'ok':
+            return result
+        # Parse errors and memory exhaustion come from the document, not the process
+        raise ExtractionError(result, reason=status, retryable=False)
+
+    def close(self):
+        """Stops idle children. Children busy in other threads are left to finish."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
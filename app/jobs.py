@@ -0,0 +1,517 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import psycopg2
+import psycopg2.extras
+
+from app.budget import PDF_BYTES_PER_TOKEN, UNKNOWN_PDF_TOKENS
+
+# Claimed rows are refreshed this often by their worker's heartbeat thread
+HEARTBEAT_INTERVAL_SECONDS = 15
+# A claim whose heartbeat is older than this is assumed to belong to a dead worker
+STALE_CLAIM_SECONDS = 120
+
+
+def make_worker_id() -> str:
+    """A worker identity that is unique across hosts and process restarts."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class PDFJobError(Exception):
+    """
+    Raised when a PDF job cannot complete. Retryable errors are rescheduled with
+    exponential backoff; the rest fail the job immediately.
+    """
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class PDFJobQueue:
+    """
+    A durable queue of PDF download and extraction jobs in the pdf_jobs table.
+
+    Jobs move from 'pending' to 'running' when claimed, then to 'done', back to
+    'pending' with a later next_attempt_at after a retryable failure, or to 'failed'
+    once attempts are exhausted.
+    """
+
+    def __init__(self, logger: logging.Logger, max_attempts: int = 6,
+                 backoff_seconds: float = 900, max_backoff_seconds: float = 7 * 24 * 3600):
+        self.logger = logger
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_jobs (
+                id SERIAL PRIMARY KEY,
+                feed_title TEXT NOT NULL,
+                pdf_url TEXT NOT NULL,
+                source_link TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                claimed_by TEXT,
+                heartbeat_at TIMESTAMP,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (feed_title, pdf_url) REFERENCES all_links(feed_title, link),
+                UNIQUE (feed_title, pdf_url)
+            )
+        """)
+        cursor.execute("ALTER TABLE pdf_jobs ADD COLUMN IF NOT EXISTS claimed_by TEXT")
+        cursor.execute("ALTER TABLE pdf_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP")
+        # Estimated LLM cleanup tokens, known once a job has been deferred for its cost
+        cursor.execute("ALTER TABLE pdf_jobs ADD COLUMN IF NOT EXISTS estimated_tokens INTEGER")
+        # Size reported when the link was classified, to guess the cost of new jobs
+        cursor.execute("ALTER TABLE pdf_jobs ADD COLUMN IF NOT EXISTS content_length BIGINT")
+        # The crawl run and feed run a job's work is recorded against in the ledger
+        cursor.execute("""
+            ALTER TABLE pdf_jobs
+                ADD COLUMN IF NOT EXISTS run_id INTEGER
+                    REFERENCES crawl_runs(id) ON DELETE SET NULL,
+                ADD COLUMN IF NOT EXISTS feed_run_id INTEGER
+                    REFERENCES crawl_feed_runs(id) ON DELETE SET NULL
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pdf_jobs_due
+            ON pdf_jobs (feed_title, next_attempt_at)
+            WHERE status = 'pending'
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pdf_jobs_running
+            ON pdf_jobs (claimed_by)
+            WHERE status = 'running'
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pdf_jobs_run
+            ON pdf_jobs (run_id)
+            WHERE status IN ('pending', 'running')
+        """)
+
+    def enqueue(self, conn, pdf_links: List[Dict], run_id: Optional[int] = None,
+                feed_run_id: Optional[int] = None) -> int:
+        """
+        Adds jobs for new PDF links, recorded against `run_id` and `feed_run_id` in the
+        ledger, with the `content_length` found when each link was classified; links that
+        already have a job are left alone.
+        """
+        if not pdf_links:
+            return 0
+        cursor = conn.cursor()
+        inserted = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO pdf_jobs (
+                feed_title, pdf_url, source_link, run_id, feed_run_id, content_length
+            )
+            VALUES %s
+            ON CONFLICT (feed_title, pdf_url) DO NOTHING
+            RETURNING id
+        """, [
+            (link['feed_title'], link['link'], link['source_url'], run_id, feed_run_id,
+             link.get('content_length'))
+            for link in pdf_links
+        ], page_size=100, fetch=True)
+        conn.commit()
+        cursor.close()
+        return len(inserted)
+
+    def adopt(self, conn, feed_title: str, run_id: Optional[int],
+              feed_run_id: Optional[int]) -> int:
+        """
+        Moves the feed's pending jobs, such as retries and deferrals left by earlier runs,
+        to a new run, so their work is recorded against the crawl that retries them.
+        """
+        if feed_run_id is None:
+            return 0
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET run_id = %s, feed_run_id = %s
+            WHERE feed_title = %s AND status = 'pending'
+              AND feed_run_id IS DISTINCT FROM %s
+        """, (run_id, feed_run_id, feed_title, feed_run_id))
+        adopted = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return adopted
+
+    def claim_due(self, conn, feed_title: Optional[str] = None, limit: int = 100,
+                  worker_id: Optional[str] = None) -> List[Dict]:
+        """
+        Marks up to `limit` due jobs as running under `worker_id` and returns them.
+        SKIP LOCKED lets concurrent workers, on any host, take disjoint sets of jobs.
+
+        Jobs are returned cheapest first, so that when the token budget runs short the
+        small documents are cleaned. A job's cost is its estimated tokens once it has been
+        deferred, and until then a guess from its size (PDF_BYTES_PER_TOKEN, or
+        UNKNOWN_PDF_TOKENS without a size). The cost is divided by one plus the job's age
+        in weeks, so a large document passed over for smaller ones eventually comes first.
+        """
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            UPDATE pdf_jobs SET
+                status = 'running',
+                attempts = attempts + 1,
+                claimed_by = %(worker_id)s,
+                heartbeat_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM pdf_jobs
+                WHERE status = 'pending'
+                  AND next_attempt_at <= CURRENT_TIMESTAMP
+                  AND (%(feed_title)s::text IS NULL OR feed_title = %(feed_title)s)
+                ORDER BY
+                    COALESCE(estimated_tokens, content_length / %(bytes_per_token)s, %(unknown)s)
+                        / (1 + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) / 604800),
+                    next_attempt_at
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, feed_title, pdf_url, source_link, attempts, run_id, feed_run_id,
+                estimated_tokens,
+                COALESCE(estimated_tokens, content_length / %(bytes_per_token)s, %(unknown)s)
+                    / (1 + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) / 604800) AS cost
+        """, {'feed_title': feed_title, 'limit': limit, 'worker_id': worker_id,
+              'bytes_per_token': PDF_BYTES_PER_TOKEN, 'unknown': UNKNOWN_PDF_TOKENS})
+        jobs = sorted((dict(row) for row in cursor.fetchall()), key=lambda job: job['cost'])
+        conn.commit()
+        cursor.close()
+        return jobs
+
+    def complete(self, conn, job: Dict):
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET
+                status = 'done',
+                last_error = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (job['id'],))
+        conn.commit()
+        cursor.close()
+
+    def defer(self, conn, job: Dict, delay: float, estimated_tokens: Optional[int] = None):
+        """
+        Returns a claimed job to the queue without counting the attempt, due again after
+        `delay` seconds, recording its estimated token cost when known.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET
+                status = 'pending',
+                attempts = GREATEST(attempts - 1, 0),
+                estimated_tokens = COALESCE(%s, estimated_tokens),
+                last_error = 'Deferred: LLM token budget',
+                claimed_by = NULL,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (estimated_tokens, delay, job['id']))
+        conn.commit()
+        cursor.close()
+
+    def backoff_for(self, attempts: int) -> float:
+        """Exponential backoff with +/-20% jitter so retries of one outage spread out."""
+        delay = min(self.backoff_seconds * (2 ** max(attempts - 1, 0)), self.max_backoff_seconds)
+        return delay * random.uniform(0.8, 1.2)
+
+    def fail(self, conn, job: Dict, error: str, retryable: bool = True) -> str:
+        """Records a failed attempt and returns the job's new status."""
+        give_up = not retryable or job['attempts'] >= self.max_attempts
+        status = 'failed' if give_up else 'pending'
+        delay = 0 if give_up else self.backoff_for(job['attempts'])
+
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET
+                status = %s,
+                last_error = %s,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (status, error[:2000], delay, job['id']))
+        conn.commit()
+        cursor.close()
+
+        if give_up:
+            self.logger.warning(
+                "Giving up on PDF %s after %s attempt(s): %s",
+                job['pdf_url'], job['attempts'], error)
+        else:
+            self.logger.info(
+                "PDF %s failed (attempt %s), retrying in %.0fs: %s",
+                job['pdf_url'], job['attempts'], delay, error)
+        return status
+
+    def heartbeat(self, conn, worker_id: str):
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND claimed_by = %s
+        """, (worker_id,))
+        conn.commit()
+        cursor.close()
+
+    def release_stale(self, conn, stale_after_seconds: float = STALE_CLAIM_SECONDS) -> int:
+        """
+        Returns jobs whose worker stopped heartbeating to the pending state. A job that
+        has already used all its attempts fails instead, so a PDF that kills its worker
+        is not retried forever.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE pdf_jobs SET
+                status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                last_error = 'Worker ' || COALESCE(claimed_by, 'unknown') || ' stopped responding',
+                claimed_by = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'running'
+              AND COALESCE(heartbeat_at, updated_at) < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        """, (self.max_attempts, stale_after_seconds))
+        released = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return released
+
+    def has_due(self, conn) -> bool:
+        """True if any job is running or waiting to run now."""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM pdf_jobs
+                WHERE status = 'running'
+                   OR (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+            )
+        """)
+        due = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        return due
+
+
+class CrawlTaskQueue:
+    """
+    Feed crawl tasks in the crawl_tasks table, claimed by workers with SKIP LOCKED.
+
+    Each crawl run enqueues one task per configured feed. A feed has at most one
+    pending or running task at a time, so overlapping runs never crawl it twice.
+    """
+
+    FINISHED_STATUSES = ('completed', 'skipped', 'failed')
+
+    def __init__(self, logger: logging.Logger, max_attempts: int = 3):
+        self.logger = logger
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_tasks (
+                id SERIAL PRIMARY KEY,
+                run_id INTEGER REFERENCES crawl_runs(id) ON DELETE CASCADE,
+                feed_title TEXT NOT NULL,
+                config JSONB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                claimed_by TEXT,
+                claimed_at TIMESTAMP,
+                heartbeat_at TIMESTAMP,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_crawl_tasks_active_feed
+            ON crawl_tasks (feed_title)
+            WHERE status IN ('pending', 'running')
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_crawl_tasks_run
+            ON crawl_tasks (run_id)
+        """)
+
+    def enqueue(self, conn, run_id: Optional[int], configs: Iterable[Dict]) -> int:
+        """Adds a task per feed config, skipping feeds that already have one outstanding."""
+        rows = [
+            (run_id, config.get('feed_title', 'Web Crawler Feed'), json.dumps(config))
+            for config in configs
+        ]
+        if not rows:
+            return 0
+        cursor = conn.cursor()
+        inserted = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO crawl_tasks (run_id, feed_title, config)
+            VALUES %s
+            ON CONFLICT (feed_title) WHERE status IN ('pending', 'running') DO NOTHING
+            RETURNING id
+        """, rows, fetch=True)
+        conn.commit()
+        cursor.close()
+        return len(inserted)
+
+    def claim(self, conn, worker_id: str) -> Optional[Dict]:
+        """Claims the oldest pending task, or returns None if there is none."""
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            UPDATE crawl_tasks SET
+                status = 'running',
+                attempts = attempts + 1,
+                claimed_by = %s,
+                claimed_at = CURRENT_TIMESTAMP,
+                heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM crawl_tasks
+                WHERE status = 'pending'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, run_id, feed_title, config, attempts
+        """, (worker_id,))
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+        return dict(row) if row else None
+
+    def finish(self, conn, task: Dict, status: str, error: Optional[str] = None):
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_tasks SET
+                status = %s,
+                last_error = %s,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (status, error, task['id']))
+        conn.commit()
+        cursor.close()
+
+    def heartbeat(self, conn, worker_id: str):
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_tasks SET heartbeat_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND claimed_by = %s
+        """, (worker_id,))
+        conn.commit()
+        cursor.close()
+
+    def release_stale(self, conn, stale_after_seconds: float = STALE_CLAIM_SECONDS) -> int:
+        """Requeues tasks whose worker stopped heartbeating, failing them after max_attempts."""
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_tasks SET
+                status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                last_error = 'Worker ' || COALESCE(claimed_by, 'unknown') || ' stopped responding',
+                claimed_by = NULL,
+                finished_at = CASE WHEN attempts >= %s THEN CURRENT_TIMESTAMP END
+            WHERE status = 'running'
+              AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        """, (self.max_attempts, self.max_attempts, stale_after_seconds))
+        released = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return released
+
+    def has_outstanding(self, conn) -> bool:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM crawl_tasks WHERE status IN ('pending', 'running'))")
+        outstanding = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        return outstanding
+
+    def finished_runs(self, conn) -> List[int]:
+        """
+        Runs still marked running in the ledger whose feed tasks have all finished and
+        whose PDF jobs are neither running nor due. Jobs waiting out a retry backoff or a
+        token budget deferral do not hold their run open; whatever they do later is
+        added to the closed run's totals.
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT r.id FROM crawl_runs r
+            WHERE r.status = 'running'
+              AND EXISTS (SELECT 1 FROM crawl_tasks t WHERE t.run_id = r.id)
+              AND NOT EXISTS (
+                  SELECT 1 FROM crawl_tasks t
+                  WHERE t.run_id = r.id AND t.status IN ('pending', 'running')
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM pdf_jobs j
+                  WHERE j.run_id = r.id
+                    AND (j.status = 'running'
+                         OR (j.status = 'pending' AND j.next_attempt_at <= CURRENT_TIMESTAMP))
+              )
+        """)
+        run_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        cursor.close()
+        return run_ids
+
+
+class Heartbeat:
+    """
+    Refreshes heartbeat_at on every row a worker has claimed, from a background thread
+    with its own connection, so long-running tasks are not mistaken for abandoned ones.
+
+    Usable as a context manager around the work it should cover.
+    """
+
+    def __init__(self, connect: Callable, worker_id: str, queues: Iterable,
+                 logger: logging.Logger, interval: float = HEARTBEAT_INTERVAL_SECONDS):
+        self._connect = connect
+        self.worker_id = worker_id
+        self.queues = list(queues)
+        self.logger = logger
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        conn = None
+        while not self._stop.wait(self.interval):
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                for queue in self.queues:
+                    queue.heartbeat(conn, self.worker_id)
+            except psycopg2.Error as e:
+                self.logger.error("Heartbeat for worker %s failed: %s", self.worker_id, e)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def start(self) -> 'Heartbeat':
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"heartbeat-{self.worker_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'Heartbeat':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
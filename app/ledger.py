@@ -0,0 +1,281 @@
+import json
+import logging
+import threading
+from typing import Dict, Optional
+
+import psycopg2
+
+
+LEDGER_COUNTERS = (
+    'links_seen',
+    'new_links',
+    'pdfs_processed',
+    'bytes_downloaded',
+    'llm_calls',
+    'llm_tokens',
+    'pdfs_deferred',
+    'failures',
+)
+
+
+class CrawlStats:
+    """Thread-safe counters and per-stage timings collected while crawling one feed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {name: 0 for name in LEDGER_COUNTERS}
+        self.stage_seconds: Dict[str, float] = {}
+
+    def add(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def add_stage_time(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                'stage_seconds': {stage: round(seconds, 6)
+                                  for stage, seconds in self.stage_seconds.items()},
+            }
+
+
+class CrawlLedger:
+    """
+    Records crawl runs and per-feed results in the crawl_runs and crawl_feed_runs tables.
+
+    Ledger writes never abort a crawl: database errors are logged and the run continues.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_runs (
+                id SERIAL PRIMARY KEY,
+                started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                status TEXT NOT NULL DEFAULT 'running',
+                feeds_total INTEGER NOT NULL DEFAULT 0,
+                feeds_failed INTEGER NOT NULL DEFAULT 0,
+                links_seen INTEGER NOT NULL DEFAULT 0,
+                new_links INTEGER NOT NULL DEFAULT 0,
+                pdfs_processed INTEGER NOT NULL DEFAULT 0,
+                bytes_downloaded BIGINT NOT NULL DEFAULT 0,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_feed_runs (
+                id SERIAL PRIMARY KEY,
+                run_id INTEGER NOT NULL REFERENCES crawl_runs(id) ON DELETE CASCADE,
+                feed_title TEXT NOT NULL,
+                started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                status TEXT NOT NULL DEFAULT 'running',
+                links_seen INTEGER NOT NULL DEFAULT 0,
+                new_links INTEGER NOT NULL DEFAULT 0,
+                pdfs_processed INTEGER NOT NULL DEFAULT 0,
+                bytes_downloaded BIGINT NOT NULL DEFAULT 0,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                stage_seconds JSONB NOT NULL DEFAULT '{}'::jsonb,
+                error TEXT
+            )
+        """)
+        # LLM token accounting: tokens used, documents deferred for lack of budget, and
+        # the budget the run was given (NULL when unlimited)
+        for table in ('crawl_runs', 'crawl_feed_runs'):
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS llm_tokens BIGINT NOT NULL DEFAULT 0,
+                    ADD COLUMN IF NOT EXISTS pdfs_deferred INTEGER NOT NULL DEFAULT 0
+            """)
+        cursor.execute("ALTER TABLE crawl_runs ADD COLUMN IF NOT EXISTS llm_token_budget BIGINT")
+        # Estimated tokens of documents being cleaned, reserved against a shared budget
+        cursor.execute("""
+            ALTER TABLE crawl_runs
+                ADD COLUMN IF NOT EXISTS llm_tokens_reserved BIGINT NOT NULL DEFAULT 0
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_crawl_feed_runs_run
+            ON crawl_feed_runs (run_id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_crawl_feed_runs_feed
+            ON crawl_feed_runs (feed_title, started_at DESC)
+        """)
+
+    def start_run(self, conn, feeds_total: int, llm_token_budget: int = 0) -> Optional[int]:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO crawl_runs (feeds_total, llm_token_budget) VALUES (%s, %s) RETURNING id",
+                (feeds_total, llm_token_budget or None)
+            )
+            run_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            return run_id
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record crawl run start: %s", e)
+            return None
+
+    def start_feed(self, conn, run_id: Optional[int], feed_title: str) -> Optional[int]:
+        if run_id is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO crawl_feed_runs (run_id, feed_title) VALUES (%s, %s) RETURNING id",
+                (run_id, feed_title)
+            )
+            feed_run_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            return feed_run_id
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record feed run start for '%s': %s", feed_title, e)
+            return None
+
+    def finish_feed(self, conn, feed_run_id: Optional[int], stats: CrawlStats,
+                    status: str, error: Optional[str] = None):
+        if feed_run_id is None:
+            return
+        snapshot = stats.snapshot()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE crawl_feed_runs SET
+                    finished_at = CURRENT_TIMESTAMP,
+                    status = %s,
+                    links_seen = %s,
+                    new_links = %s,
+                    pdfs_processed = %s,
+                    bytes_downloaded = %s,
+                    llm_calls = %s,
+                    llm_tokens = %s,
+                    pdfs_deferred = %s,
+                    failures = %s,
+                    stage_seconds = %s::jsonb,
+                    error = %s
+                WHERE id = %s
+            """, (
+                status,
+                snapshot['links_seen'],
+                snapshot['new_links'],
+                snapshot['pdfs_processed'],
+                snapshot['bytes_downloaded'],
+                snapshot['llm_calls'],
+                snapshot['llm_tokens'],
+                snapshot['pdfs_deferred'],
+                snapshot['failures'],
+                json.dumps(snapshot['stage_seconds']),
+                error,
+                feed_run_id
+            ))
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record feed run %s: %s", feed_run_id, e)
+
+    def add_feed_stats(self, conn, run_id: Optional[int], feed_run_id: Optional[int],
+                       stats: CrawlStats):
+        """
+        Adds work done for a feed after its crawl, such as PDF jobs run by queue workers,
+        to the feed's ledger entry. If the run has already been closed, its totals are
+        updated too, except llm_tokens, which closed runs keep as recorded.
+        """
+        if feed_run_id is None:
+            return
+        snapshot = stats.snapshot()
+        counters = [snapshot[name] for name in LEDGER_COUNTERS]
+        if not any(counters) and not snapshot['stage_seconds']:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                UPDATE crawl_feed_runs SET
+                    {', '.join(f"{name} = {name} + %s" for name in LEDGER_COUNTERS)},
+                    stage_seconds = (
+                        SELECT COALESCE(jsonb_object_agg(stage, seconds), '{{}}'::jsonb)
+                        FROM (
+                            SELECT stage, round(SUM(seconds::numeric), 6) AS seconds
+                            FROM (
+                                SELECT * FROM jsonb_each_text(stage_seconds)
+                                UNION ALL
+                                SELECT * FROM jsonb_each_text(%s::jsonb)
+                            ) AS s(stage, seconds)
+                            GROUP BY stage
+                        ) t
+                    )
+                WHERE id = %s
+            """, counters + [json.dumps(snapshot['stage_seconds']), feed_run_id])
+            late = [name for name in LEDGER_COUNTERS if name != 'llm_tokens']
+            cursor.execute(f"""
+                UPDATE crawl_runs SET
+                    {', '.join(f"{name} = {name} + %s" for name in late)}
+                WHERE id = %s AND status <> 'running'
+            """, [snapshot[name] for name in late] + [run_id])
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record work for feed run %s: %s", feed_run_id, e)
+
+    def finish_run(self, conn, run_id: Optional[int], status: str = 'completed',
+                   llm_tokens: Optional[int] = None, tokens_recorded: bool = False):
+        """
+        Closes a run, rolling its feed results up into run-level totals. `llm_tokens`
+        overrides the summed token count when the caller tracked the whole run, including
+        work done outside any feed such as revalidation. With `tokens_recorded` the run
+        keeps the llm_tokens already accumulated in its row by a shared token budget.
+        """
+        if run_id is None:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE crawl_runs r SET
+                    finished_at = CURRENT_TIMESTAMP,
+                    status = %s,
+                    feeds_failed = t.feeds_failed,
+                    links_seen = t.links_seen,
+                    new_links = t.new_links,
+                    pdfs_processed = t.pdfs_processed,
+                    bytes_downloaded = t.bytes_downloaded,
+                    llm_calls = t.llm_calls,
+                    llm_tokens = CASE WHEN %s THEN r.llm_tokens
+                                      ELSE COALESCE(%s, t.llm_tokens) END,
+                    pdfs_deferred = t.pdfs_deferred,
+                    failures = t.failures
+                FROM (
+                    SELECT
+                        COUNT(*) FILTER (WHERE status <> 'completed') AS feeds_failed,
+                        COALESCE(SUM(links_seen), 0) AS links_seen,
+                        COALESCE(SUM(new_links), 0) AS new_links,
+                        COALESCE(SUM(pdfs_processed), 0) AS pdfs_processed,
+                        COALESCE(SUM(bytes_downloaded), 0) AS bytes_downloaded,
+                        COALESCE(SUM(llm_calls), 0) AS llm_calls,
+                        COALESCE(SUM(llm_tokens), 0) AS llm_tokens,
+                        COALESCE(SUM(pdfs_deferred), 0) AS pdfs_deferred,
+                        COALESCE(SUM(failures), 0) AS failures
+                    FROM crawl_feed_runs
+                    WHERE run_id = %s
+                ) t
+                WHERE r.id = %s
+            """, (status, tokens_recorded, llm_tokens, run_id, run_id))
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record crawl run %s completion: %s", run_id, e)
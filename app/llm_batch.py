@@ -0,0 +1,199 @@
+"""
+Cross-document packing of LLM cleanup requests.
+
+Most agenda PDFs are a page or two long, so a cleanup call per document is dominated by
+per-request latency. CleanupBatcher collects texts submitted from any crawl thread and
+sends them to the LLM together, each wrapped in numbered section markers, up to a token
+budget. The response is split back into sections and each one is checked; texts whose
+section is missing or implausible are cleaned again with an individual call.
+"""
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+# Rough average for English text; only used to size packed requests
+CHARS_PER_TOKEN = 4
+
+# A cleaned section shorter than this fraction of its input is assumed to be truncated
+MIN_SECTION_RATIO = 0.3
+
+_SECTION_RE = re.compile(
+    r'<<<SECTION (\d+)>>>\s*(.*?)\s*<<<END SECTION \1>>>', re.DOTALL)
+_MARKER_RE = re.compile(r'<<<(?:END )?SECTION \d+>>>')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+class CleanupError(Exception):
+    """
+    Raised by CleanupBatcher.clean_many when a text could not be cleaned. `tokens` is
+    what the calls made for all of its texts used, including those that succeeded.
+    """
+
+    def __init__(self, error: BaseException, tokens: int):
+        super().__init__(str(error))
+        self.tokens = tokens
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_sections(texts: List[str]) -> str:
+    """Joins texts into one request body, each between numbered section markers."""
+    return '\n\n'.join(
+        f"<<<SECTION {number}>>>\n{text.strip()}\n<<<END SECTION {number}>>>"
+        for number, text in enumerate(texts, start=1)
+    )
+
+
+def unpack_sections(response: str, texts: List[str]) -> List[Optional[str]]:
+    """
+    Splits a packed response back into one cleaned text per input. Sections that are
+    missing, repeated, empty, still contain markers or lost most of their text are None.
+    """
+    found = {}
+    repeated = set()
+    for match in _SECTION_RE.finditer(response):
+        number = int(match.group(1))
+        if number in found:
+            repeated.add(number)
+        found[number] = match.group(2)
+
+    sections = []
+    for number, text in enumerate(texts, start=1):
+        section = found.get(number)
+        if number in repeated or not section or _MARKER_RE.search(section):
+            sections.append(None)
+            continue
+        cleaned_chars = len(_TAG_RE.sub('', section).strip())
+        if cleaned_chars < MIN_SECTION_RATIO * len(text.strip()):
+            sections.append(None)
+            continue
+        sections.append(section)
+    return sections
+
+
+class _Request:
+    __slots__ = ('text', 'tokens', 'done', 'result', 'used', 'error')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.used = 0
+        self.error: Optional[BaseException] = None
+
+
+class CleanupBatcher:
+    """
+    Packs cleanup requests from concurrent threads into shared LLM calls.
+
+    `invoke_packed(body, count)` cleans a packed body of `count` sections and
+    `invoke_single(text)` cleans one text; both return the cleaned text with the tokens
+    the call used, and raise on failure. The tokens of a packed call are shared between
+    its texts in proportion to their size. Texts estimated at more than half of
+    `max_tokens` are sent on their own. A pending batch is sent once it is full or its
+    oldest request has waited `linger` seconds, by whichever submitting thread notices
+    first.
+    """
+
+    def __init__(self, invoke_packed: Callable[[str, int], Tuple[str, int]],
+                 invoke_single: Callable[[str], Tuple[str, int]],
+                 max_tokens: int = 3000, max_sections: int = 8, linger: float = 0.25,
+                 on_fallback: Optional[Callable[[int], None]] = None):
+        self.invoke_packed = invoke_packed
+        self.invoke_single = invoke_single
+        self.max_tokens = max_tokens
+        self.max_sections = max(1, max_sections)
+        self.linger = linger
+        self.on_fallback = on_fallback
+        self._pending: List[_Request] = []
+        self._pending_tokens = 0
+        self._lock = threading.Lock()
+
+    def clean(self, text: str) -> Tuple[str, int]:
+        """Cleans one text, possibly in a request shared with other texts."""
+        return self.clean_many([text])[0]
+
+    def clean_many(self, texts: List[str]) -> List[Tuple[str, int]]:
+        """
+        Cleans several texts, such as the chunks of one long document, packing them with
+        each other and with texts submitted by other threads. Returns each cleaned text
+        with its share of the tokens used. If any text's individual call fails, waits for
+        the rest and raises CleanupError from the first error.
+        """
+        requests = [_Request(text) for text in texts]
+        for request in requests:
+            if request.tokens * 2 > self.max_tokens:
+                self._run_single(request)
+                continue
+            with self._lock:
+                ready = self._add(request)
+            for batch in ready:
+                self._run(batch)
+
+        error = None
+        for request in requests:
+            if not request.done.wait(self.linger):
+                with self._lock:
+                    ready = self._take() if request in self._pending else None
+                if ready:
+                    self._run(ready)
+                request.done.wait()
+            if error is None:
+                error = request.error
+        if error is not None:
+            raise CleanupError(error, sum(request.used for request in requests)) from error
+        return [(request.result, request.used) for request in requests]
+
+    def _add(self, request: _Request) -> List[List[_Request]]:
+        """Queues a request, returning the batches the caller must now send."""
+        ready = []
+        if self._pending and self._pending_tokens + request.tokens > self.max_tokens:
+            ready.append(self._take())
+        self._pending.append(request)
+        self._pending_tokens += request.tokens
+        if len(self._pending) >= self.max_sections:
+            ready.append(self._take())
+        return ready
+
+    def _take(self) -> List[_Request]:
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        return batch
+
+    def _run(self, batch: List[_Request]):
+        if len(batch) == 1:
+            self._run_single(batch[0])
+            return
+
+        texts = [request.text for request in batch]
+        try:
+            response, used = self.invoke_packed(pack_sections(texts), len(texts))
+            sections = unpack_sections(response, texts)
+        except Exception:
+            sections = [None] * len(batch)
+        else:
+            estimated = sum(request.tokens for request in batch)
+            for request in batch:
+                request.used = used * request.tokens // estimated
+
+        failed = 0
+        for request, section in zip(batch, sections):
+            if section is None:
+                failed += 1
+                self._run_single(request)
+            else:
+                request.result = section
+                request.done.set()
+        if failed and self.on_fallback is not None:
+            self.on_fallback(failed)
+
+    def _run_single(self, request: _Request):
+        try:
+            request.result, used = self.invoke_single(request.text)
+            request.used += used
+        except Exception as e:
+            request.error = e
+        finally:
+            request.done.set()
@@ -0,0 +1,172 @@
+"""
+Logging setup shared by the crawler, the crawl workers and the API.
+
+Loggers get a single QueueHandler; a QueueListener thread per logger does the console
+and file I/O, so a thread that logs only pays for building the record. The level and
+output are taken from the environment unless given explicitly:
+
+- LOG_LEVEL: level name or number (default INFO)
+- LOG_FORMAT: 'text' (default) or 'json', one object per line
+- LOG_ASYNC: set to 0 to write from the logging thread, as before the queue was added
+"""
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def level_from_env(default: int = logging.INFO) -> int:
+    """Returns the level named by LOG_LEVEL, or `default` if it is unset or unknown."""
+    value = os.getenv('LOG_LEVEL', '').strip()
+    if not value:
+        return default
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    return level if isinstance(level, int) else default
+
+
+def json_from_env() -> bool:
+    return os.getenv('LOG_FORMAT', 'text').strip().lower() == 'json'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object, including any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Merges the message arguments and renders any traceback before the record is queued,
+    as the stock handler does, but leaves the final formatting to the listener's
+    handlers so that the JSON formatter still sees the bare message and extras.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """
+    Passes one in every 1/`rate` enabled calls on to `logger`, for debug events logged
+    once per link or request. A rate of 1 passes everything and 0 drops everything.
+    Calls are dropped before a record is built, so a sampled-out call costs about as
+    much as a disabled one. Passed records carry `sample_rate` so a reader can scale
+    counts back up.
+    """
+
+    def __init__(self, logger: logging.Logger, rate: float):
+        super().__init__(logger, {})
+        self.rate = min(1.0, max(0.0, rate))
+        self._every = round(1 / self.rate) if self.rate else 0
+        self._counter = itertools.count()
+
+    def isEnabledFor(self, level: int) -> bool:
+        if not self._every or not self.logger.isEnabledFor(level):
+            return False
+        return self._every == 1 or next(self._counter) % self._every == 0
+
+    def process(self, msg, kwargs):
+        if self._every > 1:
+            kwargs['extra'] = {**kwargs.get('extra', {}), 'sample_rate': self.rate}
+        return msg, kwargs
+
+
+def _stop_listener(name: str):
+    listener = _listeners.pop(name, None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _stop_all_listeners():
+    with _listeners_lock:
+        for name in list(_listeners):
+            _stop_listener(name)
+
+
+atexit.register(_stop_all_listeners)
+
+
+def configure_logger(name: str, log_file: Optional[str] = None, level: Optional[int] = None,
+                     json_format: Optional[bool] = None, fmt: str = DEFAULT_FORMAT,
+                     console: bool = True, max_bytes: int = 1_000_000,
+                     backup_count: int = 5) -> logging.Logger:
+    """
+    Configures the named logger to write to the console and to a rotating `log_file`
+    through a background QueueListener. Calling it again for the same name replaces the
+    previous handlers and stops their listener, flushing what it had queued.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level_from_env() if level is None else level)
+    if json_format is None:
+        json_format = json_from_env()
+    formatter = JsonFormatter() if json_format else logging.Formatter(fmt)
+
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    with _listeners_lock:
+        _stop_listener(name)
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+
+        if os.getenv('LOG_ASYNC', '1') == '0':
+            for handler in handlers:
+                logger.addHandler(handler)
+            return logger
+
+        records: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(_QueueHandler(records))
+    return logger
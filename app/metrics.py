@@ -0,0 +1,432 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2.extensions
+import psycopg2.extras
+
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+DEFAULT_SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864
+)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape_label_value(value)}"'
+             for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _state(self) -> List:
+        """The metric's values as JSON-serializable [label values, value] pairs."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def _merge(self, key: Tuple, value):
+        """Adds a value from another process's snapshot."""
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock duration of the enclosed block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _state(self) -> List:
+        with self._lock:
+            return [[list(key), [[*state[0]], state[1], state[2]]]
+                    for key, state in self._values.items()]
+
+    def _merge(self, key: Tuple, value):
+        bucket_counts, total, count = value
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = state
+            state[0] = [a + b for a, b in zip(state[0], bucket_counts)]
+            state[1] += total
+            state[2] += count
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2]))
+                           for key, state in self._values.items())
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    An in-process collection of metrics rendered in the Prometheus text exposition format.
+
+    Each process (e.g. every gunicorn worker) keeps its own registry. Processes on one
+    host can share() theirs through a directory of snapshots, which render_shared()
+    adds up, so a scrape of any of them reports all of them.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], None]] = []
+        self._shared_path: Optional[str] = None
+        self._share_lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Optional[Iterable[float]] = None) -> Histogram:
+        return self._register(Histogram(
+            name, documentation, labelnames, buckets or DEFAULT_LATENCY_BUCKETS))
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Registers a function that updates metrics, such as gauges, before they are read."""
+        self._collectors.append(collector)
+
+    def _collect(self) -> List[_Metric]:
+        for collector in self._collectors:
+            collector()
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._collect():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """The registry's metrics and values as a JSON-serializable dict."""
+        return {
+            metric.name: {
+                'type': metric.metric_type,
+                'documentation': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())[:-1]),
+                'values': metric._state(),
+            }
+            for metric in self._collect()
+        }
+
+    def share(self, directory: str, interval: float = 10.0):
+        """
+        Writes this process's metrics to a snapshot file in `directory` every `interval`
+        seconds and at exit, for render_shared() in other processes to include.
+        """
+        os.makedirs(directory, exist_ok=True)
+        # The random part keeps a later process that reuses the pid from overwriting it
+        self._shared_path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+
+        def write_periodically():
+            while self._shared_path is not None:
+                self.write_snapshot()
+                time.sleep(interval)
+
+        def write_final():
+            self.write_snapshot()
+            # Stops the thread, which could otherwise be cut off mid-write at shutdown
+            with self._share_lock:
+                self._shared_path = None
+
+        threading.Thread(target=write_periodically, name='metrics-share', daemon=True).start()
+        atexit.register(write_final)
+
+    def write_snapshot(self):
+        with self._share_lock:
+            if self._shared_path is None:
+                return
+            temporary = f"{self._shared_path}.tmp"
+            with open(temporary, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temporary, self._shared_path)
+
+    def render_shared(self, directory: str) -> str:
+        """
+        Renders the metrics of every process sharing `directory`, this one included.
+
+        Counters and histograms are summed over all snapshots, including those of
+        processes that have exited, so totals never go backwards when a gunicorn worker
+        is replaced. Snapshots of exited processes are folded into retired.json, which
+        keeps only those. Gauges are summed over live processes. Processes are told
+        apart by pid, so the directory must not be shared between hosts or containers.
+        """
+        merged = MetricsRegistry()
+        with open(os.path.join(directory, '.lock'), 'a') as lock:
+            # One reader at a time, so no snapshot is counted both on its own and retired
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(directory, 'retired.json')
+            retired = MetricsRegistry()
+            retired._merge_snapshot(self._load_snapshot(retired_path) or {}, live=False)
+            dead = []
+            for path in glob.glob(os.path.join(directory, '*-*.json*')):
+                if path == self._shared_path:
+                    continue
+                pid = os.path.basename(path).split('-', 1)[0]
+                alive = pid.isdigit() and _process_alive(int(pid))
+                if path.endswith('.tmp'):
+                    if not alive:
+                        # Left by a process killed while writing
+                        os.remove(path)
+                    continue
+                snapshot = self._load_snapshot(path)
+                if snapshot is None:
+                    continue
+                if alive:
+                    merged._merge_snapshot(snapshot, live=True)
+                else:
+                    retired._merge_snapshot(snapshot, live=False)
+                    dead.append(path)
+            if dead:
+                temporary = f"{retired_path}.tmp"
+                with open(temporary, 'w') as f:
+                    json.dump(retired.snapshot(), f)
+                os.replace(temporary, retired_path)
+                for path in dead:
+                    os.remove(path)
+        merged._merge_snapshot(retired.snapshot(), live=False)
+        merged._merge_snapshot(self.snapshot(), live=True)
+        return merged.render()
+
+    @staticmethod
+    def _load_snapshot(path: str) -> Optional[Dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _merge_snapshot(self, snapshot: Dict, live: bool):
+        """Adds a snapshot's values; gauges only if it comes from a live process."""
+        for name, data in snapshot.items():
+            if data['type'] == 'gauge' and not live:
+                continue
+            try:
+                if data['type'] == 'histogram':
+                    metric = self.histogram(
+                        name, data['documentation'], data['labelnames'], data['buckets'])
+                elif data['type'] == 'gauge':
+                    metric = self.gauge(name, data['documentation'], data['labelnames'])
+                else:
+                    metric = self.counter(name, data['documentation'], data['labelnames'])
+            except ValueError:
+                # Registered differently by another version of the code
+                continue
+            for key, value in data['values']:
+                metric._merge(tuple(key), value)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def serve_metrics(port: int, registry: MetricsRegistry = REGISTRY,
+                  host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """
+    Serves `registry` at /metrics on `port` from a daemon thread, for processes such as
+    crawl workers that have no web server of their own.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'db_query_duration_seconds',
+    'Time spent executing PostgreSQL statements',
+    ['component']
+)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """A cursor that records the duration of every statement it executes."""
+
+    component = 'crawler'
+
+    def execute(self, query, vars=None):
+        with DB_QUERY_SECONDS.time(component=self.component):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with DB_QUERY_SECONDS.time(component=self.component):
+            return super().executemany(query, vars_list)
+
+
+class TimedDictCursor(psycopg2.extras.RealDictCursor):
+    """A RealDictCursor that records the duration of every statement it executes."""
+
+    component = 'api'
+
+    def execute(self, query, vars=None):
+        with DB_QUERY_SECONDS.time(component=self.component):
+            return super().execute(query, vars)
@@ -0,0 +1,47 @@
+"""
+Offline re-extraction of archived PDFs.
+
+Re-runs text extraction, OCR and LLM cleanup over the raw copies kept in the document
+archive (PDF_ARCHIVE_DIR) and updates the stored text and metadata, without requesting
+anything from the sites the documents came from. Use it after improving OCR or the
+cleanup prompt.
+
+Usage:
+    python -m app.reprocess [--feed TITLE] [--since 2024-01-01] [--until 2024-07-01]
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime
+
+from app.scraper import crawler_from_env
+
+
+def _date(value: str) -> datetime:
+    return datetime.combine(date.fromisoformat(value), datetime.min.time())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='crawler_config.json', help='Crawler config file')
+    parser.add_argument('--log-file', default='logs/web_rss_crawler.log')
+    parser.add_argument('--feed', help='Only reprocess documents of this feed')
+    parser.add_argument('--since', type=_date,
+                        help='Only documents first processed on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--until', type=_date,
+                        help='Only documents first processed before this date (YYYY-MM-DD)')
+    parser.add_argument('--limit', type=int, help='Reprocess at most this many documents')
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.getenv('PDF_JOB_CONCURRENCY', '4')),
+                        help='Documents extracted and cleaned at once')
+    args = parser.parse_args()
+
+    crawler = crawler_from_env(
+        args.config, log_file=args.log_file, pdf_job_concurrency=args.concurrency)
+    counts = crawler.reprocess_archive(
+        feed_title=args.feed, since=args.since, until=args.until, limit=args.limit)
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    main()
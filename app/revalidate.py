@@ -0,0 +1,42 @@
+"""
+Revalidation of stored PDFs against their origin.
+
+Sends conditional requests (If-None-Match / If-Modified-Since) for stored documents not
+checked within PDF_REVALIDATE_SECONDS and re-extracts only those whose bytes changed,
+keeping the replaced version in pdf_versions. Inline crawls run a batch of
+PDF_REVALIDATE_BATCH documents after the feeds; this command runs one on demand.
+
+Usage:
+    python -m app.revalidate [--feed TITLE] [--older-than SECONDS] [--limit 500]
+"""
+import argparse
+import json
+import os
+
+from app.scraper import crawler_from_env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='crawler_config.json', help='Crawler config file')
+    parser.add_argument('--log-file', default='logs/web_rss_crawler.log')
+    parser.add_argument('--feed', help='Only revalidate documents of this feed')
+    parser.add_argument('--older-than', type=float,
+                        help='Only documents not checked for this many seconds '
+                             '(default PDF_REVALIDATE_SECONDS)')
+    parser.add_argument('--limit', type=int,
+                        help='Revalidate at most this many documents (default PDF_REVALIDATE_BATCH)')
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.getenv('PDF_JOB_CONCURRENCY', '4')),
+                        help='Documents revalidated at once')
+    args = parser.parse_args()
+
+    crawler = crawler_from_env(
+        args.config, log_file=args.log_file, pdf_job_concurrency=args.concurrency)
+    counts = crawler.revalidate_documents(
+        feed_title=args.feed, older_than=args.older_than, limit=args.limit)
+    print(json.dumps(counts))
+
+
+if __name__ == '__main__':
+    main()
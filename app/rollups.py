@@ -0,0 +1,83 @@
+from typing import Dict
+
+
+ROLLUP_PERIODS = ('day', 'week', 'month')
+
+
+class ActivityRollups:
+    """
+    Per-feed, per-day activity totals kept in the feed_daily_stats table.
+
+    The crawler adds to the row of the current day in the same transaction that stores
+    new links or documents, so the rollups always agree with the stored data and
+    dashboard queries read a handful of rows per feed and day instead of the corpus.
+    """
+
+    @staticmethod
+    def create_tables(cursor):
+        """Creates feed_daily_stats, seeding it once from the links and documents already stored."""
+        cursor.execute("SELECT to_regclass('feed_daily_stats') IS NULL")
+        rollups_are_new = cursor.fetchone()[0]
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feed_daily_stats (
+                feed_title TEXT NOT NULL,
+                day DATE NOT NULL,
+                documents INTEGER NOT NULL DEFAULT 0,
+                pages BIGINT NOT NULL DEFAULT 0,
+                bytes BIGINT NOT NULL DEFAULT 0,
+                new_links INTEGER NOT NULL DEFAULT 0,
+                new_pdf_links INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (feed_title, day)
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_feed_daily_stats_day ON feed_daily_stats (day)")
+        if rollups_are_new:
+            cursor.execute("""
+                INSERT INTO feed_daily_stats (feed_title, day, new_links, new_pdf_links)
+                SELECT feed_title, first_seen::date, COUNT(*), COUNT(*) FILTER (WHERE is_pdf)
+                FROM all_links
+                WHERE first_seen IS NOT NULL
+                GROUP BY feed_title, first_seen::date
+            """)
+            cursor.execute("""
+                INSERT INTO feed_daily_stats (feed_title, day, documents, pages, bytes)
+                SELECT
+                    feed_title,
+                    date_processed::date,
+                    COUNT(*),
+                    COALESCE(SUM(number_of_pages), 0),
+                    COALESCE(SUM(file_size_bytes), 0)
+                FROM pdf_content
+                WHERE date_processed IS NOT NULL
+                GROUP BY feed_title, date_processed::date
+                ON CONFLICT (feed_title, day) DO UPDATE SET
+                    documents = EXCLUDED.documents,
+                    pages = EXCLUDED.pages,
+                    bytes = EXCLUDED.bytes
+            """)
+
+    @staticmethod
+    def _add(cursor, feed_title: str, totals: Dict[str, int]):
+        columns = list(totals)
+        cursor.execute(f"""
+            INSERT INTO feed_daily_stats (feed_title, day, {', '.join(columns)})
+            VALUES (%s, CURRENT_DATE, {', '.join(['%s'] * len(columns))})
+            ON CONFLICT (feed_title, day) DO UPDATE SET
+                {', '.join(f'{column} = feed_daily_stats.{column} + EXCLUDED.{column}'
+                           for column in columns)},
+                updated_at = CURRENT_TIMESTAMP
+        """, (feed_title, *totals.values()))
+
+    @classmethod
+    def record_links(cls, cursor, feed_title: str, new_links: int, new_pdf_links: int):
+        """Adds newly discovered links to today's row. Call inside the inserting transaction."""
+        if new_links:
+            cls._add(cursor, feed_title, {'new_links': new_links, 'new_pdf_links': new_pdf_links})
+
+    @classmethod
+    def record_document(cls, cursor, feed_title: str, pages: int, size_bytes: int):
+        """Adds a newly stored document to today's row. Call inside the inserting transaction."""
+        cls._add(cursor, feed_title,
+                 {'documents': 1, 'pages': pages or 0, 'bytes': size_bytes or 0})
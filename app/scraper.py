@@ -3,49 +3,312 @@ import requests
 from bs4 import BeautifulSoup
 import feedgen.feed
 import logging
-import logging.handlers
-from typing import Dict, List, Set
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 import time
 import random
 import os
+import threading
 import psycopg2
 import psycopg2.extras
-import PyPDF2
-import io
+import re
+import html
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from app.archive import DocumentArchive
+from app.bloom import BloomFilter
+from app.budget import TokenBudget, TokenBudgetExceeded, estimate_cleanup_tokens, measure_tokens
+from app.changes import ChangeLog
+from app.dedup import DEFAULT_THRESHOLD, NearDuplicateIndex, chunk_digest, split_chunks
+from app.ledger import CrawlLedger, CrawlStats
+from app.metrics import REGISTRY, DEFAULT_SIZE_BUCKETS, TimedCursor
+from app.encoding import write_gzip_sibling
+from app.extraction import ExtractionError, ExtractionPool
+from app.llm_batch import CleanupBatcher, CleanupError, estimate_tokens
+from app.throttle import HostThrottle, HostThrottled
+from app.urls import canonicalize_url, matches_any
+from app.rollups import ActivityRollups
+from app.stream import notify_new_article
+from app.log import SampledLogger, configure_logger
+from app.jobs import (
+    STALE_CLAIM_SECONDS, CrawlTaskQueue, Heartbeat, PDFJobError, PDFJobQueue, make_worker_id
+)
+
+
+LINK_DEDUP_MODES = ('memory', 'server', 'bloom')
+
+# Upper bound on pages fetched per feed when a config follows links (max_depth > 0)
+DEFAULT_MAX_PAGES = 50
+
+# Long texts are cleaned in chunks of this many characters
+LLM_CHUNK_CHARS = 4000  # Adjust based on your LLM's context window
+
+# Length of the plain-text excerpt stored with each document for list endpoints
+EXCERPT_CHARS = 500
+
+# Documents read per batch when filling in excerpts during the pdf_body migration
+MIGRATION_BATCH_ROWS = 1000
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def plain_text(content: str) -> str:
+    """Strips the HTML markup added by LLM cleanup and collapses whitespace."""
+    return _WHITESPACE_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', content or ''))).strip()
+
+
+def make_excerpt(content: str, limit: int = EXCERPT_CHARS) -> str:
+    """Returns the first `limit` characters of the plain text, cut at a word boundary."""
+    text = plain_text(content)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(' ', 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + '...'
+
+
+def check_link_dedup(mode: str) -> str:
+    """Returns `mode` if it is one of LINK_DEDUP_MODES, raising ValueError otherwise."""
+    if mode not in LINK_DEDUP_MODES:
+        raise ValueError(f"Invalid link_dedup mode '{mode}'. Expected one of {LINK_DEDUP_MODES}")
+    return mode
+
+
+def count_words(content: str) -> int:
+    """Counts the words of the plain text, as stored in pdf_content.word_count."""
+    text = plain_text(content)
+    return len(text.split(' ')) if text else 0
+
+
+CRAWL_STAGES = ('fetch', 'classify', 'download', 'extract', 'ocr', 'llm', 'insert')
+
+CRAWL_STAGE_SECONDS = REGISTRY.histogram(
+    'crawler_stage_duration_seconds',
+    'Wall-clock time spent in each crawler stage',
+    ['stage']
+)
+CRAWL_STAGE_FAILURES = REGISTRY.counter(
+    'crawler_stage_failures_total',
+    'Number of failed crawler stage executions',
+    ['stage']
+)
+CRAWL_PAGES_FETCHED = REGISTRY.counter(
+    'crawler_pages_fetched_total',
+    'Number of source pages fetched'
+)
+CRAWL_LINKS_SEEN = REGISTRY.counter(
+    'crawler_links_seen_total',
+    'Number of candidate links found on source pages'
+)
+CRAWL_LINKS_NEW = REGISTRY.counter(
+    'crawler_links_new_total',
+    'Number of links not previously stored for their feed'
+)
+CRAWL_LINKS_CLASSIFIED = REGISTRY.counter(
+    'crawler_links_classified_total',
+    'Number of links classified by content type',
+    ['content_type']
+)
+CRAWL_PDFS_PROCESSED = REGISTRY.counter(
+    'crawler_pdfs_processed_total',
+    'Number of PDFs processed',
+    ['result']
+)
+CRAWL_BYTES_DOWNLOADED = REGISTRY.counter(
+    'crawler_bytes_downloaded_total',
+    'Number of PDF bytes downloaded'
+)
+CRAWL_PDF_SIZE_BYTES = REGISTRY.histogram(
+    'crawler_pdf_size_bytes',
+    'Size of downloaded PDFs',
+    buckets=DEFAULT_SIZE_BUCKETS
+)
+CRAWL_OCR_PAGES = REGISTRY.counter(
+    'crawler_ocr_pages_total',
+    'Number of PDF pages run through OCR'
+)
+CRAWL_LLM_CALLS = REGISTRY.counter(
+    'crawler_llm_calls_total',
+    'Number of LLM cleanup requests',
+    ['result']
+)
+CRAWL_LLM_TOKENS = REGISTRY.counter(
+    'crawler_llm_tokens_total',
+    'Tokens used by LLM cleanup requests, as reported by OpenAI or estimated from text length'
+)
+CRAWL_LLM_CHUNKS = REGISTRY.counter(
+    'crawler_llm_chunks_total',
+    'Text chunks cleaned by the LLM, reused from a stored document, or left uncleaned after a failure',
+    ['result']
+)
+CRAWL_NEAR_DUPLICATES = REGISTRY.counter(
+    'crawler_near_duplicates_total',
+    'Documents found to be near-duplicates of a stored document'
+)
+CRAWL_LLM_PACKED_SECTIONS = REGISTRY.counter(
+    'crawler_llm_packed_sections_total',
+    'Texts sent in packed cleanup requests, and those re-sent alone after a bad response',
+    ['result']
+)
+CRAWL_EXTRACTIONS_FAILED = REGISTRY.counter(
+    'crawler_extractions_failed_total',
+    'Number of PDF extractions that failed, by reason (error, timeout, memory, crashed)',
+    ['reason']
+)
+CRAWL_PDF_JOBS = REGISTRY.counter(
+    'crawler_pdf_jobs_total',
+    'Number of PDF job attempts by outcome',
+    ['outcome']
+)
+CRAWL_REVALIDATIONS = REGISTRY.counter(
+    'crawler_revalidations_total',
+    'Number of stored PDFs revalidated against their origin, by outcome',
+    ['outcome']
+)
+
+# HTTP statuses worth retrying; any other 4xx means the document will never download
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+REVALIDATION_OUTCOMES = ('unchanged', 'changed', 'gone', 'failed', 'deferred')
+
+
+class PDFDownload(NamedTuple):
+    """A downloaded PDF and the validators its origin sent. `content` is None when not modified."""
+    content: Optional[bytes]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_length: Optional[int]
+
+
+class CleanedText(NamedTuple):
+    """
+    Text after LLM cleanup, the tokens spent on it, and where each raw chunk's cleaned
+    text sits in `content` as (digest, start, length). `chunks` is empty when the text
+    was not cleaned.
+    """
+    content: str
+    llm_tokens: int
+    chunks: List[Tuple[str, int, int]]
 
 
 class WebRSSCrawler:
     def __init__(
         self,
         config_file: str,
-        log_level: int = logging.INFO,
+        log_level: Optional[int] = None,
         log_file: str = 'logs/web_rss_crawler.log',
-        rss_directory: str = 'rss'
+        rss_directory: str = 'rss',
+        state_directory: str = 'state',
+        archive_directory: Optional[str] = 'archive',
+        link_dedup: str = 'memory',
+        pdf_job_concurrency: int = 4,
+        pdf_job_max_attempts: int = 6,
+        pdf_job_backoff_seconds: float = 900,
+        host_concurrency: float = 2,
+        host_max_concurrency: float = 8,
+        extract_timeout: float = 120,
+        extract_max_rss_mb: int = 1024,
+        extract_max_pages: int = 500,
+        revalidate_after_seconds: float = 7 * 86400,
+        revalidate_batch: int = 200,
+        link_log_sample_rate: float = 0.01,
+        llm_pack_max_tokens: int = 2500,
+        llm_pack_linger: float = 0.25,
+        llm_token_budget: int = 0,
+        llm_defer_seconds: float = 3600,
+        near_duplicate_threshold: float = DEFAULT_THRESHOLD
     ):
         # Load environment variables from .env file
         load_dotenv()
         self.logger = self._setup_logger(log_level, log_file)
+        # Debug events logged for every link and request are sampled so that running at
+        # DEBUG does not multiply log volume by the size of the crawl
+        self.link_logger = SampledLogger(self.logger, link_log_sample_rate)
 
         # Ensure that /logs and /rss directories exist
         self._ensure_directory_exists('logs')
         self._ensure_directory_exists(rss_directory)
 
         self.rss_directory = rss_directory
+        self.state_directory = state_directory
+
+        # Downloaded PDF bytes are kept in a content-addressed archive so documents can be
+        # re-extracted later without fetching them from origin again
+        self.archive = DocumentArchive(archive_directory) if archive_directory else None
+
+        # Per-thread crawl context, holding the stats of the feed being crawled
+        self._context = threading.local()
+        self.ledger = CrawlLedger(self.logger)
+
+        # How new links are detected: 'memory' loads every known link for the feed,
+        # 'server' anti-joins the page's candidates in Postgres, and 'bloom' adds an
+        # on-disk Bloom filter in front of the server-side anti-join.
+        self.link_dedup = check_link_dedup(link_dedup)
+
+        # PDFs are processed through the durable pdf_jobs queue, so failed downloads
+        # and extractions are retried with exponential backoff on later runs
+        self.pdf_jobs = PDFJobQueue(
+            self.logger,
+            max_attempts=pdf_job_max_attempts,
+            backoff_seconds=pdf_job_backoff_seconds
+        )
+        self.pdf_job_concurrency = max(1, pdf_job_concurrency)
+
+        # Feed crawls can also be queued as crawl_tasks and shared between worker
+        # processes; rows this crawler claims are tagged with its worker id
+        self.crawl_tasks = CrawlTaskQueue(self.logger)
+        self.worker_id = make_worker_id()
+
+        # Requests to each host are limited by AIMD concurrency control that adapts to
+        # latency, 429/503 responses and Retry-After; learned limits live in host_limits
+        self.throttle = HostThrottle(
+            self.logger,
+            initial_limit=host_concurrency,
+            max_limit=host_max_concurrency
+        )
+
+        # PDF parsing and OCR run in child processes with per-document time, memory and
+        # page limits; one child per concurrent PDF job, started on first use
+        self.extraction_pool = ExtractionPool(
+            size=self.pdf_job_concurrency,
+            timeout=extract_timeout,
+            max_rss_mb=extract_max_rss_mb,
+            max_pages=extract_max_pages
+        )
+
+        # Stored PDFs are revalidated with conditional requests once they have gone
+        # `revalidate_after_seconds` without a check, at most `revalidate_batch` per crawl;
+        # 0 disables revalidation during crawls
+        self.revalidate_after_seconds = revalidate_after_seconds
+        self.revalidate_batch = revalidate_batch
+
+        # Each run spends at most `llm_token_budget` tokens on cleanup (0 is unlimited).
+        # Documents that do not fit are deferred for `llm_defer_seconds`, past this run.
+        self.token_budget = TokenBudget(llm_token_budget)
+        self.llm_defer_seconds = llm_defer_seconds
+
+        # Documents whose MinHash similarity to an earlier one reaches this threshold are
+        # linked to it through duplicate_of and reuse its cleaned chunks; 0 turns this off
+        self.near_duplicate_threshold = near_duplicate_threshold
 
         self.logger.debug(
-            f"Attempting to load configuration from {config_file}")
+            "Attempting to load configuration from %s", config_file)
         try:
             with open(config_file, 'r') as f:
                 self.configs = json.load(f)
             self.logger.debug(
-                f"Successfully loaded configuration: {self.configs}")
+                "Successfully loaded configuration: %s", self.configs)
+            for config in self.configs:
+                if 'link_dedup' in config:
+                    check_link_dedup(config['link_dedup'])
         except Exception as e:
-            self.logger.error(f"Error loading config file: {e}")
+            self.logger.error("Error loading config file: %s", e)
             raise
 
         self._initialize_db()
@@ -88,20 +351,93 @@ class WebRSSCrawler:
                 llm=self.llm,
                 prompt=self.cleanup_prompt
             )
-            
+
+            # Prompt for several short texts packed into one request between section markers
+            self.packed_cleanup_prompt = PromptTemplate(
+                input_variables=["text", "count"],
+                template="""
+                You are a helpful assistant that makes PDF text more readable for web pages.
+                The text below contains {count} independent sections. Each section starts with
+                a line <<<SECTION n>>> and ends with a line <<<END SECTION n>>>.
+                Please clean up and format each section separately:
+                1. Fix any OCR errors or typos
+                2. Add proper paragraph breaks
+                3. Format any lists or tables appropriately
+                4. Remove any unnecessary line breaks or formatting artifacts
+                5. Maintain the original meaning and content
+                6. Use HTML formatting tags where appropriate
+
+                Return all {count} sections in the same order, each between the same
+                <<<SECTION n>>> and <<<END SECTION n>>> lines as its input. Do not merge,
+                split, drop or add sections, and do not move text between sections.
+
+                Here are the sections to clean up:
+                {text}
+                """
+            )
+
+            self.packed_cleanup_chain = LLMChain(
+                llm=self.llm,
+                prompt=self.packed_cleanup_prompt
+            )
+
             self.logger.info("Successfully initialized LLM for text cleanup")
         except Exception as e:
-            self.logger.error(f"Failed to initialize LLM: {e}")
+            self.logger.error("Failed to initialize LLM: %s", e)
             self.cleanup_chain = None
+            self.packed_cleanup_chain = None
+
+        # Short documents and chunks are packed into shared cleanup requests of up to
+        # `llm_pack_max_tokens` estimated input tokens; 0 sends every text on its own.
+        # With a single PDF worker there are no other threads to wait for.
+        self.cleanup_batcher = None
+        if llm_pack_max_tokens > 0:
+            self.cleanup_batcher = CleanupBatcher(
+                self._invoke_packed_cleanup,
+                self._invoke_cleanup,
+                max_tokens=llm_pack_max_tokens,
+                linger=llm_pack_linger if self.pdf_job_concurrency > 1 else 0,
+                on_fallback=lambda count: CRAWL_LLM_PACKED_SECTIONS.inc(count, result='fallback')
+            )
 
     def _ensure_directory_exists(self, directory: str):
         """Ensure that a directory exists; if not, create it."""
         try:
             os.makedirs(directory, exist_ok=True)
-            self.logger.debug(f"Ensured existence of directory: {directory}")
+            self.logger.debug("Ensured existence of directory: %s", directory)
         except Exception as e:
-            self.logger.error(f"Failed to create directory {directory}: {e}")
+            self.logger.error("Failed to create directory %s: %s", directory, e)
+            raise
+
+    @contextmanager
+    def _stage(self, stage: str):
+        """Times a crawler stage and records a failure if the block raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._stage_failed(stage)
             raise
+        finally:
+            self._observe_stage(stage, time.perf_counter() - start)
+
+    def _observe_stage(self, stage: str, elapsed: float):
+        """Records time spent in a stage, including time measured in a child process."""
+        CRAWL_STAGE_SECONDS.observe(elapsed, stage=stage)
+        stats = getattr(self._context, 'stats', None)
+        if stats is not None:
+            stats.add_stage_time(stage, elapsed)
+
+    def _stage_failed(self, stage: str):
+        """Counts a failed stage in the metrics and the current feed's ledger entry."""
+        CRAWL_STAGE_FAILURES.inc(stage=stage)
+        self._record('failures')
+
+    def _record(self, counter: str, amount: int = 1):
+        """Adds to a ledger counter of the feed currently being crawled on this thread."""
+        stats = getattr(self._context, 'stats', None)
+        if stats is not None:
+            stats.add(counter, amount)
 
     def _initialize_db(self):
         try:
@@ -125,14 +461,16 @@ class WebRSSCrawler:
                 )
             """)
 
-            # Create pdf_content table
+            # Create pdf_content table. The full document body lives in pdf_body so
+            # that list scans only touch the narrow metadata and excerpt columns.
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS pdf_content (
                     id SERIAL PRIMARY KEY,
                     feed_title TEXT NOT NULL,
                     source_link TEXT NOT NULL,
                     pdf_url TEXT NOT NULL,
-                    content TEXT,
+                    excerpt TEXT,
+                    word_count INTEGER,
                     title TEXT,
                     page_title TEXT,
                     author TEXT,
@@ -146,6 +484,77 @@ class WebRSSCrawler:
                 )
             """)
 
+            # Create pdf_body table holding the full cleaned text, keyed by pdf_content.id
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_body (
+                    id INTEGER PRIMARY KEY REFERENCES pdf_content(id) ON DELETE CASCADE,
+                    content TEXT
+                )
+            """)
+            self._migrate_pdf_body(cursor)
+
+            # SHA-256 of the downloaded bytes, naming the document in the raw archive
+            cursor.execute("ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS content_sha256 TEXT")
+            cursor.execute("ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS reprocessed_at TIMESTAMP")
+
+            # Tokens spent cleaning the stored text with the LLM
+            cursor.execute("ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS llm_tokens INTEGER")
+
+            # The earlier document a near-duplicate belongs to, and how similar their raw
+            # text is; the signatures, LSH buckets and cleaned chunks live in side tables
+            cursor.execute("""
+                ALTER TABLE pdf_content
+                    ADD COLUMN IF NOT EXISTS duplicate_of INTEGER
+                        REFERENCES pdf_content(id) ON DELETE SET NULL,
+                    ADD COLUMN IF NOT EXISTS duplicate_similarity REAL
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pdf_content_duplicate_of
+                ON pdf_content (duplicate_of) WHERE duplicate_of IS NOT NULL
+            """)
+            NearDuplicateIndex.create_tables(cursor)
+
+            # HTTP validators of the stored copy for conditional revalidation, and the
+            # version of the document, bumped whenever origin replaces its bytes
+            cursor.execute("""
+                ALTER TABLE pdf_content
+                    ADD COLUMN IF NOT EXISTS etag TEXT,
+                    ADD COLUMN IF NOT EXISTS last_modified TEXT,
+                    ADD COLUMN IF NOT EXISTS content_length BIGINT,
+                    ADD COLUMN IF NOT EXISTS last_validated_at TIMESTAMP,
+                    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1,
+                    ADD COLUMN IF NOT EXISTS content_changed_at TIMESTAMP
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pdf_content_validated
+                ON pdf_content ((COALESCE(last_validated_at, date_processed)))
+            """)
+
+            # Create pdf_versions, holding earlier versions of documents replaced at origin
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_versions (
+                    id SERIAL PRIMARY KEY,
+                    pdf_id INTEGER NOT NULL REFERENCES pdf_content(id) ON DELETE CASCADE,
+                    version INTEGER NOT NULL,
+                    content_sha256 TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_length BIGINT,
+                    title TEXT,
+                    author TEXT,
+                    creation_date TEXT,
+                    modification_date TEXT,
+                    number_of_pages INTEGER,
+                    file_size_bytes INTEGER,
+                    word_count INTEGER,
+                    excerpt TEXT,
+                    content TEXT,
+                    fetched_at TIMESTAMP,
+                    replaced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (pdf_id, version)
+                )
+            """)
+
             # Create seen_links table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS seen_links (
@@ -155,15 +564,121 @@ class WebRSSCrawler:
                 )
             """)
 
+            # Create crawl_runs and crawl_feed_runs ledger tables
+            CrawlLedger.create_tables(cursor)
+
+            # Create the pdf_jobs retry queue and the crawl_tasks work queue
+            PDFJobQueue.create_tables(cursor)
+            CrawlTaskQueue.create_tables(cursor)
+
+            # Create host_limits, holding per-host request limits learned by the throttle
+            HostThrottle.create_tables(cursor)
+
+            # Create feed_daily_stats, the per-feed, per-day rollups served by /api/stats
+            ActivityRollups.create_tables(cursor)
+
+            # Number inserts and updates of pdf_content and all_links for /api/changes
+            ChangeLog.create_tables(cursor)
+
+            # Create the feeds catalog, seeding it once from existing links
+            cursor.execute("SELECT to_regclass('feeds') IS NULL")
+            catalog_is_new = cursor.fetchone()[0]
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS feeds (
+                    feed_title TEXT PRIMARY KEY,
+                    source_url TEXT,
+                    feed_description TEXT,
+                    output_filename TEXT,
+                    link_count INTEGER NOT NULL DEFAULT 0,
+                    pdf_count INTEGER NOT NULL DEFAULT 0,
+                    last_crawled_at TIMESTAMP,
+                    last_new_item_at TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            if catalog_is_new:
+                cursor.execute("""
+                    INSERT INTO feeds (feed_title, link_count, pdf_count, last_new_item_at)
+                    SELECT
+                        l.feed_title,
+                        COUNT(*),
+                        COALESCE(MAX(p.pdf_count), 0),
+                        MAX(l.first_seen)
+                    FROM all_links l
+                    LEFT JOIN (
+                        SELECT feed_title, COUNT(*) AS pdf_count
+                        FROM pdf_content
+                        GROUP BY feed_title
+                    ) p ON p.feed_title = l.feed_title
+                    GROUP BY l.feed_title
+                    ON CONFLICT (feed_title) DO NOTHING
+                """)
+
+            # Create crawl_state, whose generation is bumped whenever crawled data changes
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_state (
+                    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                    generation BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute(
+                "INSERT INTO crawl_state (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING")
+
             conn.commit()
             cursor.close()
             conn.close()
             self.logger.debug(
                 "Initialized PostgreSQL database with all necessary tables")
         except psycopg2.Error as e:
-            self.logger.error(f"Failed to initialize PostgreSQL database: {e}")
+            self.logger.error("Failed to initialize PostgreSQL database: %s", e)
             raise
 
+    def _migrate_pdf_body(self, cursor):
+        """
+        Moves the content column of a pre-existing pdf_content table into pdf_body,
+        filling in the excerpt and word count columns on the way.
+        """
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'pdf_content' AND column_name = 'content'
+              AND table_schema = current_schema()
+        """)
+        if not cursor.fetchone():
+            return
+
+        self.logger.info("Migrating pdf_content.content into pdf_body")
+        cursor.execute("ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS excerpt TEXT")
+        cursor.execute("ALTER TABLE pdf_content ADD COLUMN IF NOT EXISTS word_count INTEGER")
+        cursor.execute("""
+            INSERT INTO pdf_body (id, content)
+            SELECT id, content FROM pdf_content
+            ON CONFLICT (id) DO NOTHING
+        """)
+        # Excerpts and word counts are computed with the same functions as for new
+        # documents, reading the bodies through a server-side cursor a batch at a time
+        conn = cursor.connection
+        stream = conn.cursor(name='pdf_body_migration')
+        stream.itersize = MIGRATION_BATCH_ROWS
+        stream.execute("SELECT id, content FROM pdf_content ORDER BY id")
+        migrated = 0
+        while True:
+            rows = stream.fetchmany(MIGRATION_BATCH_ROWS)
+            if not rows:
+                break
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE pdf_content p SET
+                    excerpt = v.excerpt,
+                    word_count = v.word_count
+                FROM (VALUES %s) AS v(id, excerpt, word_count)
+                WHERE p.id = v.id
+            """, [(pdf_id, make_excerpt(content), count_words(content)) for pdf_id, content in rows],
+                page_size=MIGRATION_BATCH_ROWS)
+            migrated += len(rows)
+            self.logger.info("Filled in excerpts for %s document(s)", migrated)
+        stream.close()
+        cursor.execute("ALTER TABLE pdf_content DROP COLUMN content")
+
     def _get_db_connection(self):
         """Establishes a connection to the PostgreSQL database using credentials from environment variables."""
         try:
@@ -173,169 +688,292 @@ class WebRSSCrawler:
                 dbname=os.getenv('POSTGRES_DB'),
                 user=os.getenv('POSTGRES_USER'),
                 password=os.getenv('POSTGRES_PASSWORD'),
-                sslmode='require'  # Ensure SSL is used
+                sslmode=os.getenv('POSTGRES_SSLMODE', 'require'),  # SSL is required unless overridden
+                cursor_factory=TimedCursor
             )
             return conn
         except psycopg2.Error as e:
-            self.logger.error(f"Error connecting to PostgreSQL: {e}")
+            self.logger.error("Error connecting to PostgreSQL: %s", e)
             raise
 
-    def _clean_text_with_llm(self, text: str) -> str:
+    def _invoke_chain(self, chain, inputs: Dict) -> Tuple[str, int]:
+        """Runs one LLM cleanup call, returning its text and the tokens it used."""
+        self._record('llm_calls')
+        try:
+            with self._stage('llm'), measure_tokens() as usage:
+                result = chain.invoke(inputs)
+        except Exception:
+            CRAWL_LLM_CALLS.inc(result='failure')
+            raise
+        CRAWL_LLM_CALLS.inc(result='success')
+        tokens = usage.total_tokens or estimate_tokens(inputs["text"]) + estimate_tokens(result["text"])
+        CRAWL_LLM_TOKENS.inc(tokens)
+        self._record('llm_tokens', tokens)
+        return result["text"], tokens
+
+    def _invoke_cleanup(self, text: str) -> Tuple[str, int]:
+        """Cleans one text with its own LLM call."""
+        return self._invoke_chain(self.cleanup_chain, {"text": text})
+
+    def _invoke_packed_cleanup(self, text: str, count: int) -> Tuple[str, int]:
+        """Cleans `count` texts packed between section markers with one LLM call."""
+        result = self._invoke_chain(self.packed_cleanup_chain, {"text": text, "count": count})
+        CRAWL_LLM_PACKED_SECTIONS.inc(count, result='sent')
+        return result
+
+    def _clean_text_with_llm(self, text: str,
+                             cleaned_before: Optional[Dict[str, str]] = None) -> CleanedText:
         """
-        Use LLM to clean up and format the text for better readability
+        Use LLM to clean up and format the text for better readability. Long texts are
+        split into content-defined chunks; chunks found in `cleaned_before`, keyed by raw
+        chunk digest, are reused, and the rest are packed with other documents' texts
+        when possible. Raises TokenBudgetExceeded if the chunks that need cleaning do
+        not fit the run's token budget.
         """
         if not text.strip() or not self.cleanup_chain:
-            return text
-
-        try:
-            # Split long texts into manageable chunks (if needed)
-            max_chunk_size = 4000  # Adjust based on your LLM's context window
-            if len(text) > max_chunk_size:
-                self.logger.info("Text too long, processing in chunks")
-                chunks = [text[i:i + max_chunk_size] 
-                         for i in range(0, len(text), max_chunk_size)]
-                cleaned_chunks = []
-                
-                for chunk in chunks:
-                    result = self.cleanup_chain.invoke({"text": chunk})
-                    cleaned_chunks.append(result["text"])
-                
-                return "\n\n".join(cleaned_chunks)
-            else:
-                result = self.cleanup_chain.invoke({"text": text})
-                return result["text"]
-
-        except Exception as e:
-            self.logger.error(f"Error cleaning text with LLM: {e}")
-            return text  # Return original text if LLM processing fails
+            return CleanedText(text, 0, [])
+
+        # Split long texts into manageable chunks (if needed)
+        chunks = split_chunks(text, LLM_CHUNK_CHARS)
+        digests = [chunk_digest(chunk) for chunk in chunks]
+        cleaned = {digest: cleaned_before[digest] for digest in digests
+                   if cleaned_before and digest in cleaned_before}
+        missing = {digest: chunk for digest, chunk in zip(digests, chunks) if digest not in cleaned}
+        if len(chunks) > 1:
+            self.logger.info(
+                "Text too long, processing in %s chunks (%s reused)",
+                len(chunks), len(chunks) - len(missing))
 
-    def _extract_pdf_metadata(self, pdf_content: bytes) -> Dict:
-        """Extract metadata and text content from PDF, using OCR if needed"""
+        estimate = sum(estimate_cleanup_tokens(chunk, LLM_CHUNK_CHARS) for chunk in missing.values())
+        self.token_budget.reserve(estimate)
+        llm_tokens = 0
         try:
-            pdf_file = io.BytesIO(pdf_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-            # Extract text content
-            text_content = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                text_content += page_text if page_text else ""
-
-            # If text content is too short or empty, try OCR
-            if len(text_content.strip()) < 50:
-                self.logger.info("PDF appears to be scanned. Attempting OCR...")
+            if self.cleanup_batcher is not None and self.packed_cleanup_chain is not None:
                 try:
-                    import pytesseract
-                    from pdf2image import convert_from_bytes
-                    from PIL import Image
-
-                    # Convert PDF to images
-                    images = convert_from_bytes(pdf_content)
-                    ocr_text = ""
-
-                    # Process each page with OCR
-                    for i, image in enumerate(images):
-                        self.logger.debug(f"Processing page {i+1} with OCR")
-                        page_text = pytesseract.image_to_string(image, lang='eng')
-                        ocr_text += page_text + "\n"
-
-                    if ocr_text.strip():
-                        text_content = ocr_text
-                        self.logger.info("Successfully extracted text using OCR")
-                    else:
-                        self.logger.warning("OCR did not extract any text")
-
-                except Exception as ocr_error:
-                    self.logger.error(f"OCR processing failed: {ocr_error}")
-
-            # Clean up the text using LLM
-            cleaned_text = self._clean_text_with_llm(text_content)
-            self.logger.info("Successfully cleaned text with LLM")
-
-            # Get metadata
-            metadata = pdf_reader.metadata if pdf_reader.metadata else {}
-
-            return {
-                'content': cleaned_text,
-                'title': metadata.get('/Title', ''),
-                'author': metadata.get('/Author', ''),
-                'creation_date': metadata.get('/CreationDate', ''),
-                'modification_date': metadata.get('/ModDate', ''),
-                'number_of_pages': len(pdf_reader.pages),
-                'file_size_bytes': len(pdf_content)
-            }
+                    results = self.cleanup_batcher.clean_many(list(missing.values()))
+                except CleanupError as e:
+                    llm_tokens = e.tokens
+                    raise
+                for digest, (chunk, tokens) in zip(missing, results):
+                    cleaned[digest] = chunk
+                    llm_tokens += tokens
+            else:
+                for digest, chunk in missing.items():
+                    cleaned[digest], tokens = self._invoke_cleanup(chunk)
+                    llm_tokens += tokens
         except Exception as e:
-            self.logger.error(f"Error extracting PDF metadata: {e}")
-            return {}
-
-    def _setup_logger(self, log_level: int, log_file: str) -> logging.Logger:
-        """Sets up the logger to log to both console and file."""
-        logger = logging.getLogger(__name__)
-        logger.setLevel(log_level)
+            CRAWL_LLM_CHUNKS.inc(len(chunks), result='failed')
+            self.logger.error("Error cleaning text with LLM: %s", e)
+            # Return original text if LLM processing fails, with the tokens already spent
+            return CleanedText(text, llm_tokens, [])
+        finally:
+            self.token_budget.settle(estimate, llm_tokens)
+        CRAWL_LLM_CHUNKS.inc(len(chunks) - len(missing), result='reused')
+        CRAWL_LLM_CHUNKS.inc(len(missing), result='cleaned')
+
+        parts, offsets, start = [], [], 0
+        for digest in digests:
+            part = cleaned[digest]
+            offsets.append((digest, start, len(part)))
+            parts.append(part)
+            start += len(part) + 2
+        return CleanedText("\n\n".join(parts), llm_tokens, offsets)
+
+    def _near_duplicate(self, conn, signature: Optional[List[int]],
+                        pdf_id: Optional[int] = None) -> Optional[Tuple[int, int, float]]:
+        """
+        Looks up the stored document most similar to a signature, among those stored
+        before `pdf_id` if given. Returns the match's id, its original's id and the
+        similarity, or None. Lookup errors only cost the dedup.
+        """
+        if not signature or not self.near_duplicate_threshold:
+            return None
+        try:
+            cursor = conn.cursor()
+            match = NearDuplicateIndex.find(
+                cursor, signature, self.near_duplicate_threshold, before_id=pdf_id)
+            conn.commit()
+            cursor.close()
+            return match
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Near-duplicate lookup failed: %s", e)
+            return None
 
-        if logger.hasHandlers():
-            logger.handlers.clear()
+    def _reusable_chunks(self, conn, pdf_ids: List[int]) -> Dict[str, str]:
+        """Cleaned chunks of stored documents, by raw chunk digest."""
+        try:
+            cursor = conn.cursor()
+            chunks = NearDuplicateIndex.cleaned_chunks(cursor, pdf_ids)
+            conn.commit()
+            cursor.close()
+            return chunks
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to load cleaned chunks of %s: %s", pdf_ids, e)
+            return {}
 
-        # Console Handler
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(log_level)
-        console_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+    def _extract_pdf_metadata(self, pdf_content: bytes, conn=None,
+                              pdf_id: Optional[int] = None) -> Dict:
+        """
+        Extracts metadata and text content from a PDF in a sandboxed child process,
+        using OCR if needed, then cleans the text with the LLM. Raises ExtractionError
+        if the document fails or exceeds its time or memory limit, and
+        TokenBudgetExceeded if cleaning it would not fit the run's token budget.
+
+        Given a connection, the raw text is checked against stored documents first. The
+        chunks it shares with a near-duplicate, or with the stored version of `pdf_id`
+        when refreshing that document, reuse their cleaned text.
+        """
+        start = time.perf_counter()
+        try:
+            result = self.extraction_pool.extract(pdf_content)
+        except ExtractionError as e:
+            self._observe_stage('extract', time.perf_counter() - start)
+            self._stage_failed('extract')
+            CRAWL_EXTRACTIONS_FAILED.inc(reason=e.reason)
+            self.logger.error("Error extracting PDF metadata: %s", e)
+            raise
 
-        # File Handler
-        file_handler = logging.handlers.RotatingFileHandler(
-            log_file, maxBytes=1_000_000, backupCount=5
-        )
-        file_handler.setLevel(log_level)
-        file_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        self._observe_stage('extract', result['extract_seconds'])
+        if result['ocr_pages'] or result['ocr_error']:
+            self._observe_stage('ocr', result['ocr_seconds'])
+            CRAWL_OCR_PAGES.inc(result['ocr_pages'])
+        if result['ocr_error']:
+            self.logger.error("OCR processing failed: %s", result['ocr_error'])
+        if result['pages_extracted'] < result['number_of_pages']:
+            self.logger.warning(
+                "Extracted the first %s of %s pages",
+                result['pages_extracted'], result['number_of_pages'])
+
+        duplicate, cleaned_before = None, None
+        if conn is not None:
+            duplicate = self._near_duplicate(conn, result['minhash'], pdf_id)
+            sources = [pdf_id] if pdf_id is not None else []
+            if duplicate is not None:
+                CRAWL_NEAR_DUPLICATES.inc()
+                self.logger.info(
+                    "Text is %.0f%% similar to stored document %s",
+                    duplicate[2] * 100, duplicate[0])
+                sources.append(duplicate[0])
+            if sources:
+                cleaned_before = self._reusable_chunks(conn, sources)
+
+        # Clean up the text using LLM, within the run's token budget
+        cleaned = self._clean_text_with_llm(result['content'], cleaned_before)
+        self.logger.info("Successfully cleaned text with LLM")
+
+        return {
+            'content': cleaned.content,
+            'llm_tokens': cleaned.llm_tokens,
+            'chunks': cleaned.chunks,
+            'minhash': result['minhash'],
+            'duplicate_of': duplicate[1] if duplicate else None,
+            'duplicate_similarity': duplicate[2] if duplicate else None,
+            'title': result['title'],
+            'author': result['author'],
+            'creation_date': result['creation_date'],
+            'modification_date': result['modification_date'],
+            'number_of_pages': result['number_of_pages'],
+            'file_size_bytes': result['file_size_bytes']
+        }
 
-        return logger
+    def _setup_logger(self, log_level: Optional[int], log_file: str) -> logging.Logger:
+        """
+        Sets up the logger to log to both console and file through a background queue.
+        The level defaults to LOG_LEVEL from the environment.
+        """
+        return configure_logger(__name__, log_file, level=log_level)
 
     def _get_random_headers(self) -> Dict[str, str]:
         """Generates random headers to mimic different browsers."""
         chosen_user_agent = random.choice(self.user_agents)
-        self.logger.debug(f"Chosen user agent: {chosen_user_agent}")
-        headers = {
+        return {
             'User-Agent': chosen_user_agent,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         }
-        self.logger.debug(f"Generated request headers: {headers}")
-        return headers
 
     def _safe_request(self, url: str, timeout: int = 10) -> requests.Response:
         """Performs a safe HTTP GET request with error handling."""
-        self.logger.debug(
-            f"Starting safe request to {url} with timeout={timeout}")
+        self.link_logger.debug(
+            "Starting safe request to %s with timeout=%s", url, timeout)
         try:
-            delay = random.uniform(0, 0.05)
-            self.logger.debug(
-                f"Sleeping for random delay: {delay:.2f} seconds before request")
-            time.sleep(delay)
-
-            response = requests.get(
-                url, headers=self._get_random_headers(), timeout=timeout, stream=True
-            )
+            with self.throttle.slot(url) as outcome:
+                response = requests.get(
+                    url, headers=self._get_random_headers(), timeout=timeout, stream=True
+                )
+                outcome.observe(response)
             response.raise_for_status()
-            self.logger.debug(
-                f"Received response (status: {response.status_code}) for {url}")
+            self.link_logger.debug(
+                "Received response (status: %s) for %s", response.status_code, url)
             return response
         except requests.RequestException as e:
-            self.logger.error(f"Request failed for {url}: {e}")
+            self.logger.error("Request failed for %s: %s", url, e)
+            return None
+        except HostThrottled as e:
+            self.logger.warning("Skipped request to %s: %s", url, e)
+            return None
+
+    def _download_pdf(self, url: str, timeout: int = 30,
+                      validators: Optional[Dict] = None) -> PDFDownload:
+        """
+        Downloads a PDF, raising PDFJobError on failure. Timeouts, connection errors,
+        5xx responses and rate limiting are retryable; other client errors are not.
+
+        With `validators` (the stored etag and last_modified) the request is conditional,
+        and a 304 returns without reading the body and with `content` set to None. A
+        matching Content-Length alone proves nothing, so other responses are read in full
+        for the caller to compare digests.
+        """
+        self.link_logger.debug("Downloading PDF %s with timeout=%s", url, timeout)
+        headers = self._get_random_headers()
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        try:
+            with self.throttle.slot(url) as outcome:
+                response = requests.get(url, headers=headers, timeout=timeout, stream=True)
+                outcome.observe(response)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                length = response.headers.get('Content-Length')
+                content_length = int(length) if length and length.isdigit() else None
+                if validators and response.status_code == 304:
+                    response.close()
+                    return PDFDownload(None, etag, last_modified, content_length)
+                response.raise_for_status()
+                content = response.content
+                return PDFDownload(content, etag, last_modified, content_length or len(content))
+        except requests.HTTPError as e:
+            status = e.response.status_code
+            retryable = status >= 500 or status in RETRYABLE_STATUS_CODES
+            raise PDFJobError(f"HTTP {status} downloading {url}", retryable=retryable) from e
+        except requests.RequestException as e:
+            raise PDFJobError(f"Request failed for {url}: {e}") from e
+        except HostThrottled as e:
+            raise PDFJobError(str(e)) from e
+
+    def _archive_pdf(self, pdf_bytes: bytes, pdf_url: str) -> Optional[str]:
+        """
+        Stores downloaded bytes in the raw archive and returns their SHA-256. A failed
+        write is logged rather than raised, so a full disk does not stop ingestion.
+        """
+        if self.archive is None:
+            return DocumentArchive.digest(pdf_bytes)
+        try:
+            return self.archive.put(pdf_bytes)
+        except OSError as e:
+            self.logger.error("Failed to archive PDF %s: %s", pdf_url, e)
             return None
 
     def _extract_links(self, soup: BeautifulSoup, link_selector: str) -> List[str]:
         """Extracts links from the BeautifulSoup object based on the provided CSS selector."""
-        self.logger.debug(f"Extracting links using selector '{link_selector}'")
+        self.logger.debug("Extracting links using selector '%s'", link_selector)
         try:
             links = soup.select(link_selector)
             extracted = []
@@ -347,16 +985,16 @@ class WebRSSCrawler:
                 elif src:
                     extracted.append(src)
             self.logger.debug(
-                f"Extracted {len(extracted)} links from selector '{link_selector}'")
+                "Extracted %s links from selector '%s'", len(extracted), link_selector)
             return extracted
         except Exception as e:
-            self.logger.error(f"Error extracting links: {e}")
+            self.logger.error("Error extracting links: %s", e)
             return []
 
     def _extract_all_existing_links(self, conn, feed_title: str) -> Set[str]:
         """Fetches all existing links for a specific feed and returns them as a set."""
         self.logger.debug(
-            f"Loading all existing links for feed '{feed_title}' into memory.")
+            "Loading all existing links for feed '%s' into memory.", feed_title)
         try:
             cursor = conn.cursor()
             cursor.execute(
@@ -367,13 +1005,231 @@ class WebRSSCrawler:
             existing_links = {row[0] for row in rows}
             cursor.close()
             self.logger.debug(
-                f"Loaded {len(existing_links)} existing links for feed '{feed_title}'.")
+                "Loaded %s existing links for feed '%s'.", len(existing_links), feed_title)
             return existing_links
         except psycopg2.Error as e:
             self.logger.error(
-                f"Failed to load existing links for feed '{feed_title}': {e}")
+                "Failed to load existing links for feed '%s': %s", feed_title, e)
             return set()
 
+    def _filter_unseen_links(self, conn, feed_title: str, candidate_links: List[str],
+                             aliases: Optional[Dict[str, str]] = None) -> Set[str]:
+        """
+        Sends the candidate links to Postgres and returns only those not yet in all_links,
+        under either their own spelling or their alias.
+        Transfer and memory scale with the page size rather than the feed's history.
+
+        If the query fails every candidate is treated as new, as in memory mode, so links
+        are never dropped; inserts of links that were in fact stored are no-ops.
+        """
+        if not candidate_links:
+            return set()
+        aliases = aliases or {}
+        candidate_links = list(candidate_links)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.link
+                FROM unnest(%s::text[], %s::text[]) AS c(link, alias)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM all_links a
+                    WHERE a.feed_title = %s AND (a.link = c.link OR a.link = c.alias)
+                )
+            """, (candidate_links, [aliases.get(link) for link in candidate_links], feed_title))
+            unseen = {row[0] for row in cursor.fetchall()}
+            cursor.close()
+            self.logger.debug(
+                "%s of %s candidate links are new for feed '%s'.",
+                len(unseen), len(candidate_links), feed_title)
+            return unseen
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error(
+                "Failed to filter candidate links for feed '%s', treating all as new: %s",
+                feed_title, e)
+            return set(candidate_links)
+
+    def _bloom_path(self, feed_title: str) -> str:
+        """Returns the on-disk location of the Bloom filter for a feed."""
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', feed_title).strip('_') or 'feed'
+        return os.path.join(self.state_directory, 'bloom', f"{slug}.bloom")
+
+    def _load_link_bloom(self, conn, feed_title: str) -> BloomFilter:
+        """
+        Loads the feed's Bloom filter and folds in any links inserted since it was
+        last saved. The filter is rebuilt from the database when missing or saturated.
+        """
+        path = self._bloom_path(feed_title)
+        bloom = BloomFilter.load(path)
+
+        cursor = conn.cursor()
+        if bloom is None or bloom.is_saturated:
+            cursor.execute(
+                "SELECT COUNT(*) FROM all_links WHERE feed_title = %s",
+                (feed_title,)
+            )
+            known = cursor.fetchone()[0]
+            bloom = BloomFilter(capacity=max(known * 2, 10_000))
+            self.logger.info(
+                "Building Bloom filter for feed '%s' from %s known links.", feed_title, known)
+        cursor.close()
+
+        # Stream rows through a server-side cursor so the history never sits in memory
+        stream = conn.cursor(name='bloom_catch_up')
+        stream.itersize = 5000
+        stream.execute(
+            "SELECT id, link FROM all_links WHERE feed_title = %s AND id > %s ORDER BY id",
+            (feed_title, bloom.watermark)
+        )
+        caught_up = 0
+        for link_id, link in stream:
+            bloom.add(link)
+            bloom.watermark = link_id
+            caught_up += 1
+        stream.close()
+        conn.commit()
+
+        if caught_up:
+            bloom.save(path)
+            self.logger.debug(
+                "Folded %s links into Bloom filter for feed '%s'.", caught_up, feed_title)
+        return bloom
+
+    def _find_new_links(self, conn, feed_title: str, candidate_links: List[str],
+                        mode: str = None, aliases: Optional[Dict[str, str]] = None) -> Set[str]:
+        """
+        Returns the subset of candidate links that are not yet stored for the feed.
+        `aliases` maps a link to another spelling it may have been stored under.
+        """
+        mode = mode or self.link_dedup
+        aliases = aliases or {}
+
+        if mode == 'server':
+            return self._filter_unseen_links(conn, feed_title, candidate_links, aliases)
+
+        if mode == 'bloom':
+            try:
+                bloom = self._load_link_bloom(conn, feed_title)
+            except (psycopg2.Error, OSError) as e:
+                conn.rollback()
+                self.logger.error(
+                    "Bloom filter unavailable for feed '%s', using server anti-join: %s",
+                    feed_title, e)
+                return self._filter_unseen_links(conn, feed_title, candidate_links, aliases)
+
+            # Links absent from the filter are certainly new; the rest need confirmation
+            definitely_new = {
+                link for link in candidate_links
+                if link not in bloom and (link not in aliases or aliases[link] not in bloom)
+            }
+            maybe_seen = [link for link in candidate_links if link not in definitely_new]
+            self.logger.debug(
+                "Bloom filter for '%s': %s new, %s to confirm.",
+                feed_title, len(definitely_new), len(maybe_seen))
+            return definitely_new | self._filter_unseen_links(
+                conn, feed_title, maybe_seen, aliases)
+
+        existing_links = self._extract_all_existing_links(conn, feed_title)
+        return {
+            link for link in candidate_links
+            if link not in existing_links and aliases.get(link) not in existing_links
+        }
+
+    def _remember_links(self, feed_title: str, links: List[str]):
+        """Adds freshly inserted links to the feed's Bloom filter, if one is in use."""
+        path = self._bloom_path(feed_title)
+        bloom = BloomFilter.load(path)
+        if bloom is None or not links:
+            return
+        for link in links:
+            bloom.add(link)
+        try:
+            bloom.save(path)
+        except OSError as e:
+            self.logger.error("Failed to save Bloom filter for feed '%s': %s", feed_title, e)
+
+    def _sync_feed_catalog(self, conn):
+        """
+        Upserts every configured feed into the feeds catalog. Counts are only computed
+        when a feed is first added; afterwards they are maintained incrementally.
+        """
+        try:
+            cursor = conn.cursor()
+            for config in self.configs:
+                feed_title = config.get('feed_title', 'Web Crawler Feed')
+                output_filename = config.get(
+                    'output_filename', f"{feed_title.replace(' ', '_')}_feed.xml"
+                )
+                values = (
+                    config.get('source_url', ''),
+                    config.get('feed_description', 'Automatically generated feed'),
+                    output_filename,
+                    feed_title
+                )
+                cursor.execute("""
+                    UPDATE feeds SET
+                        source_url = %s,
+                        feed_description = %s,
+                        output_filename = %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE feed_title = %s
+                """, values)
+                if cursor.rowcount == 0:
+                    cursor.execute("""
+                        INSERT INTO feeds (
+                            source_url, feed_description, output_filename, feed_title,
+                            link_count, pdf_count
+                        ) VALUES (
+                            %s, %s, %s, %s,
+                            (SELECT COUNT(*) FROM all_links WHERE feed_title = %s),
+                            (SELECT COUNT(*) FROM pdf_content WHERE feed_title = %s)
+                        )
+                        ON CONFLICT (feed_title) DO NOTHING
+                    """, values + (feed_title, feed_title))
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to sync feeds catalog: %s", e)
+
+    def _feed_run(self) -> Tuple[Optional[int], Optional[int]]:
+        """The run and feed run ids of the feed being crawled on this thread, if any."""
+        return getattr(self._context, 'feed_run', None) or (None, None)
+
+    def _bump_generation(self, conn):
+        """Bumps the crawl generation so API caches drop responses built from older data."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE crawl_state SET
+                    generation = generation + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            """)
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to bump the crawl generation: %s", e)
+
+    def _mark_feed_crawled(self, conn, feed_title: str):
+        """Records the crawl time and bumps the crawl generation so API caches refresh."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE feeds SET last_crawled_at = CURRENT_TIMESTAMP WHERE feed_title = %s",
+                (feed_title,)
+            )
+            cursor.execute("""
+                UPDATE crawl_state SET
+                    generation = generation + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            """)
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to mark feed '%s' as crawled: %s", feed_title, e)
+
     def _batch_insert_new_links(self, conn, feed_title: str, new_links: List[Dict]):
         """Inserts new links into the all_links table in a single batch operation."""
         if not new_links:
@@ -385,6 +1241,7 @@ class WebRSSCrawler:
                     feed_title, link, source_url, is_pdf, content_type
                 ) VALUES %s
                 ON CONFLICT (feed_title, link) DO NOTHING
+                RETURNING is_pdf
             """
             values = [
                 (
@@ -396,29 +1253,170 @@ class WebRSSCrawler:
                 )
                 for link in new_links
             ]
-            psycopg2.extras.execute_values(
-                cursor, insert_query, values, template=None, page_size=100
-            )
-            conn.commit()
+            with self._stage('insert'):
+                inserted = psycopg2.extras.execute_values(
+                    cursor, insert_query, values, template=None, page_size=100, fetch=True
+                )
+                if inserted:
+                    cursor.execute("""
+                        UPDATE feeds SET
+                            link_count = link_count + %s,
+                            last_new_item_at = CURRENT_TIMESTAMP
+                        WHERE feed_title = %s
+                    """, (len(inserted), feed_title))
+                    ActivityRollups.record_links(
+                        cursor, feed_title, len(inserted), sum(1 for row in inserted if row[0]))
+                conn.commit()
             cursor.close()
             self.logger.debug(
-                f"Inserted {len(new_links)} new links for feed '{feed_title}'.")
+                "Inserted %s new links for feed '%s'.", len(inserted), feed_title)
         except psycopg2.Error as e:
+            conn.rollback()
             self.logger.error(
-                f"Failed to batch insert new links for feed '{feed_title}': {e}")
+                "Failed to batch insert new links for feed '%s': %s", feed_title, e)
 
     def _process_pdf_batch(self, conn, pdf_links: List[Dict]):
-        """Processes a batch of PDF links."""
-        for pdf_link in pdf_links:
-            pdf_url = pdf_link['link']
-            feed_title = pdf_link['feed_title']
-            source_url = pdf_link['source_url']
-            self._process_pdf(conn, pdf_url, feed_title, source_url)
+        """Queues a batch of PDF links as jobs and processes every due job of their feeds."""
+        try:
+            queued = self.pdf_jobs.enqueue(conn, pdf_links, *self._feed_run())
+            self.logger.debug("Queued %s PDF job(s)", queued)
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to queue PDF jobs: %s", e)
+            return
+
+        for feed_title in dict.fromkeys(link['feed_title'] for link in pdf_links):
+            self._drain_pdf_jobs(conn, feed_title)
+
+    def _drain_pdf_jobs(self, conn, feed_title: str) -> int:
+        """
+        Claims and runs the feed's due PDF jobs until none are left, with at most
+        `pdf_job_concurrency` running at once. Returns the number of jobs attempted.
+        """
+        attempted = 0
+        while True:
+            if self.token_budget.exhausted:
+                self.logger.info(
+                    "LLM token budget spent; leaving due PDF jobs of feed '%s' for a later run",
+                    feed_title)
+                return attempted
+            try:
+                jobs = self.pdf_jobs.claim_due(conn, feed_title, worker_id=self.worker_id)
+            except psycopg2.Error as e:
+                conn.rollback()
+                self.logger.error("Failed to claim PDF jobs for feed '%s': %s", feed_title, e)
+                return attempted
+            if not jobs:
+                return attempted
+            attempted += len(jobs)
+            self._run_claimed_pdf_jobs(conn, jobs)
+
+    def _run_claimed_pdf_jobs(self, conn, jobs: List[Dict]) -> int:
+        """
+        Runs claimed jobs with at most `pdf_job_concurrency` in flight. Returns the
+        number of PDFs stored.
+        """
+        workers = min(self.pdf_job_concurrency, len(jobs))
+        if workers <= 1:
+            return self._run_pdf_jobs(jobs, conn)
+
+        # Each worker gets its own connection and a share of the claimed jobs
+        stats = getattr(self._context, 'stats', None)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            shares = [jobs[i::workers] for i in range(workers)]
+            return sum(executor.map(lambda share: self._run_pdf_job_share(share, stats), shares))
+
+    def _run_pdf_job_share(self, jobs: List[Dict], stats: Optional[CrawlStats]) -> int:
+        """Runs claimed jobs on a worker thread, recording into the feed's ledger stats."""
+        self._context.stats = stats
+        try:
+            conn = self._get_db_connection()
+        except psycopg2.Error:
+            # The jobs stay 'running' and are released on the next run
+            self._context.stats = None
+            return 0
+        try:
+            return self._run_pdf_jobs(jobs, conn)
+        finally:
+            self._context.stats = None
+            conn.close()
+
+    def _run_pdf_jobs(self, jobs: List[Dict], conn) -> int:
+        """Runs claimed jobs one after another. Returns the number of PDFs stored."""
+        stored = 0
+        for job in jobs:
+            # Outside a feed crawl, as in queue workers, each job is recorded against the
+            # feed run it was queued or adopted by
+            job_stats = None
+            if getattr(self._context, 'stats', None) is None and job.get('feed_run_id'):
+                job_stats = self._context.stats = CrawlStats()
+            try:
+                stored += self._run_pdf_job(conn, job, job_stats)
+            finally:
+                if job_stats is not None:
+                    self._context.stats = None
+        return stored
+
+    def _run_pdf_job(self, conn, job: Dict, job_stats: Optional[CrawlStats]) -> bool:
+        """Runs one claimed job and records its outcome. Returns True if a PDF was stored."""
+        try:
+            estimate = job.get('estimated_tokens')
+            if self.token_budget.exhausted or (
+                    estimate is not None and not self.token_budget.fits(estimate)):
+                # Not worth downloading what could not be cleaned in this run
+                self._defer_pdf_job(conn, job, job_stats=job_stats)
+                return False
+            stored = self._process_pdf(conn, job['pdf_url'], job['feed_title'], job['source_link'])
+            self._flush_job_stats(conn, job, job_stats)
+            self.pdf_jobs.complete(conn, job)
+            CRAWL_PDF_JOBS.inc(outcome='done')
+            return stored
+        except TokenBudgetExceeded as e:
+            self.logger.info("Deferring PDF %s to a later run: %s", job['pdf_url'], e)
+            self._defer_pdf_job(conn, job, e.estimate, job_stats)
+        except PDFJobError as e:
+            self._flush_job_stats(conn, job, job_stats)
+            try:
+                status = self.pdf_jobs.fail(conn, job, str(e), retryable=e.retryable)
+                CRAWL_PDF_JOBS.inc(outcome='retry' if status == 'pending' else 'failed')
+            except psycopg2.Error as db_error:
+                conn.rollback()
+                self.logger.error(
+                    "Failed to record PDF job failure for %s: %s",
+                    job['pdf_url'], db_error)
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to complete PDF job for %s: %s", job['pdf_url'], e)
+        return False
+
+    def _flush_job_stats(self, conn, job: Dict, job_stats: Optional[CrawlStats]):
+        """
+        Adds one job's stats to its feed run in the ledger. Called while the job is still
+        claimed, so its run cannot be closed before the stats are in.
+        """
+        if job_stats is not None:
+            self.ledger.add_feed_stats(conn, job.get('run_id'), job['feed_run_id'], job_stats)
+
+    def _defer_pdf_job(self, conn, job: Dict, estimated_tokens: Optional[int] = None,
+                       job_stats: Optional[CrawlStats] = None):
+        """Puts a job back without using up an attempt, due after `llm_defer_seconds`."""
+        self._record('pdfs_deferred')
+        self._flush_job_stats(conn, job, job_stats)
+        try:
+            self.pdf_jobs.defer(conn, job, self.llm_defer_seconds, estimated_tokens)
+            CRAWL_PDF_JOBS.inc(outcome='deferred')
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to defer PDF job for %s: %s", job['pdf_url'], e)
 
     def _process_pdf(self, conn, pdf_url: str, feed_title: str, source_link: str) -> bool:
-        """Processes a PDF file and stores its content and metadata in the database."""
-        self.logger.debug(
-            f"Starting to process PDF: {pdf_url} for feed: {feed_title}")
+        """
+        Processes a PDF file and stores its content and metadata in the database.
+        Returns False if the PDF was already stored, raises PDFJobError on failure and
+        TokenBudgetExceeded if its cleanup does not fit the run's token budget.
+        """
+        self.link_logger.debug(
+            "Starting to process PDF: %s for feed: %s", pdf_url, feed_title)
         try:
             # Check if PDF already processed
             cursor = conn.cursor()
@@ -427,7 +1425,7 @@ class WebRSSCrawler:
                 (feed_title, pdf_url)
             )
             if cursor.fetchone():
-                self.logger.debug(f"PDF {pdf_url} already processed.")
+                self.link_logger.debug("PDF %s already processed.", pdf_url)
                 cursor.close()
                 return False
 
@@ -438,62 +1436,368 @@ class WebRSSCrawler:
             )
             if not cursor.fetchone():
                 self.logger.debug(
-                    f"PDF link {pdf_url} not found in all_links. Cannot process.")
+                    "PDF link %s not found in all_links. Cannot process.", pdf_url)
                 cursor.close()
                 return False
 
             cursor.close()
 
             # Download PDF content
-            response = self._safe_request(pdf_url)
-            if not response or response.status_code != 200:
-                self.logger.error(f"Failed to download PDF {pdf_url}")
-                return False
+            with self._stage('download'):
+                download = self._download_pdf(pdf_url)
+            pdf_bytes = download.content
+            CRAWL_BYTES_DOWNLOADED.inc(len(pdf_bytes))
+            self._record('bytes_downloaded', len(pdf_bytes))
+            CRAWL_PDF_SIZE_BYTES.observe(len(pdf_bytes))
+            content_sha256 = self._archive_pdf(pdf_bytes, pdf_url)
 
             # Extract metadata and content
-            metadata = self._extract_pdf_metadata(response.content)
+            try:
+                metadata = self._extract_pdf_metadata(pdf_bytes, conn)
+            except ExtractionError as e:
+                raise PDFJobError(
+                    f"Could not extract text from {pdf_url}: {e}", retryable=e.retryable) from e
 
             # Create a URL-friendly page title from the Feed title and date
             current_date = datetime.now().strftime('%Y-%m-%d')
             page_title = f"{feed_title.replace(' ', '_')}_{current_date}"
             metadata['page_title'] = page_title
 
-            # Insert PDF metadata
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO pdf_content (
-                    feed_title, source_link, pdf_url, content, title, page_title, author,
-                    creation_date, modification_date, number_of_pages, file_size_bytes
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                feed_title,
-                source_link,
-                pdf_url,
-                metadata.get('content', ''),
-                metadata.get('title', ''),
-                metadata.get('page_title', ''),
-                metadata.get('author', ''),
-                metadata.get('creation_date', ''),
-                metadata.get('modification_date', ''),
-                metadata.get('number_of_pages', 0),
-                metadata.get('file_size_bytes', 0)
-            ))
-
-            conn.commit()
-            cursor.close()
+            content = metadata.get('content', '')
+
+            # Insert PDF metadata and excerpt, then the full body
+            with self._stage('insert'):
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO pdf_content (
+                        feed_title, source_link, pdf_url, excerpt, word_count, title, page_title,
+                        author, creation_date, modification_date, number_of_pages, file_size_bytes,
+                        content_sha256, etag, last_modified, content_length, llm_tokens,
+                        duplicate_of, duplicate_similarity
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    feed_title,
+                    source_link,
+                    pdf_url,
+                    make_excerpt(content),
+                    count_words(content),
+                    metadata.get('title', ''),
+                    metadata.get('page_title', ''),
+                    metadata.get('author', ''),
+                    metadata.get('creation_date', ''),
+                    metadata.get('modification_date', ''),
+                    metadata.get('number_of_pages', 0),
+                    metadata.get('file_size_bytes', 0),
+                    content_sha256,
+                    download.etag,
+                    download.last_modified,
+                    download.content_length,
+                    metadata.get('llm_tokens', 0),
+                    metadata.get('duplicate_of'),
+                    metadata.get('duplicate_similarity')
+                ))
+                pdf_id = cursor.fetchone()[0]
+                cursor.execute(
+                    "INSERT INTO pdf_body (id, content) VALUES (%s, %s)",
+                    (pdf_id, content)
+                )
+                NearDuplicateIndex.store(
+                    cursor, pdf_id, metadata.get('minhash'), metadata.get('chunks', []))
+                notify_new_article(cursor, pdf_id)
+                cursor.execute("""
+                    UPDATE feeds SET
+                        pdf_count = pdf_count + 1,
+                        last_new_item_at = CURRENT_TIMESTAMP
+                    WHERE feed_title = %s
+                """, (feed_title,))
+                ActivityRollups.record_document(
+                    cursor, feed_title,
+                    metadata.get('number_of_pages', 0), metadata.get('file_size_bytes', 0))
+
+                conn.commit()
+                cursor.close()
 
             content_preview = metadata.get('content', '')[
                 :50] + '...' if metadata.get('content') else 'No content'
-            self.logger.info(f"Stored PDF content for {pdf_url}")
-            self.logger.info(f"Content preview: {content_preview}")
+            CRAWL_PDFS_PROCESSED.inc(result='success')
+            self._record('pdfs_processed')
+            self.logger.info("Stored PDF content for %s", pdf_url)
+            self.logger.info("Content preview: %s", content_preview)
             return True
 
+        # Every path out rolls back, so a failure after the INSERT never leaves the
+        # transaction open with a half-written document and its row locks held
+        except TokenBudgetExceeded:
+            self._rollback(conn)
+            raise
+        except PDFJobError as e:
+            self._rollback(conn)
+            CRAWL_PDFS_PROCESSED.inc(result='failure')
+            self.logger.error("Failed to process PDF %s: %s", pdf_url, e)
+            raise
         except psycopg2.Error as e:
-            self.logger.error(f"Database error processing PDF {pdf_url}: {e}")
-            return False
+            self._rollback(conn)
+            CRAWL_PDFS_PROCESSED.inc(result='failure')
+            self.logger.error("Database error processing PDF %s: %s", pdf_url, e)
+            raise PDFJobError(f"Database error: {e}") from e
         except Exception as e:
-            self.logger.error(f"Error processing PDF {pdf_url}: {e}")
+            self._rollback(conn)
+            CRAWL_PDFS_PROCESSED.inc(result='failure')
+            self.logger.error("Error processing PDF %s: %s", pdf_url, e)
+            raise PDFJobError(str(e)) from e
+
+    def _rollback(self, conn):
+        """Rolls back the connection's open transaction, ignoring a connection that is gone."""
+        try:
+            conn.rollback()
+        except psycopg2.Error as e:
+            self.logger.error("Rollback failed: %s", e)
+
+    def _fetch_page_links(self, page_url: str, link_selector: str) -> Optional[List[str]]:
+        """Fetches an HTML page and returns its raw links, or None if it could not be fetched."""
+        with self._stage('fetch'):
+            response = self._safe_request(page_url)
+            page_content = response.content if response else None
+        if page_content is None:
+            self._stage_failed('fetch')
+            return None
+        CRAWL_PAGES_FETCHED.inc()
+
+        content_type = response.headers.get('Content-Type', '').lower()
+        if content_type and 'html' not in content_type:
+            self.logger.debug("Not following %s: Content-Type is %s", page_url, content_type)
+            return []
+        soup = BeautifulSoup(page_content, 'html.parser')
+        return self._extract_links(soup, link_selector)
+
+    def _crawl_frontier(self, config: Dict) -> Optional[Tuple[List[str], Dict[str, str]]]:
+        """
+        Collects candidate links breadth-first from the source page, following links
+        on the source host up to `max_depth` levels and `max_pages` pages.
+
+        Followed links must match one of the config's `follow_patterns` regexes or, when
+        none are given, sit under the source page's path. Links are canonicalized before
+        dedup. Returns the candidate links in discovery order, plus their pre-canonical
+        spellings where they differ, which older all_links rows may still use. Returns
+        None if the source page itself could not be fetched.
+        """
+        source_url = config.get("source_url", "")
+        link_selector = config.get('link_selector', 'a')
+        max_depth = max(0, int(config.get('max_depth', 0)))
+        max_pages = max(1, int(config.get('max_pages', DEFAULT_MAX_PAGES)))
+        follow_patterns = [re.compile(pattern) for pattern in config.get('follow_patterns', [])]
+
+        start = canonicalize_url(source_url) or source_url
+        source = urlsplit(start)
+        scope = source.path.rstrip('/') + '/'
+
+        def should_follow(link: str) -> bool:
+            parts = urlsplit(link)
+            if parts.netloc != source.netloc or parts.path.lower().endswith('.pdf'):
+                return False
+            if follow_patterns:
+                return matches_any(link, follow_patterns)
+            return (parts.path + '/').startswith(scope)
+
+        frontier = deque([(start, 0)])
+        queued = {start}
+        candidates: Dict[str, None] = {}
+        aliases: Dict[str, str] = {}
+        pages = 0
+
+        while frontier and pages < max_pages:
+            page_url, depth = frontier.popleft()
+            links = self._fetch_page_links(page_url, link_selector)
+            pages += 1
+            if links is None:
+                if depth == 0:
+                    return None
+                self.logger.warning("Failed to fetch %s at depth %s", page_url, depth)
+                continue
+
+            for raw_link in links:
+                link = canonicalize_url(raw_link, base=page_url)
+                if link is None:
+                    continue
+                if link not in candidates:
+                    candidates[link] = None
+                    # How this link was stored before canonicalization
+                    legacy = raw_link if raw_link.startswith(('http://', 'https://')) \
+                        else requests.compat.urljoin(page_url, raw_link)
+                    if legacy != link:
+                        aliases[link] = legacy
+                if depth < max_depth and link not in queued and should_follow(link):
+                    queued.add(link)
+                    frontier.append((link, depth + 1))
+
+        if frontier:
+            self.logger.info(
+                "Stopped crawling '%s' after %s pages with %s left in the frontier",
+                config.get('feed_title'), max_pages, len(frontier))
+        return list(candidates), aliases
+
+    def _crawl_feed(self, conn, config: Dict, process_pdfs: bool = True) -> bool:
+        """
+        Crawls a single feed configuration: fetches the source page, stores new links,
+        processes new PDFs and writes the RSS file. Returns False if the page could not be fetched.
+
+        With process_pdfs=False new PDFs are only queued, for any worker to pick up.
+        """
+        feed_title = config.get('feed_title', 'Web Crawler Feed')
+        output_filename = config.get(
+            'output_filename', f"{feed_title.replace(' ', '_')}_feed.xml"
+        )
+        source_url = config.get("source_url", "")
+        pdf_only = config.get('pdf_only', False)
+
+        # Ensure RSS directory is used
+        output_path = os.path.join(self.rss_directory, output_filename)
+
+        feed_gen = feedgen.feed.FeedGenerator()
+        feed_gen.title(feed_title)
+        feed_gen.description(config.get(
+            'feed_description', 'Automatically generated feed'
+        ))
+        feed_gen.link(href=source_url)
+
+        frontier = self._crawl_frontier(config)
+        if frontier is None:
+            self.logger.warning(
+                "Skipping feed '%s' due to failed request.", feed_title
+            )
             return False
+        candidate_links, aliases = frontier
+
+        # Configs queued for workers may predate the checks made when loading the file
+        link_dedup = check_link_dedup(config.get('link_dedup', self.link_dedup))
+        unseen_links = self._find_new_links(
+            conn, feed_title, candidate_links, mode=link_dedup, aliases=aliases)
+        CRAWL_LINKS_SEEN.inc(len(candidate_links))
+        CRAWL_LINKS_NEW.inc(len(unseen_links))
+        self._record('links_seen', len(candidate_links))
+        self._record('new_links', len(unseen_links))
+
+        new_links = []
+        new_pdf_links = []
+
+        for full_link in candidate_links:
+            if full_link not in unseen_links:
+                continue  # Skip processing since it's not new
+
+            # Determine if the link is a PDF
+            with self._stage('classify'):
+                is_pdf, content_length = self._probe_link(full_link)
+            CRAWL_LINKS_CLASSIFIED.inc(content_type='pdf' if is_pdf else 'other')
+            content_type = 'application/pdf' if is_pdf else 'unknown'
+
+            # Add to new_links for batch insertion
+            new_links.append({
+                'link': full_link,
+                'feed_title': feed_title,
+                'source_url': source_url,
+                'is_pdf': is_pdf,
+                'content_type': content_type
+            })
+
+            # If it's a new PDF, add to the PDF processing list
+            if is_pdf:
+                new_pdf_links.append({
+                    'link': full_link,
+                    'feed_title': feed_title,
+                    'source_url': source_url,
+                    'content_length': content_length
+                })
+
+        # Batch insert new links
+        self._batch_insert_new_links(conn, feed_title, new_links)
+        if link_dedup == 'bloom':
+            self._remember_links(
+                feed_title, [entry['link'] for entry in new_links])
+
+        # Batch process PDFs, or leave them queued for the worker pool
+        if process_pdfs:
+            self._process_pdf_batch(conn, new_pdf_links)
+        else:
+            try:
+                self.pdf_jobs.enqueue(conn, new_pdf_links, *self._feed_run())
+            except psycopg2.Error as e:
+                conn.rollback()
+                self.logger.error("Failed to queue PDF jobs for feed '%s': %s", feed_title, e)
+
+        # Add new links to RSS feed
+        for link_entry in new_links:
+            link = link_entry['link']
+            is_pdf = link_entry['is_pdf']
+            if pdf_only and not is_pdf:
+                continue  # Skip non-PDF links in PDF-only mode
+
+            fe = feed_gen.add_entry()
+            # Use a meaningful title; here using the last part of the URL or a default
+            entry_title = link.split('/')[-1] if '/' in link else link
+            fe.title(entry_title)
+            fe.link(href=link)
+
+        # Save feed to the rss directory, with a precompressed copy for gzip clients
+        feed_gen.rss_file(output_path)
+        try:
+            write_gzip_sibling(output_path)
+        except OSError as e:
+            self.logger.error("Failed to write compressed RSS feed for '%s': %s", feed_title, e)
+        self.logger.info(
+            "Saved RSS feed for '%s' to '%s'", feed_title, output_path
+        )
+        return True
+
+    def _crawl_feed_with_ledger(self, conn, run_id, config: Dict,
+                                process_pdfs: bool = True) -> Tuple[str, Optional[str]]:
+        """
+        Crawls one feed, recording it in the ledger under run_id. Returns the feed's
+        ledger status ('completed', 'skipped' or 'failed') and the error, if any.
+        """
+        feed_title = config.get('feed_title', 'Web Crawler Feed')
+        stats = CrawlStats()
+        self._context.stats = stats
+        feed_run_id = self.ledger.start_feed(conn, run_id, feed_title)
+        self._context.feed_run = (run_id, feed_run_id)
+
+        try:
+            # Retries and deferrals left by earlier runs are recorded against this one
+            try:
+                self.pdf_jobs.adopt(conn, feed_title, run_id, feed_run_id)
+            except psycopg2.Error as e:
+                conn.rollback()
+                self.logger.error("Failed to adopt PDF jobs of feed '%s': %s", feed_title, e)
+            if process_pdfs:
+                # Retry PDFs that failed on earlier runs before looking for new ones
+                self._drain_pdf_jobs(conn, feed_title)
+            crawled = self._crawl_feed(conn, config, process_pdfs=process_pdfs)
+            if crawled:
+                self._mark_feed_crawled(conn, feed_title)
+            status, error = ('completed' if crawled else 'skipped'), None
+        except Exception as e:
+            self.logger.error("Error processing config %s: %s", config, e)
+            self._rollback(conn)
+            status, error = 'failed', str(e)
+        finally:
+            self._context.stats = None
+            self._context.feed_run = None
+
+        self.ledger.finish_feed(conn, feed_run_id, stats, status, error)
+        return status, error
+
+    def _release_stale_claims(self, conn, stale_after: float = STALE_CLAIM_SECONDS):
+        """Requeues feed tasks and PDF jobs claimed by workers that stopped heartbeating."""
+        try:
+            released = (self.crawl_tasks.release_stale(conn, stale_after),
+                        self.pdf_jobs.release_stale(conn, stale_after))
+            if any(released):
+                self.logger.info(
+                    "Released %s crawl task(s) and %s PDF job(s) claimed by unresponsive workers",
+                    released[0], released[1])
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to release stale claims: %s", e)
 
     def generate_rss_feeds(self):
         """Generates RSS feeds based on the configurations provided."""
@@ -504,152 +1808,484 @@ class WebRSSCrawler:
             # Establish a single database connection for the entire process
             conn = self._get_db_connection()
         except Exception as e:
-            self.logger.error(f"Failed to establish database connection: {e}")
+            self.logger.error("Failed to establish database connection: %s", e)
             return
 
-        for i, config in enumerate(self.configs, start=1):
-            self.logger.info(
-                f"Processing config {i}/{len(self.configs)}: {config.get('feed_title', 'Unnamed Feed')}"
-            )
-
-            feed_title = config.get('feed_title', 'Web Crawler Feed')
-            output_filename = config.get(
-                'output_filename', f"{feed_title.replace(' ', '_')}_feed.xml"
-            )
-            source_url = config.get("source_url", "")
-            pdf_only = config.get('pdf_only', False)
-
-            # Ensure RSS directory is used
-            output_path = os.path.join(self.rss_directory, output_filename)
-
-            try:
-                feed_gen = feedgen.feed.FeedGenerator()
-                feed_gen.title(feed_title)
-                feed_gen.description(config.get(
-                    'feed_description', 'Automatically generated feed'
-                ))
-                feed_gen.link(href=source_url)
-
-                response = self._safe_request(source_url)
-                if not response:
-                    self.logger.warning(
-                        f"Skipping feed '{feed_title}' due to failed request."
-                    )
-                    continue
+        self.token_budget.reset()
+        run_id = self.ledger.start_run(conn, len(self.configs), self.token_budget.limit)
+        self._sync_feed_catalog(conn)
+        self._release_stale_claims(conn)
+        self.throttle.load(conn)
 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                links = self._extract_links(
-                    soup, config.get('link_selector', 'a')
-                )
-
-                # Load all existing links for this feed into a set
-                existing_links = self._extract_all_existing_links(
-                    conn, feed_title)
-
-                new_links = []
-                new_pdf_links = []
-
-                for link in links:
-                    full_link = requests.compat.urljoin(source_url, link) if not link.startswith(
-                        ('http://', 'https://')) else link
-
-                    if full_link in existing_links:
-                        continue  # Skip processing since it's not new
-
-                    # Determine if the link is a PDF
-                    is_pdf = self._is_pdf_link(full_link)
-                    content_type = 'application/pdf' if is_pdf else 'unknown'
-
-                    # Add to new_links for batch insertion
-                    new_links.append({
-                        'link': full_link,
-                        'feed_title': feed_title,
-                        'source_url': source_url,
-                        'is_pdf': is_pdf,
-                        'content_type': content_type
-                    })
-
-                    # If it's a new PDF, add to the PDF processing list
-                    if is_pdf:
-                        new_pdf_links.append({
-                            'link': full_link,
-                            'feed_title': feed_title,
-                            'source_url': source_url
-                        })
-
-                # Batch insert new links
-                self._batch_insert_new_links(conn, feed_title, new_links)
-
-                # Batch process PDFs
-                self._process_pdf_batch(conn, new_pdf_links)
-
-                # Add new links to RSS feed
-                for link_entry in new_links:
-                    link = link_entry['link']
-                    is_pdf = link_entry['is_pdf']
-                    if pdf_only and not is_pdf:
-                        continue  # Skip non-PDF links in PDF-only mode
-
-                    fe = feed_gen.add_entry()
-                    # Use a meaningful title; here using the last part of the URL or a default
-                    entry_title = link.split('/')[-1] if '/' in link else link
-                    fe.title(entry_title)
-                    fe.link(href=link)
-
-                # Save feed to the rss directory
-                feed_gen.rss_file(output_path)
+        with Heartbeat(self._get_db_connection, self.worker_id, [self.pdf_jobs], self.logger):
+            for i, config in enumerate(self.configs, start=1):
                 self.logger.info(
-                    f"Saved RSS feed for '{feed_title}' to '{output_path}'"
+                    "Processing config %s/%s: %s",
+                    i, len(self.configs), config.get('feed_title', 'Unnamed Feed')
                 )
+                self._crawl_feed_with_ledger(conn, run_id, config)
+                self.throttle.save(conn)
+
+        if self.revalidate_after_seconds:
+            self.revalidate_documents()
 
-            except Exception as e:
-                self.logger.error(f"Error processing config {config}: {e}")
+        self.ledger.finish_run(conn, run_id, llm_tokens=self.token_budget.used)
+        self.extraction_pool.close()
 
         # Close the database connection after processing all feeds
         try:
             conn.close()
             self.logger.debug("Closed the database connection.")
         except Exception as e:
-            self.logger.error(f"Error closing database connection: {e}")
+            self.logger.error("Error closing database connection: %s", e)
 
         self.logger.info(
             "Completed RSS feed generation for all configurations.")
 
-    def _is_pdf_link(self, url: str) -> bool:
+    def enqueue_crawl(self) -> Optional[int]:
+        """
+        Queues a crawl of every configured feed as crawl_tasks for worker processes
+        (see app.worker) instead of crawling in this process. Returns the run id.
+        """
+        conn = self._get_db_connection()
+        try:
+            run_id = self.ledger.start_run(conn, len(self.configs), self.token_budget.limit)
+            self._sync_feed_catalog(conn)
+            queued = self.crawl_tasks.enqueue(conn, run_id, self.configs)
+            self.logger.info(
+                "Queued %s of %s feed(s) for crawl run %s",
+                queued, len(self.configs), run_id)
+            if queued == 0:
+                # Every feed is still queued or being crawled from an earlier run
+                self.ledger.finish_run(conn, run_id, status='skipped')
+            return run_id
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to queue crawl: %s", e)
+            return None
+        finally:
+            conn.close()
+
+    def _reextract_archived(self, row: Tuple[int, str, str]) -> Tuple[Optional[Dict], str]:
+        """Re-extracts one archived document. Returns its metadata and an outcome."""
+        pdf_id, pdf_url, content_sha256 = row
+        pdf_bytes = self.archive.get(content_sha256)
+        if pdf_bytes is None:
+            self.logger.warning("PDF %s (%s) is not in the archive", pdf_url, content_sha256)
+            return None, 'missing'
+        if DocumentArchive.digest(pdf_bytes) != content_sha256:
+            self.logger.error("Archived copy of PDF %s is corrupt", pdf_url)
+            return None, 'missing'
+        try:
+            return self._extract_pdf_metadata(pdf_bytes), 'reprocessed'
+        except ExtractionError as e:
+            self.logger.error("Could not re-extract PDF %s: %s", pdf_url, e)
+            return None, 'failed'
+        except TokenBudgetExceeded as e:
+            self.logger.info("Not reprocessing PDF %s: %s", pdf_url, e)
+            return None, 'deferred'
+
+    def reprocess_archive(self, feed_title: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Re-runs extraction and LLM cleanup over archived copies of stored documents and
+        updates their text and metadata in place, without contacting the documents'
+        origin. Documents are selected by feed and by date_processed in [since, until),
+        and up to `pdf_job_concurrency` are processed at once.
+
+        Returns counts of documents reprocessed, failed, missing from the archive,
+        deferred because the token budget ran out, and stored before archiving began
+        (which can only be refreshed by a new download).
+        """
+        if self.archive is None:
+            raise ValueError("Reprocessing needs an archive_directory")
+
+        filters, params = [], []
+        if feed_title:
+            filters.append("feed_title = %s")
+            params.append(feed_title)
+        if since:
+            filters.append("date_processed >= %s")
+            params.append(since)
+        if until:
+            filters.append("date_processed < %s")
+            params.append(until)
+        where = ' AND '.join(filters) or 'TRUE'
+
+        conn = self._get_db_connection()
+        counts = {'reprocessed': 0, 'failed': 0, 'missing': 0, 'deferred': 0, 'unarchived': 0}
+        self.token_budget.reset()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT COUNT(*) FROM pdf_content WHERE {where} AND content_sha256 IS NULL",
+                params)
+            counts['unarchived'] = cursor.fetchone()[0]
+            cursor.execute(f"""
+                SELECT id, pdf_url, content_sha256 FROM pdf_content
+                WHERE {where} AND content_sha256 IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, params + [limit])
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+            self.logger.info(
+                "Reprocessing %s archived document(s); %s stored before archiving are skipped",
+                len(rows), counts['unarchived'])
+
+            with ThreadPoolExecutor(max_workers=self.pdf_job_concurrency) as executor:
+                for row, (metadata, outcome) in zip(
+                        rows, executor.map(self._reextract_archived, rows)):
+                    if metadata is not None and not self._store_reprocessed(conn, row, metadata):
+                        outcome = 'failed'
+                    counts[outcome] += 1
+
+            if counts['reprocessed']:
+                # Bump the crawl generation so API caches drop the old text
+                self._bump_generation(conn)
+        finally:
+            conn.close()
+            self.extraction_pool.close()
+
+        self.logger.info(
+            "Reprocessed %s document(s): %s failed, %s missing from the archive",
+            counts['reprocessed'], counts['failed'], counts['missing'])
+        return counts
+
+    def _store_reprocessed(self, conn, row: Tuple[int, str, str], metadata: Dict) -> bool:
+        pdf_id, pdf_url, _ = row
+        content = metadata.get('content', '')
+        # Reprocessing re-cleans every chunk, so near-duplicates are only looked up to
+        # link the document to its original
+        duplicate = self._near_duplicate(conn, metadata.get('minhash'), pdf_id)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE pdf_content SET
+                    excerpt = %s,
+                    word_count = %s,
+                    title = %s,
+                    author = %s,
+                    creation_date = %s,
+                    modification_date = %s,
+                    number_of_pages = %s,
+                    llm_tokens = %s,
+                    duplicate_of = %s,
+                    duplicate_similarity = %s,
+                    reprocessed_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (
+                make_excerpt(content),
+                count_words(content),
+                metadata.get('title', ''),
+                metadata.get('author', ''),
+                metadata.get('creation_date', ''),
+                metadata.get('modification_date', ''),
+                metadata.get('number_of_pages', 0),
+                metadata.get('llm_tokens', 0),
+                duplicate[1] if duplicate else None,
+                duplicate[2] if duplicate else None,
+                pdf_id
+            ))
+            cursor.execute("""
+                INSERT INTO pdf_body (id, content) VALUES (%s, %s)
+                ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content
+            """, (pdf_id, content))
+            NearDuplicateIndex.store(cursor, pdf_id, metadata.get('minhash'), metadata.get('chunks', []))
+            conn.commit()
+            cursor.close()
+            return True
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to store reprocessed PDF %s: %s", pdf_url, e)
+            return False
+
+    def revalidate_documents(self, feed_title: Optional[str] = None,
+                             older_than: Optional[float] = None,
+                             limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Checks stored documents against their origin with conditional requests and
+        re-extracts only those whose bytes changed. The replaced version, including its
+        text, is kept in pdf_versions. Documents are checked oldest validation first once
+        `older_than` seconds (default `revalidate_after_seconds`) have passed since they
+        were stored or last checked, up to `limit` (default `revalidate_batch`) at a time.
+
+        Returns counts of documents unchanged, changed, gone from origin, failed and
+        deferred. Gone documents are kept as they are; changed documents whose cleanup
+        does not fit the token budget are deferred and checked again on a later run.
+        """
+        older_than = self.revalidate_after_seconds if older_than is None else older_than
+        limit = self.revalidate_batch if limit is None else limit
+
+        filters, params = [
+            "COALESCE(last_validated_at, date_processed) < "
+            "CURRENT_TIMESTAMP - make_interval(secs => %s)"
+        ], [older_than]
+        if feed_title:
+            filters.append("feed_title = %s")
+            params.append(feed_title)
+
+        conn = self._get_db_connection()
+        counts = {outcome: 0 for outcome in REVALIDATION_OUTCOMES}
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(f"""
+                SELECT id, feed_title, pdf_url, content_sha256, etag, last_modified, content_length
+                FROM pdf_content
+                WHERE {' AND '.join(filters)}
+                ORDER BY COALESCE(last_validated_at, date_processed)
+                LIMIT %s
+            """, params + [limit])
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+            if not rows:
+                return counts
+            self.logger.info("Revalidating %s stored document(s)", len(rows))
+
+            with ThreadPoolExecutor(max_workers=self.pdf_job_concurrency) as executor:
+                for row, result in zip(rows, executor.map(self._revalidate_pdf, rows)):
+                    outcome = result[0]
+                    if outcome == 'changed':
+                        if not self._store_refreshed(conn, row, *result[1:]):
+                            outcome = 'failed'
+                    elif outcome not in ('failed', 'deferred'):
+                        self._mark_validated(conn, row, result[1], result[2])
+                    CRAWL_REVALIDATIONS.inc(outcome=outcome)
+                    counts[outcome] += 1
+
+            if counts['changed']:
+                # Bump the crawl generation so API caches drop the old text
+                self._bump_generation(conn)
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to revalidate stored documents: %s", e)
+        finally:
+            conn.close()
+            self.extraction_pool.close()
+
+        self.logger.info(
+            "Revalidated documents: %s unchanged, %s changed, %s gone, %s failed",
+            counts['unchanged'], counts['changed'], counts['gone'], counts['failed'])
+        return counts
+
+    def _revalidate_pdf(self, row: Dict) -> Tuple[str, Optional[PDFDownload], Optional[str], Optional[Dict]]:
+        """
+        Revalidates one stored document. Returns the outcome, the download, the digest of
+        downloaded bytes, and for changed documents their extracted metadata.
+
+        Documents stored before digests were recorded cannot be compared, so their first
+        full download is kept as the baseline and counted as unchanged.
+        """
+        pdf_url = row['pdf_url']
+        try:
+            download = self._download_pdf(pdf_url, validators=row)
+        except PDFJobError as e:
+            if e.retryable:
+                self.logger.warning("Could not revalidate PDF %s: %s", pdf_url, e)
+                return 'failed', None, None, None
+            self.logger.info("PDF %s is gone from origin: %s", pdf_url, e)
+            return 'gone', None, None, None
+
+        if download.content is None:
+            return 'unchanged', download, None, None
+        CRAWL_BYTES_DOWNLOADED.inc(len(download.content))
+        content_sha256 = DocumentArchive.digest(download.content)
+        if content_sha256 == row['content_sha256']:
+            return 'unchanged', download, None, None
+        self._archive_pdf(download.content, pdf_url)
+        if row['content_sha256'] is None:
+            return 'unchanged', download, content_sha256, None
+
+        try:
+            conn = self._get_db_connection()
+        except psycopg2.Error:
+            return 'failed', None, None, None
+        try:
+            metadata = self._extract_pdf_metadata(download.content, conn, row['id'])
+        except ExtractionError as e:
+            self.logger.error("Could not extract changed PDF %s: %s", pdf_url, e)
+            return 'failed', None, None, None
+        except TokenBudgetExceeded as e:
+            self.logger.info("Deferring changed PDF %s: %s", pdf_url, e)
+            return 'deferred', None, None, None
+        finally:
+            conn.close()
+        self.logger.info("PDF %s changed at origin", pdf_url)
+        return 'changed', download, content_sha256, metadata
+
+    def _mark_validated(self, conn, row: Dict, download: Optional[PDFDownload],
+                        content_sha256: Optional[str] = None):
+        """
+        Records a check of an unchanged or gone document, keeping any new validators and
+        a baseline digest for documents stored without one.
+        """
+        etag = last_modified = content_length = None
+        if download is not None:
+            etag, last_modified, content_length = (
+                download.etag, download.last_modified, download.content_length)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE pdf_content SET
+                    etag = COALESCE(%s, etag),
+                    last_modified = COALESCE(%s, last_modified),
+                    content_length = COALESCE(%s, content_length),
+                    content_sha256 = COALESCE(content_sha256, %s),
+                    last_validated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (etag, last_modified, content_length, content_sha256, row['id']))
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record revalidation of PDF %s: %s", row['pdf_url'], e)
+
+    def _store_refreshed(self, conn, row: Dict, download: PDFDownload, content_sha256: str,
+                         metadata: Dict) -> bool:
+        """Moves the stored version of a changed document to pdf_versions and stores the new one."""
+        content = metadata.get('content', '')
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO pdf_versions (
+                    pdf_id, version, content_sha256, etag, last_modified, content_length, title,
+                    author, creation_date, modification_date, number_of_pages, file_size_bytes,
+                    word_count, excerpt, content, fetched_at
+                )
+                SELECT
+                    p.id, p.version, p.content_sha256, p.etag, p.last_modified, p.content_length,
+                    p.title, p.author, p.creation_date, p.modification_date, p.number_of_pages,
+                    p.file_size_bytes, p.word_count, p.excerpt, b.content,
+                    COALESCE(p.content_changed_at, p.date_processed)
+                FROM pdf_content p
+                LEFT JOIN pdf_body b ON b.id = p.id
+                WHERE p.id = %s
+            """, (row['id'],))
+            cursor.execute("""
+                UPDATE pdf_content SET
+                    excerpt = %s,
+                    word_count = %s,
+                    title = %s,
+                    author = %s,
+                    creation_date = %s,
+                    modification_date = %s,
+                    number_of_pages = %s,
+                    file_size_bytes = %s,
+                    content_sha256 = %s,
+                    etag = %s,
+                    last_modified = %s,
+                    content_length = %s,
+                    llm_tokens = %s,
+                    duplicate_of = %s,
+                    duplicate_similarity = %s,
+                    version = version + 1,
+                    content_changed_at = CURRENT_TIMESTAMP,
+                    last_validated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (
+                make_excerpt(content),
+                count_words(content),
+                metadata.get('title', ''),
+                metadata.get('author', ''),
+                metadata.get('creation_date', ''),
+                metadata.get('modification_date', ''),
+                metadata.get('number_of_pages', 0),
+                metadata.get('file_size_bytes', 0),
+                content_sha256,
+                download.etag,
+                download.last_modified,
+                download.content_length,
+                metadata.get('llm_tokens', 0),
+                metadata.get('duplicate_of'),
+                metadata.get('duplicate_similarity'),
+                row['id']
+            ))
+            cursor.execute("""
+                INSERT INTO pdf_body (id, content) VALUES (%s, %s)
+                ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content
+            """, (row['id'], content))
+            NearDuplicateIndex.store(
+                cursor, row['id'], metadata.get('minhash'), metadata.get('chunks', []))
+            conn.commit()
+            cursor.close()
+            return True
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to store changed PDF %s: %s", row['pdf_url'], e)
+            return False
+
+    def _probe_link(self, url: str) -> Tuple[bool, Optional[int]]:
         """
         Check if the given URL points to a PDF by using a GET request and inspecting the 'Content-Type' header.
+        Returns whether it does and the Content-Length, if reported, to estimate its cleanup cost.
         """
-        self.logger.debug(f"Checking if URL is a PDF: {url}")
+        self.link_logger.debug("Checking if URL is a PDF: %s", url)
         try:
             headers = self._get_random_headers()
             # Using GET instead of HEAD to handle servers that don't respond properly to HEAD
-            response = requests.get(
-                url, headers=headers, allow_redirects=True, timeout=10, stream=True
-            )
+            with self.throttle.slot(url) as outcome:
+                response = requests.get(
+                    url, headers=headers, allow_redirects=True, timeout=10, stream=True
+                )
+                outcome.observe(response)
             response.raise_for_status()
             content_type = response.headers.get('Content-Type', '').lower()
-            self.logger.debug(f"URL: {url} | Content-Type: {content_type}")
+            self.link_logger.debug("URL: %s | Content-Type: %s", url, content_type)
+            length = response.headers.get('Content-Length')
             # Close the response stream since we only needed headers
             response.close()
-            return 'application/pdf' in content_type
-        except requests.RequestException as e:
-            self.logger.error(f"Failed to verify Content-Type for {url}: {e}")
-            return False
+            return ('application/pdf' in content_type,
+                    int(length) if length and length.isdigit() else None)
+        except (requests.RequestException, HostThrottled) as e:
+            self.logger.error("Failed to verify Content-Type for %s: %s", url, e)
+            return False, None
+
+
+def crawler_from_env(config_file: str = 'crawler_config.json', log_level: Optional[int] = None,
+                     log_file: str = 'logs/web_rss_crawler.log', **overrides) -> WebRSSCrawler:
+    """
+    Builds a WebRSSCrawler configured from the CRAWLER_* and PDF_JOB_* environment
+    variables. Keyword arguments override the environment.
+    """
+    options = dict(
+        rss_directory='rss',  # Ensure RSS feeds are saved to the 'rss' folder
+        archive_directory=os.getenv('PDF_ARCHIVE_DIR', 'archive') or None,
+        link_dedup=os.getenv('CRAWLER_LINK_DEDUP', 'memory'),
+        pdf_job_concurrency=int(os.getenv('PDF_JOB_CONCURRENCY', '4')),
+        pdf_job_max_attempts=int(os.getenv('PDF_JOB_MAX_ATTEMPTS', '6')),
+        pdf_job_backoff_seconds=float(os.getenv('PDF_JOB_BACKOFF_SECONDS', '900')),
+        host_concurrency=float(os.getenv('CRAWLER_HOST_CONCURRENCY', '2')),
+        host_max_concurrency=float(os.getenv('CRAWLER_HOST_MAX_CONCURRENCY', '8')),
+        extract_timeout=float(os.getenv('EXTRACT_TIMEOUT_SECONDS', '120')),
+        extract_max_rss_mb=int(os.getenv('EXTRACT_MAX_RSS_MB', '1024')),
+        extract_max_pages=int(os.getenv('EXTRACT_MAX_PAGES', '500')),
+        revalidate_after_seconds=float(os.getenv('PDF_REVALIDATE_SECONDS', str(7 * 86400))),
+        revalidate_batch=int(os.getenv('PDF_REVALIDATE_BATCH', '200')),
+        link_log_sample_rate=float(os.getenv('LOG_LINK_SAMPLE_RATE', '0.01')),
+        llm_pack_max_tokens=int(os.getenv('LLM_PACK_MAX_TOKENS', '2500')),
+        llm_pack_linger=float(os.getenv('LLM_PACK_LINGER_SECONDS', '0.25')),
+        llm_token_budget=int(os.getenv('LLM_RUN_TOKEN_BUDGET', '0')),
+        llm_defer_seconds=float(os.getenv('LLM_DEFER_SECONDS', '3600')),
+        near_duplicate_threshold=float(
+            os.getenv('NEAR_DUPLICATE_THRESHOLD', str(DEFAULT_THRESHOLD)))
+    )
+    options.update(overrides)
+    return WebRSSCrawler(config_file=config_file, log_level=log_level, log_file=log_file, **options)
 
 
 def run_scraper():
     """
-    Initializes and runs the WebRSSCrawler to generate RSS feeds.
+    Initializes and runs the WebRSSCrawler to generate RSS feeds. With CRAWLER_MODE=queue
+    the feeds are only queued, and `python -m app.worker` processes do the crawling.
     """
     try:
-        crawler = WebRSSCrawler(
-            config_file='crawler_config.json',
-            log_level=logging.DEBUG,
-            rss_directory='rss'  # Ensure RSS feeds are saved to the 'rss' folder
-        )
-        crawler.generate_rss_feeds()
+        crawler = crawler_from_env()
+        if os.getenv('CRAWLER_MODE', 'inline') == 'queue':
+            crawler.enqueue_crawl()
+        else:
+            crawler.generate_rss_feeds()
     except Exception as e:
-        logger = logging.getLogger('WebRSSCrawler')
-        logger.error(f"Failed to run scraper: {e}")
-
-
+        logger = logging.getLogger(__name__)
+        logger.error("Failed to run scraper: %s", e)
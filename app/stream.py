@@ -0,0 +1,241 @@
+"""
+Push notifications of newly stored articles.
+
+The crawler sends a Postgres NOTIFY on NEW_ARTICLE_CHANNEL in the transaction that stores
+each document, so notifications are only delivered once the document is committed and
+reach every API worker, whichever process stored it. Each worker keeps one LISTEN
+connection (ArticleStream) and fans notifications out to its /api/stream clients.
+
+Notifications arrive in commit order, which is not the order of article ids or change
+cursors. Clients resume from a change cursor below the snapshot horizon instead (see
+app.changes), which replay_articles() advances past every committed change.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from app.changes import format_cursor, parse_cursor
+
+
+NEW_ARTICLE_CHANNEL = 'pdf_content_new'
+
+# NOTIFY payloads are limited to 8000 bytes, so free-text columns are truncated. The
+# columns are read from pdf_content p.
+_EVENT_JSON = """
+    (SELECT row_to_json(t)::text FROM (
+        SELECT
+            p.id,
+            p.feed_title,
+            LEFT(p.source_link, 2000) AS source_link,
+            LEFT(p.pdf_url, 2000) AS pdf_url,
+            LEFT(p.title, 500) AS title,
+            p.page_title,
+            p.number_of_pages,
+            p.file_size_bytes,
+            p.word_count,
+            p.date_processed
+    ) t)
+"""
+
+
+def notify_new_article(cursor, pdf_id: int):
+    """Queues the new-article notification for `pdf_id`; it is sent when the transaction commits."""
+    cursor.execute(
+        f"SELECT pg_notify(%s, {_EVENT_JSON}) FROM pdf_content p WHERE p.id = %s",
+        (NEW_ARTICLE_CHANNEL, pdf_id))
+
+
+def replay_articles(conn, after: str, feed_title: Optional[str] = None,
+                    page_size: int = 500) -> Iterator[Tuple[str, int, str]]:
+    """
+    Yields (cursor, id, payload) for articles stored or changed after the change cursor
+    `after`, in cursor order, with payloads in the same format as live notifications.
+    Only changes below the snapshot horizon are read, so each cursor is a safe resume
+    point. Reads `page_size` rows per query. Raises ValueError for an invalid cursor.
+    """
+    xid, seq = parse_cursor(after)
+    where = "(p.change_xid, p.change_seq) > (%s::xid8, %s)"
+    where += " AND p.change_xid < pg_snapshot_xmin(pg_current_snapshot())"
+    if feed_title:
+        where += " AND p.feed_title = %s"
+    cursor = conn.cursor()
+    try:
+        while True:
+            params = [str(xid), seq] + ([feed_title] if feed_title else []) + [page_size]
+            cursor.execute(f"""
+                SELECT p.change_xid::text, p.change_seq, p.id, {_EVENT_JSON}
+                FROM pdf_content p
+                WHERE {where}
+                ORDER BY p.change_xid, p.change_seq
+                LIMIT %s
+            """, params)
+            rows = cursor.fetchall()
+            conn.commit()
+            for xid, seq, article_id, payload in rows:
+                yield format_cursor(xid, seq), article_id, payload
+            if len(rows) < page_size:
+                return
+    finally:
+        cursor.close()
+
+
+# Put on a subscription when notifications may have been missed, after a dropped LISTEN
+# connection or a full queue; the client catches up from the database
+RESYNC = object()
+
+
+class Subscription:
+    """The notifications one stream client has yet to send, optionally for a single feed."""
+
+    def __init__(self, feed_title: Optional[str], maxsize: int):
+        self.feed_title = feed_title
+        self.events: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._overflowed = False
+
+    def offer(self, item):
+        """Adds an event without blocking. A client that falls behind is told to resync."""
+        if self._overflowed and item is not RESYNC:
+            return
+        try:
+            self.events.put_nowait(item)
+        except queue.Full:
+            self._overflowed = True
+            # Make room so the resync marker itself is never lost
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                pass
+            self.events.put_nowait(RESYNC)
+
+    def get(self, timeout: float):
+        """
+        Returns the next (id, payload) or RESYNC, or None after `timeout` seconds. Events
+        are accepted again from the moment RESYNC is taken, so a replay started after it
+        overlaps the queue instead of leaving a gap.
+        """
+        try:
+            item = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is RESYNC:
+            self._overflowed = False
+        return item
+
+
+class ArticleStream:
+    """
+    Fans new-article notifications out to the stream clients of this process.
+
+    A background thread holds a single LISTEN connection while there are subscribers
+    and closes it when the last one leaves. If the connection drops it reconnects after
+    `reconnect_delay` seconds and tells every subscriber to resync from the database.
+    """
+
+    def __init__(self, connect: Callable, logger: logging.Logger,
+                 channel: str = NEW_ARTICLE_CHANNEL, queue_size: int = 1000,
+                 poll_interval: float = 1.0, reconnect_delay: float = 5.0):
+        self._connect = connect
+        self.logger = logger
+        self.channel = channel
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._listening = threading.Event()
+        self.notifications = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, feed_title: Optional[str] = None, timeout: float = 5.0) -> Subscription:
+        """
+        Registers a subscriber and waits up to `timeout` seconds for the LISTEN to be in
+        place, so that a replay run afterwards cannot miss an article.
+        """
+        subscription = Subscription(feed_title, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._listening.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='article-stream', daemon=True)
+                self._thread.start()
+        self._listening.wait(timeout)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            self.logger.warning("Ignoring malformed %s notification", self.channel)
+            return
+        item = (event['id'], payload)
+        with self._lock:
+            subscribers: List[Subscription] = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.feed_title is None or subscription.feed_title == event.get('feed_title'):
+                subscription.offer(item)
+
+    def _resync_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(RESYNC)
+
+    def _run(self):
+        resync = False
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            conn = None
+            try:
+                conn = self._connect()
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {self.channel}")
+                cursor.close()
+                self._listening.set()
+                if resync:
+                    self._resync_all()
+                    resync = False
+                while True:
+                    with self._lock:
+                        if not self._subscribers:
+                            self._listening.clear()
+                            break
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.notifications += 1
+                        self._dispatch(notify.payload)
+            except (psycopg2.Error, OSError) as e:
+                self.logger.error("Article stream connection failed: %s", e)
+                # Let waiting subscribers go on; they resync once the connection is back
+                self._listening.set()
+                resync = True
+                time.sleep(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
@@ -0,0 +1,318 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import psycopg2
+import psycopg2.extras
+import requests
+
+from app.metrics import REGISTRY
+
+
+HOST_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'crawler_host_concurrency_limit',
+    'Learned concurrent request limit per crawled host',
+    ['host']
+)
+HOST_BACKOFFS = REGISTRY.counter(
+    'crawler_host_backoffs_total',
+    'Number of times a host limit was cut, by reason',
+    ['host', 'reason']
+)
+
+# Responses that mean the server wants us to slow down
+BACKOFF_STATUS_CODES = {429, 503}
+
+
+class HostThrottled(Exception):
+    """Raised when a host stays unavailable (Retry-After or full) for longer than max_wait."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Host {host} is throttled for another {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostState:
+    __slots__ = ('host', 'limit', 'interval', 'in_flight', 'latency', 'baseline',
+                 'blocked_until', 'last_start', 'last_decrease', 'dirty')
+
+    def __init__(self, host: str, limit: float):
+        self.host = host
+        self.limit = limit
+        # Minimum spacing between request starts, used once the limit is down to one
+        self.interval = 0.0
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.blocked_until = 0.0
+        self.last_start = 0.0
+        self.last_decrease = 0.0
+        self.dirty = False
+
+
+class RequestOutcome:
+    """
+    Handed to the caller of HostThrottle.slot to report the response it got. The time
+    of observe() marks the first byte, so reading a large body is not mistaken for latency.
+    """
+    __slots__ = ('response', 'congested', 'observed_at')
+
+    def __init__(self):
+        self.response: Optional[requests.Response] = None
+        self.congested = False
+        self.observed_at: Optional[float] = None
+
+    def observe(self, response: requests.Response):
+        self.response = response
+        self.observed_at = time.monotonic()
+
+
+class HostThrottle:
+    """
+    Per-host AIMD concurrency control for outgoing requests.
+
+    Each host starts at `initial_limit` concurrent requests. Every healthy response adds
+    1/limit, so the limit grows by about one per round of requests. A 429 or 503, a
+    timeout or connection error, a 5xx, or a time-to-first-byte above `latency_factor`
+    times the host's baseline halves it, at most once per round trip. Below one request
+    at a time the host is slowed further by spacing requests out. A Retry-After header
+    blocks the host until the time it names.
+
+    Learned limits are stored in the host_limits table so the next run starts from them.
+    """
+
+    def __init__(self, logger: logging.Logger, initial_limit: float = 2.0,
+                 min_limit: float = 1.0, max_limit: float = 8.0, latency_factor: float = 3.0,
+                 max_interval: float = 10.0, max_wait: float = 120.0,
+                 max_retry_after: float = 3600.0):
+        self.logger = logger
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.latency_factor = latency_factor
+        self.max_interval = max_interval
+        self.max_wait = max_wait
+        self.max_retry_after = max_retry_after
+        self._hosts: Dict[str, HostState] = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS host_limits (
+                host TEXT PRIMARY KEY,
+                concurrency_limit REAL NOT NULL,
+                request_interval REAL NOT NULL DEFAULT 0,
+                latency_ms REAL,
+                baseline_ms REAL,
+                blocked_until TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(host, self.initial_limit)
+            HOST_CONCURRENCY_LIMIT.set(state.limit, host=host)
+        return state
+
+    def _acquire(self, host: str) -> HostState:
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                if state.blocked_until > now:
+                    wait = state.blocked_until - now
+                    if now + wait > deadline:
+                        raise HostThrottled(host, wait)
+                elif state.in_flight >= max(1, int(state.limit)):
+                    wait = deadline - now
+                    if wait <= 0:
+                        raise HostThrottled(host, 0)
+                elif state.interval and now - state.last_start < state.interval:
+                    wait = state.interval - (now - state.last_start)
+                else:
+                    break
+                self._cond.wait(wait)
+
+            state.in_flight += 1
+            state.last_start = now
+            return state
+
+    def _decrease(self, state: HostState, now: float, reason: str):
+        # Concurrent requests failing together count as a single congestion event
+        if now - state.last_decrease < max(state.latency or 0.0, 1.0):
+            return
+        state.last_decrease = now
+        if state.limit > self.min_limit:
+            state.limit = max(self.min_limit, state.limit / 2)
+        else:
+            state.interval = min(self.max_interval, max(state.interval * 2, 0.25))
+        HOST_BACKOFFS.inc(host=state.host, reason=reason)
+        self.logger.info(
+            "Backing off %s (%s): limit %.2f, interval %.2fs",
+            state.host, reason, state.limit, state.interval)
+
+    def _increase(self, state: HostState):
+        if state.interval:
+            state.interval = state.interval * 0.9 if state.interval > 0.05 else 0.0
+        else:
+            state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+
+    def _release(self, state: HostState, outcome: RequestOutcome, elapsed: float):
+        now = time.monotonic()
+        response = outcome.response
+        with self._cond:
+            state.in_flight -= 1
+            status = response.status_code if response is not None else None
+
+            if status in BACKOFF_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after:
+                    state.blocked_until = max(
+                        state.blocked_until, now + min(retry_after, self.max_retry_after))
+                self._decrease(state, now, 'rate_limited')
+            elif outcome.congested or (status is not None and status >= 500):
+                self._decrease(state, now, 'error')
+            elif status is not None:
+                state.latency = elapsed if state.latency is None else 0.8 * state.latency + 0.2 * elapsed
+                # The baseline follows the fastest sustained latency, drifting up slowly
+                # so a host that is permanently slower is not treated as overloaded forever
+                if state.baseline is None or state.latency < state.baseline:
+                    state.baseline = state.latency
+                else:
+                    state.baseline += (state.latency - state.baseline) * 0.01
+                if state.latency > self.latency_factor * max(state.baseline, 0.05):
+                    self._decrease(state, now, 'latency')
+                else:
+                    self._increase(state)
+
+            state.dirty = True
+            HOST_CONCURRENCY_LIMIT.set(state.limit, host=state.host)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        Holds one of the host's request slots for the duration of the block. The block
+        reports the response through the yielded RequestOutcome; timeouts and connection
+        errors raised inside it count as congestion.
+        """
+        state = self._acquire(urlsplit(url).netloc.lower())
+        outcome = RequestOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except (requests.Timeout, requests.ConnectionError):
+            outcome.congested = True
+            raise
+        finally:
+            self._release(state, outcome, (outcome.observed_at or time.monotonic()) - start)
+
+    def load(self, conn):
+        """Starts every known host from the limits learned on earlier runs."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT host, concurrency_limit, request_interval, latency_ms, baseline_ms,
+                       GREATEST(EXTRACT(EPOCH FROM blocked_until - CURRENT_TIMESTAMP), 0)
+                FROM host_limits
+            """)
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to load host limits: %s", e)
+            return
+
+        now = time.monotonic()
+        with self._cond:
+            for host, limit, interval, latency_ms, baseline_ms, blocked_for in rows:
+                state = self._state(host)
+                if state.dirty:
+                    continue  # This process has newer information
+                state.limit = min(self.max_limit, max(self.min_limit, limit))
+                state.interval = min(self.max_interval, interval or 0.0)
+                state.latency = latency_ms / 1000 if latency_ms is not None else None
+                state.baseline = baseline_ms / 1000 if baseline_ms is not None else None
+                state.blocked_until = now + float(blocked_for or 0)
+                HOST_CONCURRENCY_LIMIT.set(state.limit, host=host)
+
+    def save(self, conn):
+        """Persists the limits of hosts contacted since the last save."""
+        now = time.monotonic()
+        with self._cond:
+            rows = [
+                (state.host, state.limit, state.interval,
+                 state.latency * 1000 if state.latency is not None else None,
+                 state.baseline * 1000 if state.baseline is not None else None,
+                 max(0.0, state.blocked_until - now))
+                for state in self._hosts.values() if state.dirty
+            ]
+        if not rows:
+            return
+        try:
+            cursor = conn.cursor()
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO host_limits (
+                    host, concurrency_limit, request_interval, latency_ms, baseline_ms, blocked_until
+                )
+                SELECT v.host, v.lim, v.intv, v.lat, v.base,
+                       CASE WHEN v.blocked > 0
+                            THEN CURRENT_TIMESTAMP + make_interval(secs => v.blocked) END
+                FROM (VALUES %s) AS v(host, lim, intv, lat, base, blocked)
+                ON CONFLICT (host) DO UPDATE SET
+                    concurrency_limit = EXCLUDED.concurrency_limit,
+                    request_interval = EXCLUDED.request_interval,
+                    latency_ms = EXCLUDED.latency_ms,
+                    baseline_ms = EXCLUDED.baseline_ms,
+                    blocked_until = EXCLUDED.blocked_until,
+                    updated_at = CURRENT_TIMESTAMP
+            """, rows, template="(%s, %s::real, %s::real, %s::real, %s::real, %s::float8)")
+            conn.commit()
+            cursor.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to save host limits: %s", e)
+            return
+
+        with self._cond:
+            for row in rows:
+                self._hosts[row[0]].dirty = False
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._cond:
+            return {
+                host: {
+                    'limit': round(state.limit, 3),
+                    'interval': round(state.interval, 3),
+                    'latency_ms': round(state.latency * 1000, 1) if state.latency is not None else None,
+                    'in_flight': state.in_flight,
+                }
+                for host, state in self._hosts.items()
+            }
@@ -0,0 +1,106 @@
+import re
+import string
+from typing import Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote_plus, urljoin, urlsplit, urlunsplit
+
+
+# Query parameters that only track where a click came from and never change the document
+TRACKING_PARAMS = re.compile(r'^(utm_[a-z]+|fbclid|gclid|mc_cid|mc_eid)$', re.IGNORECASE)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Characters left unescaped in canonical paths: RFC 3986 sub-delims, ':', '@', '/' and
+# existing percent-escapes (unreserved characters are never escaped by quote)
+_PATH_SAFE = "/:@!$&'()*+,;=%"
+_UNRESERVED = frozenset(string.ascii_letters + string.digits + '-._~')
+_ESCAPE_RE = re.compile(r'%([0-9A-Fa-f]{2})')
+
+
+def _normalize_escape(match: re.Match) -> str:
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else f"%{match.group(1).upper()}"
+
+
+def _remove_dot_segments(path: str) -> str:
+    output = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    return '/'.join(output)
+
+
+def _normalize_path(path: str) -> str:
+    path = _remove_dot_segments(path)
+    # Escaped unreserved characters are decoded and other escapes uppercased; reserved
+    # ones such as %2F stay escaped since decoding them would change the path
+    path = quote(_ESCAPE_RE.sub(_normalize_escape, path), safe=_PATH_SAFE)
+    if not path:
+        return '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+    return path
+
+
+def _query_params(query: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """Yields (name, value) pairs of a query string; value is None for a bare `?name`."""
+    for item in query.split('&'):
+        if item:
+            name, has_value, value = item.partition('=')
+            yield unquote_plus(name), unquote_plus(value) if has_value else None
+
+
+def _format_param(name: str, value: Optional[str]) -> str:
+    if value is None:
+        return quote(name, safe='')
+    return f"{quote(name, safe='')}={quote(value, safe='')}"
+
+
+def canonicalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the canonical form of a link, resolved against `base` if it is relative, or
+    None for links that cannot be crawled (mailto:, javascript:, bare fragments...).
+
+    The scheme and host are lowercased, default ports, fragments, trailing slashes and
+    tracking parameters are dropped, and query parameters are sorted by name, so
+    equivalent spellings of one document compare equal. Repeated parameters keep their
+    order and bare `?name` parameters stay bare, since servers may tell those apart.
+    """
+    url = (url or '').strip()
+    if not url:
+        return None
+    if base:
+        url = urljoin(base, url)
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip('.')
+    if ':' in host:
+        # urlsplit drops the brackets around IPv6 addresses
+        host = f"[{host}]"
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        host = f"{userinfo}@{host}"
+
+    # The sort is stable, so repeated names keep their order
+    query = '&'.join(_format_param(name, value) for name, value in sorted(
+        (param for param in _query_params(parts.query) if not TRACKING_PARAMS.match(param[0])),
+        key=lambda param: param[0]
+    ))
+
+    return urlunsplit((scheme, host, _normalize_path(parts.path), query, ''))
+
+
+def matches_any(url: str, patterns: Iterable[re.Pattern]) -> bool:
+    return any(pattern.search(url) for pattern in patterns)
@@ -0,0 +1,243 @@
+"""
+Crawl worker process.
+
+Claims feed crawl tasks and PDF jobs from Postgres with FOR UPDATE SKIP LOCKED, so any
+number of workers on any number of hosts can share one crawl. Crawls are queued by
+`WebRSSCrawler.enqueue_crawl`, which the server's scheduler calls when CRAWLER_MODE=queue.
+
+Usage:
+    python -m app.worker [--config crawler_config.json] [--exit-when-idle]
+"""
+import argparse
+import os
+import signal
+import threading
+import time
+
+import psycopg2
+
+from app.budget import RunTokenBudget
+from app.jobs import HEARTBEAT_INTERVAL_SECONDS, STALE_CLAIM_SECONDS, Heartbeat
+from app.metrics import REGISTRY, serve_metrics
+from app.scraper import WebRSSCrawler, crawler_from_env
+
+
+class CrawlWorker:
+    """
+    Runs queued work until stopped: feed crawls first, since they produce PDF jobs,
+    then batches of up to `pdf_job_concurrency` due PDF jobs.
+
+    A heartbeat thread keeps this worker's claims fresh. Claims whose heartbeat is
+    older than `stale_after` seconds, left by a crashed or killed worker, are
+    released by whichever worker notices them first.
+
+    PDF jobs are recorded in the ledger against the feed run that queued them, and a
+    run is closed once its feed tasks are done and none of its PDF jobs are running
+    or due.
+
+    When no task or job is due, a worker revalidates a batch of stored documents at
+    most every `revalidate_interval` seconds. An advisory lock lets only one worker
+    at a time do so, so no document is checked twice.
+
+    All workers share the LLM token budget of the newest crawl run, reserved and
+    settled in its crawl_runs row, which also makes that row's llm_tokens the run's
+    total. Once the budget is spent workers defer due PDF jobs to the next run.
+    """
+
+    def __init__(self, crawler: WebRSSCrawler, poll_interval: float = 5.0,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL_SECONDS,
+                 stale_after: float = STALE_CLAIM_SECONDS, save_limits_interval: float = 30.0,
+                 revalidate_interval: float = 300.0):
+        self.crawler = crawler
+        self.logger = crawler.logger
+        self.worker_id = crawler.worker_id
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.save_limits_interval = save_limits_interval
+        self.revalidate_interval = revalidate_interval
+        self._stopping = threading.Event()
+        self._released_at = 0.0
+        self._limits_saved_at = time.monotonic()
+        self._revalidated_at = 0.0
+        crawler.token_budget = RunTokenBudget(crawler._get_db_connection, self.logger)
+
+    def stop(self):
+        self._stopping.set()
+
+    def _finish_runs(self, conn):
+        """Closes the ledger entry of every run whose feed tasks and PDF jobs have finished."""
+        try:
+            run_ids = self.crawler.crawl_tasks.finished_runs(conn)
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to look up finished crawl runs: %s", e)
+            return
+        for run_id in run_ids:
+            self.crawler.ledger.finish_run(conn, run_id, tokens_recorded=True)
+
+    def _sync_budget_run(self):
+        """Switches the shared token budget to the newest crawl run."""
+        try:
+            if self.crawler.token_budget.sync():
+                self.logger.info("Worker %s using the token budget of crawl run %s",
+                                 self.worker_id, self.crawler.token_budget.run_id)
+        except psycopg2.Error as e:
+            self.logger.error("Failed to look up the current crawl run: %s", e)
+
+    def _run_feed_task(self, conn) -> bool:
+        task = self.crawler.crawl_tasks.claim(conn, self.worker_id)
+        if task is None:
+            return False
+
+        self.logger.info("Worker %s crawling feed '%s'", self.worker_id, task['feed_title'])
+        status, error = self.crawler._crawl_feed_with_ledger(
+            conn, task['run_id'], task['config'], process_pdfs=False)
+        try:
+            self.crawler.crawl_tasks.finish(conn, task, status, error)
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.logger.error("Failed to record crawl task %s: %s", task['id'], e)
+        self._finish_runs(conn)
+        return True
+
+    def _run_pdf_jobs(self, conn) -> bool:
+        """
+        Runs a batch of due PDF jobs, recording each against its feed run in the ledger.
+        Once the token budget is spent, due jobs are deferred rather than left due, so
+        their run can close.
+        """
+        jobs = self.crawler.pdf_jobs.claim_due(
+            conn, limit=self.crawler.pdf_job_concurrency, worker_id=self.worker_id)
+        if not jobs:
+            return False
+        if self.crawler._run_claimed_pdf_jobs(conn, jobs):
+            # New documents change feed counts and article lists served from cache
+            self.crawler._bump_generation(conn)
+        self._finish_runs(conn)
+        return True
+
+    def _revalidate(self, conn) -> bool:
+        """
+        Revalidates a batch of stored documents if `revalidate_interval` seconds have
+        passed since this worker last tried and no other worker is revalidating.
+        Returns True if any document was checked.
+        """
+        if (not self.crawler.revalidate_after_seconds
+                or time.monotonic() - self._revalidated_at < self.revalidate_interval):
+            return False
+        self._revalidated_at = time.monotonic()
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('pdf_revalidation'))")
+        locked = cursor.fetchone()[0]
+        conn.commit()
+        if not locked:
+            cursor.close()
+            return False
+        try:
+            counts = self.crawler.revalidate_documents()
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('pdf_revalidation'))")
+            conn.commit()
+            cursor.close()
+        return any(counts.values())
+
+    def run_once(self, conn) -> bool:
+        """Does one unit of work. Returns False if there was nothing to claim."""
+        if time.monotonic() - self._released_at >= self.stale_after / 2:
+            self.crawler._release_stale_claims(conn, self.stale_after)
+            self._finish_runs(conn)
+            self._sync_budget_run()
+            self._released_at = time.monotonic()
+        worked = (self._run_feed_task(conn) or self._run_pdf_jobs(conn)
+                  or self._revalidate(conn))
+        # Share learned host limits with other workers and with the next run
+        if time.monotonic() - self._limits_saved_at >= self.save_limits_interval:
+            self.crawler.throttle.save(conn)
+            self._limits_saved_at = time.monotonic()
+        return worked
+
+    def _idle(self, conn) -> bool:
+        """True if no work is queued or in progress anywhere."""
+        if self.crawler.crawl_tasks.has_outstanding(conn):
+            return False
+        return not self.crawler.pdf_jobs.has_due(conn)
+
+    def run(self, exit_when_idle: bool = False):
+        """
+        Works until stop() is called. With exit_when_idle the worker also returns once
+        no task or job is pending or held by any worker.
+        """
+        self.logger.info("Worker %s started", self.worker_id)
+        conn = None
+        heartbeat = Heartbeat(
+            self.crawler._get_db_connection, self.worker_id,
+            [self.crawler.crawl_tasks, self.crawler.pdf_jobs],
+            self.logger, interval=self.heartbeat_interval
+        )
+        with heartbeat:
+            while not self._stopping.is_set():
+                try:
+                    if conn is None or conn.closed:
+                        conn = self.crawler._get_db_connection()
+                        self.crawler.throttle.load(conn)
+                    if self.run_once(conn):
+                        continue
+                    if exit_when_idle and self._idle(conn):
+                        break
+                except psycopg2.Error as e:
+                    self.logger.error(
+                        "Worker %s lost its database connection: %s",
+                        self.worker_id, e)
+                    if conn is not None and not conn.closed:
+                        conn.close()
+                    conn = None
+                self._stopping.wait(self.poll_interval)
+
+        if conn is not None and not conn.closed:
+            self.crawler.throttle.save(conn)
+            conn.close()
+        self.crawler.extraction_pool.close()
+        self.logger.info("Worker %s stopped", self.worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--config', default='crawler_config.json', help='Crawler config file')
+    parser.add_argument('--log-file', default='logs/web_rss_crawler.log')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='Seconds to wait between polls when there is no work')
+    parser.add_argument('--heartbeat-interval', type=float, default=HEARTBEAT_INTERVAL_SECONDS)
+    parser.add_argument('--stale-after', type=float, default=STALE_CLAIM_SECONDS,
+                        help='Seconds without a heartbeat before a claim is taken over')
+    parser.add_argument('--revalidate-interval', type=float, default=300.0,
+                        help='Seconds between batches of stored document revalidation')
+    parser.add_argument('--metrics-port', type=int,
+                        default=int(os.getenv('WORKER_METRICS_PORT', '0')),
+                        help='Serve Prometheus metrics at /metrics on this port; 0 disables')
+    parser.add_argument('--exit-when-idle', action='store_true',
+                        help='Exit once no work is queued or in progress')
+    args = parser.parse_args()
+
+    # Workers on the API server's host can add their metrics to its /metrics instead
+    if os.getenv('METRICS_DIR'):
+        REGISTRY.share(os.getenv('METRICS_DIR'))
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    crawler = crawler_from_env(args.config, log_file=args.log_file)
+    worker = CrawlWorker(
+        crawler,
+        poll_interval=args.poll_interval,
+        heartbeat_interval=args.heartbeat_interval,
+        stale_after=args.stale_after,
+        revalidate_interval=args.revalidate_interval,
+    )
+    # Finish the current task on SIGTERM/SIGINT rather than abandoning its claim
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    worker.run(exit_when_idle=args.exit_when_idle)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+"""
+API load benchmark.
+
+Seeds a scratch PostgreSQL database with a synthetic all_links/pdf_content corpus,
+starts server.py under gunicorn and drives the article, feed and RSS endpoints at a
+fixed concurrency. Reports p50/p95/p99 latency, throughput and peak worker RSS per
+scenario.
+
+Seeded rows use feed titles prefixed with 'bench-api-' and are kept between runs so
+large corpora are only generated once; pass --reset to regenerate them.
+
+Usage:
+    python -m benchmarks.api_load --rows 10000 --concurrency 8 --duration 20
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from app.scraper import count_words, make_excerpt
+from benchmarks.synthetic import WORDS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEED_PREFIX = 'bench-api-'
+SCENARIOS = ('article', 'article_full', 'articles_feed', 'articles_date_range', 'articles_all',
+             'feeds', 'stats', 'rss_list', 'rss_file')
+
+
+def _connect():
+    import psycopg2
+    return psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST'),
+        port=os.getenv('POSTGRES_PORT', 5432),
+        dbname=os.getenv('POSTGRES_DB'),
+        user=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        sslmode=os.getenv('POSTGRES_SSLMODE', 'require')
+    )
+
+
+def _ensure_schema(workdir: str):
+    """Creates the crawler's tables by initializing a crawler with an empty config."""
+    from app.scraper import WebRSSCrawler
+
+    config_path = os.path.join(workdir, 'empty_config.json')
+    with open(config_path, 'w') as f:
+        json.dump([], f)
+    WebRSSCrawler(
+        config_file=config_path,
+        log_level=logging.WARNING,
+        log_file=os.path.join(workdir, 'schema.log'),
+        rss_directory=os.path.join(workdir, 'rss'),
+        state_directory=os.path.join(workdir, 'state'),
+        archive_directory=os.path.join(workdir, 'archive'),
+    )
+
+
+def _copy_rows(cursor, table: str, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(
+            '\\N' if value is None else str(value).replace('\\', '\\\\')
+            .replace('\t', '\\t').replace('\n', '\\n')
+            for value in row
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _content(rng: random.Random, mean_chars: int) -> str:
+    # Log-normal sizes give a long tail of large scanned packets, as in production
+    length = max(200, int(rng.lognormvariate(0, 0.8) * mean_chars))
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+
+def seed_corpus(rows: int, feeds: int, mean_chars: int, reset: bool, batch_size: int = 5000):
+    conn = _connect()
+    cursor = conn.cursor()
+
+    if reset:
+        cursor.execute("DELETE FROM pdf_content WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+        cursor.execute("DELETE FROM all_links WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+        cursor.execute("DELETE FROM feeds WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+        cursor.execute(
+            "DELETE FROM feed_daily_stats WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+        conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM pdf_content WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    existing = cursor.fetchone()[0]
+    cursor.execute("""
+        CREATE TEMPORARY TABLE bench_stage (
+            feed_title TEXT, source_link TEXT, pdf_url TEXT, content TEXT, excerpt TEXT,
+            word_count INTEGER, title TEXT, page_title TEXT, author TEXT, creation_date TEXT,
+            modification_date TEXT, number_of_pages INTEGER, file_size_bytes INTEGER,
+            date_processed TIMESTAMP
+        )
+    """)
+    if existing >= rows:
+        print(f"Reusing {existing} seeded rows", file=sys.stderr)
+        cursor.close()
+        conn.close()
+        return
+
+    rng = random.Random(existing)
+    now = datetime.now()
+    start = time.perf_counter()
+    for offset in range(existing, rows, batch_size):
+        count = min(batch_size, rows - offset)
+        links, contents = [], []
+        for i in range(offset, offset + count):
+            feed_title = f"{FEED_PREFIX}{i % feeds:03d}"
+            source_url = f"https://bench.invalid/{i % feeds}/AgendaCenter"
+            pdf_url = f"https://bench.invalid/{i % feeds}/AgendaCenter/ViewFile/Agenda/_{i}.pdf"
+            processed = now - timedelta(minutes=rows - i)
+            content = _content(rng, mean_chars)
+            links.append((feed_title, pdf_url, source_url, 't', 'application/pdf'))
+            contents.append((
+                feed_title, source_url, pdf_url, content, make_excerpt(content),
+                count_words(content), f"Agenda {i}",
+                f"{feed_title}_{processed:%Y-%m-%d}", 'Clerk', '', '',
+                rng.randint(1, 40), len(content) * 3, processed.isoformat(sep=' ')
+            ))
+        _copy_rows(cursor, 'all_links',
+                   ('feed_title', 'link', 'source_url', 'is_pdf', 'content_type'), links)
+        _copy_rows(cursor, 'bench_stage', (
+            'feed_title', 'source_link', 'pdf_url', 'content', 'excerpt', 'word_count', 'title',
+            'page_title', 'author', 'creation_date', 'modification_date', 'number_of_pages',
+            'file_size_bytes', 'date_processed'
+        ), contents)
+        # Split each staged row into pdf_content metadata and its pdf_body
+        cursor.execute("""
+            WITH inserted AS (
+                INSERT INTO pdf_content (
+                    feed_title, source_link, pdf_url, excerpt, word_count, title, page_title,
+                    author, creation_date, modification_date, number_of_pages, file_size_bytes,
+                    date_processed
+                )
+                SELECT feed_title, source_link, pdf_url, excerpt, word_count, title, page_title,
+                       author, creation_date, modification_date, number_of_pages, file_size_bytes,
+                       date_processed
+                FROM bench_stage
+                RETURNING id, feed_title, pdf_url
+            )
+            INSERT INTO pdf_body (id, content)
+            SELECT i.id, s.content
+            FROM inserted i
+            JOIN bench_stage s ON s.feed_title = i.feed_title AND s.pdf_url = i.pdf_url
+        """)
+        cursor.execute("TRUNCATE bench_stage")
+        conn.commit()
+        print(f"Seeded {offset + count}/{rows} rows", file=sys.stderr)
+
+    # Register the synthetic feeds in the catalog served by /api/feeds
+    cursor.execute("""
+        INSERT INTO feeds (feed_title, source_url, link_count, pdf_count, last_new_item_at)
+        SELECT feed_title, MIN(source_link), COUNT(*), COUNT(*), MAX(date_processed)
+        FROM pdf_content
+        WHERE feed_title LIKE %s
+        GROUP BY feed_title
+        ON CONFLICT (feed_title) DO UPDATE SET
+            link_count = EXCLUDED.link_count,
+            pdf_count = EXCLUDED.pdf_count,
+            last_new_item_at = EXCLUDED.last_new_item_at
+    """, (FEED_PREFIX + '%',))
+    # Rows are copied in directly, so rebuild the activity rollups served by /api/stats
+    cursor.execute("DELETE FROM feed_daily_stats WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    cursor.execute("""
+        INSERT INTO feed_daily_stats (feed_title, day, documents, pages, bytes, new_links, new_pdf_links)
+        SELECT feed_title, date_processed::date, COUNT(*), SUM(number_of_pages),
+               SUM(file_size_bytes), COUNT(*), COUNT(*)
+        FROM pdf_content
+        WHERE feed_title LIKE %s
+        GROUP BY feed_title, date_processed::date
+    """, (FEED_PREFIX + '%',))
+    cursor.execute("ANALYZE all_links")
+    cursor.execute("ANALYZE pdf_content")
+    cursor.execute("ANALYZE pdf_body")
+    conn.commit()
+    cursor.close()
+    conn.close()
+    print(f"Seeding took {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def _sample_ids(count: int):
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id FROM pdf_content WHERE feed_title LIKE %s
+        ORDER BY date_processed DESC LIMIT %s
+    """, (FEED_PREFIX + '%', count))
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return ids
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workdir: str, workers: int, threads: int):
+    port = _free_port()
+    process = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        '-c', os.path.join(REPO_ROOT, 'gunicorn_config.py'),
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--chdir', workdir,
+        '--pythonpath', REPO_ROOT,
+        '--log-level', 'warning',
+        'server:app',
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + '/', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not become ready within 60 seconds')
+
+
+def _worker_pids(master_pid: int):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == master_pid:
+                pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class MemorySampler(threading.Thread):
+    """Samples gunicorn worker RSS in the background and keeps the per-worker peak."""
+
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak_worker_mb = 0.0
+        self.peak_total_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            sizes = [_rss_mb(pid) for pid in _worker_pids(self.master_pid)]
+            if sizes:
+                self.peak_worker_mb = max(self.peak_worker_mb, max(sizes))
+                self.peak_total_mb = max(self.peak_total_mb, sum(sizes))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def drive(base_url: str, paths, concurrency: int, duration: float, max_requests: int):
+    """Issues requests from `concurrency` threads until the duration or request cap is hit."""
+    latencies, sizes, errors = [], [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    issued = [0]
+
+    def run():
+        session = requests.Session()
+        rng = random.Random(threading.get_ident())
+        while time.perf_counter() < deadline:
+            with lock:
+                if issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=300)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if response.status_code >= 400:
+                        errors[0] += 1
+                    latencies.append(elapsed)
+                    sizes.append(len(response.content))
+            except requests.RequestException:
+                with lock:
+                    errors[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'mean_response_bytes': int(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def scenario_paths(name: str, ids, feeds: int, rss_files):
+    if name == 'article':
+        return [f'/api/article?id={article_id}' for article_id in ids]
+    if name == 'article_full':
+        return [f'/api/article?id={article_id}&include_content=true' for article_id in ids]
+    if name == 'articles_feed':
+        return [f'/api/articles/feed?feed_title={FEED_PREFIX}{i:03d}' for i in range(feeds)]
+    if name == 'articles_date_range':
+        today = datetime.now().date()
+        return [f'/api/articles/date_range?start={today - timedelta(days=1)}&end={today}']
+    if name == 'articles_all':
+        return ['/api/articles/all']
+    if name == 'feeds':
+        return ['/api/feeds']
+    if name == 'stats':
+        return ['/api/stats', '/api/stats?period=week'] + [
+            f'/api/stats?feed_title={FEED_PREFIX}{i:03d}' for i in range(feeds)]
+    if name == 'rss_list':
+        return ['/rss']
+    if name == 'rss_file':
+        return [f'/rss/{filename}' for filename in rss_files]
+    raise ValueError(f"Unknown scenario '{name}'")
+
+
+def _write_rss_files(workdir: str, count: int, entries: int):
+    import feedgen.feed
+
+    rss_directory = os.path.join(workdir, 'rss')
+    os.makedirs(rss_directory, exist_ok=True)
+    filenames = []
+    for i in range(count):
+        feed_gen = feedgen.feed.FeedGenerator()
+        feed_gen.title(f"{FEED_PREFIX}{i:03d}")
+        feed_gen.description('Synthetic benchmark feed')
+        feed_gen.link(href=f"https://bench.invalid/{i}/AgendaCenter")
+        for j in range(entries):
+            fe = feed_gen.add_entry()
+            fe.title(f"_{j}.pdf")
+            fe.link(href=f"https://bench.invalid/{i}/AgendaCenter/ViewFile/Agenda/_{j}.pdf")
+        filename = f"bench_{i:03d}.xml"
+        feed_gen.rss_file(os.path.join(rss_directory, filename))
+        filenames.append(filename)
+    return filenames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000, help='pdf_content rows to seed')
+    parser.add_argument('--feeds', type=int, default=20, help='Number of synthetic feeds')
+    parser.add_argument('--mean-chars', type=int, default=8_000,
+                        help='Median content size in characters')
+    parser.add_argument('--reset', action='store_true', help='Regenerate the seeded corpus')
+    parser.add_argument('--scenarios', default='article,articles_feed,feeds,rss_list,rss_file',
+                        help=f"Comma-separated scenarios from {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds per scenario')
+    parser.add_argument('--max-requests', type=int, default=100_000,
+                        help='Request cap per scenario, useful for /api/articles/all')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=2, help='gunicorn threads per worker')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario '{name}'")
+
+    report = {'options': vars(args), 'results': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        _ensure_schema(workdir)
+        seed_corpus(args.rows, args.feeds, args.mean_chars, args.reset)
+        ids = _sample_ids(1000)
+        rss_files = _write_rss_files(workdir, min(args.feeds, 20), entries=200)
+
+        process, base_url = start_gunicorn(workdir, args.workers, args.threads)
+        try:
+            for name in scenarios:
+                paths = scenario_paths(name, ids, args.feeds, rss_files)
+                # Warm up connections and per-worker state before measuring
+                drive(base_url, paths, args.concurrency, duration=2.0,
+                      max_requests=args.concurrency * 2)
+                sampler = MemorySampler(process.pid)
+                sampler.start()
+                result = drive(base_url, paths, args.concurrency, args.duration, args.max_requests)
+                sampler.stop()
+                result['peak_worker_rss_mb'] = round(sampler.peak_worker_mb, 1)
+                result['peak_total_rss_mb'] = round(sampler.peak_total_mb, 1)
+                report['results'][name] = result
+                print(
+                    f"{name:<20} {result['throughput_rps']:>9.1f} req/s  "
+                    f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  "
+                    f"p99 {result['p99_ms']:>8.1f}ms  worker RSS {result['peak_worker_rss_mb']:>7.1f} MB  "
+                    f"errors {result['errors']}",
+                    file=sys.stderr
+                )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Change cursor benchmark.
+
+Runs several writer threads that insert links and articles and update articles the way
+the crawler does, while a sync client follows /api/changes from a cursor. Once writers
+stop, it checks that the client saw the final state of every row it mirrored, so no
+change was skipped even though writers commit concurrently and out of order. It also
+reports writer throughput, which no longer includes waiting for other writers, and the
+cost of an incremental sync compared with re-pulling the whole corpus through
+/api/articles/all.
+
+Rows are written under feed titles prefixed 'bench-changes-' and removed afterwards.
+
+Usage:
+    python -m benchmarks.change_sync --writers 4 --seconds 10
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.api_load import _connect, _ensure_schema
+
+FEED_PREFIX = 'bench-changes-'
+
+
+def _writer(feed_title: str, stop: threading.Event, counts: dict, lock: threading.Lock, seed: int):
+    rng = random.Random(seed)
+    conn = _connect()
+    cursor = conn.cursor()
+    ids = []
+    writes = 0
+    while not stop.is_set():
+        if ids and rng.random() < 0.3:
+            cursor.execute(
+                "UPDATE pdf_content SET title = %s WHERE id = %s",
+                (f"Amended {uuid.uuid4().hex[:6]}", rng.choice(ids)))
+        else:
+            pdf_url = f"https://bench.invalid/changes/{uuid.uuid4().hex}.pdf"
+            cursor.execute("""
+                INSERT INTO all_links (feed_title, link, source_url, is_pdf, content_type)
+                VALUES (%s, %s, %s, TRUE, 'application/pdf')
+            """, (feed_title, pdf_url, 'https://bench.invalid/changes'))
+            cursor.execute("""
+                INSERT INTO pdf_content (feed_title, source_link, pdf_url, title)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (feed_title, 'https://bench.invalid/changes', pdf_url, 'Agenda'))
+            ids.append(cursor.fetchone()[0])
+        # Commit at random moments so transactions overlap and finish out of order
+        time.sleep(rng.random() * 0.005)
+        conn.commit()
+        writes += 1
+    cursor.close()
+    conn.close()
+    with lock:
+        counts['writes'] += writes
+
+
+def _follow(client, since: int, feed_title: str, mirror: dict, limit: int) -> tuple:
+    """Pulls every page after `since` into `mirror`. Returns the new cursor and request count."""
+    requests_made = 0
+    while True:
+        response = client.get(f'/api/changes?since={since}&limit={limit}').get_json()
+        requests_made += 1
+        for change in response['changes']:
+            if change['type'] == 'article' and change['feed_title'] == feed_title:
+                mirror[change['id']] = change['title']
+        since = response['next_cursor']
+        if not response['has_more']:
+            return since, requests_made
+
+
+def run(writers: int, seconds: float, limit: int) -> dict:
+    import server
+
+    client = server.app.test_client()
+    feed_title = f"{FEED_PREFIX}{uuid.uuid4().hex[:8]}"
+    since, _ = _follow(client, 0, feed_title, {}, 5000)
+
+    stop = threading.Event()
+    counts = {'writes': 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=_writer, args=(feed_title, stop, counts, lock, i))
+               for i in range(writers)]
+    mirror = {}
+    polls = 0
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while time.perf_counter() - start < seconds:
+        since, made = _follow(client, since, feed_title, mirror, limit)
+        polls += made
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    # One last incremental sync after the writers finish, timed as a typical delta pull
+    delta_start = time.perf_counter()
+    since, made = _follow(client, since, feed_title, mirror, limit)
+    delta_seconds = time.perf_counter() - delta_start
+
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, title FROM pdf_content WHERE feed_title = %s", (feed_title,))
+    expected = dict(cursor.fetchall())
+    cursor.close()
+    conn.close()
+
+    full_start = time.perf_counter()
+    client.get('/api/articles/all')
+    full_seconds = time.perf_counter() - full_start
+
+    return {
+        'writes': counts['writes'],
+        'writes_per_second': round(counts['writes'] / wall, 1),
+        'sync_requests': polls + made,
+        'articles': len(expected),
+        'mirror_matches': mirror == expected,
+        'final_delta_ms': round(delta_seconds * 1000, 2),
+        'full_pull_ms': round(full_seconds * 1000, 2),
+    }
+
+
+def _cleanup():
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM pdf_content WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    cursor.execute("DELETE FROM all_links WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads')
+    parser.add_argument('--seconds', type=float, default=10.0, help='How long writers run')
+    parser.add_argument('--limit', type=int, default=500, help='Page size of the sync client')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {'options': vars(args)}
+    with tempfile.TemporaryDirectory() as workdir:
+        _ensure_schema(workdir)
+        try:
+            report['results'] = run(args.writers, args.seconds, args.limit)
+        finally:
+            _cleanup()
+
+    results = report['results']
+    print(f"{results['writes_per_second']} writes/s  mirror_matches={results['mirror_matches']}  "
+          f"delta {results['final_delta_ms']}ms vs full pull {results['full_pull_ms']}ms",
+          file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
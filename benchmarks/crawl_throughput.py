@@ -0,0 +1,204 @@
+"""
+Offline crawl throughput benchmark.
+
+Serves synthetic AgendaCenter pages and PDFs from a loopback HTTP server, points
+WebRSSCrawler at them through a generated config, replaces the LLM cleanup chain with
+a deterministic fake and reports throughput, per-stage wall time, LLM calls and peak RSS
+for each corpus size.
+
+Requires a scratch PostgreSQL database configured through the usual POSTGRES_*
+environment variables (set POSTGRES_SSLMODE=disable for a local server). Rows written
+by the benchmark are removed when each corpus size finishes.
+
+Usage:
+    python -m benchmarks.crawl_throughput --sizes 10,50,200 --llm-latency 0.05
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.synthetic import FakeCleanupChain, SyntheticAgendaSite
+
+
+def _cleanup(crawler, feed_title: str):
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE FROM crawl_runs WHERE id IN (
+            SELECT run_id FROM crawl_feed_runs WHERE feed_title = %s
+        )
+    """, (feed_title,))
+    cursor.execute("DELETE FROM pdf_content WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM pdf_jobs WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM all_links WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM feeds WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM feed_daily_stats WHERE feed_title = %s", (feed_title,))
+    # Limits learned for the loopback site's ephemeral port are of no use afterwards
+    cursor.execute("DELETE FROM host_limits WHERE host LIKE '127.0.0.1:%%'")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def _stage_seconds(crawler, feed_title: str) -> dict:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT stage_seconds, pdfs_processed, llm_tokens, pdfs_deferred "
+        "FROM crawl_feed_runs WHERE feed_title = %s",
+        (feed_title,)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    if not row:
+        return {}
+    return {'stage_seconds': row[0], 'pdfs_processed': row[1],
+            'llm_tokens': row[2], 'pdfs_deferred': row[3]}
+
+
+def _run_corpus(index_url: str, options: dict, results):
+    """Crawls the synthetic site once. Runs in a fresh process so peak RSS is per corpus."""
+    from app.scraper import WebRSSCrawler
+
+    feed_title = f"bench-crawl-{uuid.uuid4().hex[:8]}"
+    with tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, 'crawler_config.json')
+        with open(config_path, 'w') as f:
+            json.dump([{
+                'source_url': index_url,
+                'feed_title': feed_title,
+                'feed_description': 'Synthetic benchmark feed',
+                'link_selector': 'a',
+                'pdf_only': True,
+                'output_filename': 'bench.xml',
+                'link_dedup': options['link_dedup'],
+            }], f)
+
+        crawler = WebRSSCrawler(
+            config_file=config_path,
+            log_level=options.get('log_level', logging.WARNING),
+            log_file=os.path.join(workdir, 'crawler.log'),
+            rss_directory=os.path.join(workdir, 'rss'),
+            state_directory=os.path.join(workdir, 'state'),
+            archive_directory=os.path.join(workdir, 'archive'),
+            link_log_sample_rate=options.get('link_log_sample_rate', 0.01),
+            llm_pack_max_tokens=options.get('llm_pack_max_tokens', 2500),
+            llm_token_budget=options.get('llm_token_budget', 0),
+        )
+        fake_llm = FakeCleanupChain(
+            latency=options['llm_latency'],
+            seconds_per_char=options['llm_seconds_per_char']
+        )
+        crawler.cleanup_chain = fake_llm
+        crawler.packed_cleanup_chain = fake_llm
+
+        try:
+            start = time.perf_counter()
+            crawler.generate_rss_feeds()
+            wall = time.perf_counter() - start
+            ledger = _stage_seconds(crawler, feed_title)
+        finally:
+            _cleanup(crawler, feed_title)
+
+    results.put({
+        'wall_seconds': round(wall, 3),
+        'pdfs_processed': ledger.get('pdfs_processed', 0),
+        'stage_seconds': ledger.get('stage_seconds', {}),
+        'llm_calls': fake_llm.calls,
+        'llm_tokens': ledger.get('llm_tokens', 0),
+        'pdfs_deferred': ledger.get('pdfs_deferred', 0),
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def run_benchmark(sizes, options: dict, target=_run_corpus) -> list:
+    context = multiprocessing.get_context('spawn')
+    report = []
+    for size in sizes:
+        site = SyntheticAgendaSite(
+            documents=size,
+            pages_per_document=options['pages'],
+            scanned_ratio=options['scanned_ratio'],
+            latency=options['server_latency'],
+        ).start()
+        try:
+            results = context.Queue()
+            process = context.Process(target=target, args=(site.index_url, options, results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Benchmark process for size {size} exited with {process.exitcode}")
+            result = results.get()
+        finally:
+            site.stop()
+
+        wall = result['wall_seconds']
+        result.update({
+            'documents': size,
+            'corpus_mb': round(site.pdf_bytes / 1_048_576, 2),
+            'docs_per_second': round(result['pdfs_processed'] / wall, 2) if wall else None,
+        })
+        report.append(result)
+        print(
+            f"{size:>6} docs  {wall:>8.2f}s  {result['docs_per_second'] or 0:>7.2f} docs/s  "
+            f"{result['llm_calls']:>5} LLM calls  peak RSS {result['peak_rss_mb']:>7.1f} MB  stages "
+            + ', '.join(f"{stage}={seconds:.2f}s"
+                        for stage, seconds in sorted(result['stage_seconds'].items())),
+            file=sys.stderr
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,50,200',
+                        help='Comma-separated corpus sizes (number of PDFs)')
+    parser.add_argument('--pages', type=int, default=2, help='Pages per generated PDF')
+    parser.add_argument('--scanned-ratio', type=float, default=0.2,
+                        help='Fraction of PDFs generated without a text layer')
+    parser.add_argument('--llm-latency', type=float, default=0.05,
+                        help='Fixed latency of the fake LLM per call, in seconds')
+    parser.add_argument('--llm-seconds-per-char', type=float, default=0.0,
+                        help='Additional fake LLM latency per input character')
+    parser.add_argument('--llm-pack-max-tokens', type=int, default=2500,
+                        help='Token budget of packed cleanup requests; 0 sends one text per call')
+    parser.add_argument('--llm-token-budget', type=int, default=0,
+                        help='LLM token budget of the crawl; 0 is unlimited')
+    parser.add_argument('--server-latency', type=float, default=0.0,
+                        help='Latency added by the synthetic site to every response')
+    parser.add_argument('--link-dedup', default='memory', help='Link dedup mode to benchmark')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    options = {
+        'pages': args.pages,
+        'scanned_ratio': args.scanned_ratio,
+        'llm_latency': args.llm_latency,
+        'llm_seconds_per_char': args.llm_seconds_per_char,
+        'llm_pack_max_tokens': args.llm_pack_max_tokens,
+        'llm_token_budget': args.llm_token_budget,
+        'server_latency': args.server_latency,
+        'link_dedup': args.link_dedup,
+    }
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    report = run_benchmark(sizes, options)
+
+    output = json.dumps({'options': options, 'results': report}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Response encoding benchmark.
+
+Compares bytes on the wire and CPU time per request for the article payload encodings
+the API can negotiate: JSON and msgpack, each uncompressed, gzip and brotli. Payloads
+are synthetic by default; pass --from-db to sample real rows from pdf_content.
+
+Usage:
+    python -m benchmarks.encoding --articles 50 --iterations 20
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.encoding import BROTLI_QUALITY, GZIP_LEVEL, brotli, msgpack, pack_msgpack
+from benchmarks.synthetic import WORDS
+
+
+def synthetic_articles(count: int, mean_chars: int, seed: int = 0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    articles = []
+    for i in range(count):
+        length = max(200, int(rng.lognormvariate(0, 0.8) * mean_chars))
+        paragraphs, size = [], 0
+        while size < length:
+            paragraph = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+            paragraphs.append(f"<p>{paragraph}</p>")
+            size += len(paragraph) + 7
+        articles.append({
+            'id': i,
+            'feed_title': f"Feed {i % 10}",
+            'source_link': f"https://example.invalid/{i % 10}/AgendaCenter",
+            'pdf_url': f"https://example.invalid/{i % 10}/AgendaCenter/ViewFile/Agenda/_{i}.pdf",
+            'content': '\n'.join(paragraphs),
+            'title': f"Agenda {i}",
+            'page_title': f"Feed_{i % 10}_{now:%Y-%m-%d}",
+            'author': 'Clerk',
+            'creation_date': '',
+            'modification_date': '',
+            'number_of_pages': rng.randint(1, 40),
+            'file_size_bytes': size * 3,
+            'date_processed': now - timedelta(hours=i),
+        })
+    return articles
+
+
+def db_articles(count: int):
+    import psycopg2.extras
+    from benchmarks.api_load import _connect
+
+    conn = _connect()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.execute("""
+        SELECT p.*, b.content
+        FROM pdf_content p
+        LEFT JOIN pdf_body b ON b.id = p.id
+        ORDER BY p.date_processed DESC
+        LIMIT %s
+    """, (count,))
+    articles = [dict(row) for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return articles
+
+
+def _json_encode(payload) -> bytes:
+    # Mirrors Flask's default provider closely enough for size and CPU comparisons
+    return json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def encoders():
+    encoders = {
+        'json': lambda payload: _json_encode(payload),
+        'json+gzip': lambda payload: gzip.compress(_json_encode(payload), GZIP_LEVEL, mtime=0),
+    }
+    if brotli is not None:
+        encoders['json+br'] = lambda payload: brotli.compress(
+            _json_encode(payload), quality=BROTLI_QUALITY)
+    if msgpack is not None:
+        encoders['msgpack'] = pack_msgpack
+        encoders['msgpack+gzip'] = lambda payload: gzip.compress(
+            pack_msgpack(payload), GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            encoders['msgpack+br'] = lambda payload: brotli.compress(
+                pack_msgpack(payload), quality=BROTLI_QUALITY)
+    return encoders
+
+
+def decoders():
+    decoders = {
+        'json': lambda body: json.loads(body),
+        'json+gzip': lambda body: json.loads(gzip.decompress(body)),
+    }
+    if brotli is not None:
+        decoders['json+br'] = lambda body: json.loads(brotli.decompress(body))
+    if msgpack is not None:
+        decoders['msgpack'] = lambda body: msgpack.unpackb(body)
+        decoders['msgpack+gzip'] = lambda body: msgpack.unpackb(gzip.decompress(body))
+        if brotli is not None:
+            decoders['msgpack+br'] = lambda body: msgpack.unpackb(brotli.decompress(body))
+    return decoders
+
+
+def measure(payload, iterations: int):
+    results = {}
+    decode = decoders()
+    for name, encode in encoders().items():
+        start = time.process_time()
+        for _ in range(iterations):
+            body = encode(payload)
+        encode_ms = (time.process_time() - start) / iterations * 1000
+
+        start = time.process_time()
+        for _ in range(iterations):
+            decode[name](body)
+        decode_ms = (time.process_time() - start) / iterations * 1000
+
+        results[name] = {
+            'bytes': len(body),
+            'server_cpu_ms': round(encode_ms, 3),
+            'client_cpu_ms': round(decode_ms, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=50,
+                        help='Articles per response, as returned by the list endpoints')
+    parser.add_argument('--mean-chars', type=int, default=8_000,
+                        help='Median content size of synthetic articles')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--from-db', action='store_true',
+                        help='Sample the newest pdf_content rows instead of synthetic data')
+    args = parser.parse_args()
+
+    if args.from_db:
+        articles = db_articles(args.articles)
+    else:
+        articles = synthetic_articles(args.articles, args.mean_chars)
+
+    report = {
+        'single_article': measure(articles[0], args.iterations),
+        'article_list': measure({'articles': articles}, args.iterations),
+    }
+    for scenario, results in report.items():
+        baseline = results['json']['bytes']
+        print(f"\n{scenario}", file=sys.stderr)
+        for name, result in results.items():
+            print(
+                f"  {name:<14} {result['bytes']:>11,d} bytes ({result['bytes'] / baseline:6.1%})  "
+                f"server {result['server_cpu_ms']:>8.2f} ms  client {result['client_cpu_ms']:>8.2f} ms",
+                file=sys.stderr
+            )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
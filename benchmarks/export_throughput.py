@@ -0,0 +1,155 @@
+"""
+Bulk export throughput benchmark.
+
+Seeds the same synthetic corpus as benchmarks.api_load and compares, for the whole
+corpus:
+
+- raw COPY ... TO STDOUT read by psycopg2 and discarded, the upper bound
+- /api/export as CSV and NDJSON, with and without gzip, through gunicorn
+- /api/articles/all, the JSON endpoint exports used before
+
+It reports rows/sec, MB/sec of response body and peak gunicorn worker RSS for each.
+
+Usage:
+    python -m benchmarks.export_throughput --rows 100000 --include-content
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import zlib
+
+import requests
+
+from benchmarks.api_load import (
+    MemorySampler, _connect, _ensure_schema, seed_corpus, start_gunicorn
+)
+
+
+class _Discard:
+    def __init__(self):
+        self.bytes = 0
+        self.rows = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.rows += data.count(b'\n')
+
+
+def bench_raw_copy(fmt: str, include_content: bool) -> dict:
+    from app.export import begin_export, export_sql
+
+    conn = _connect()
+    try:
+        start = time.perf_counter()
+        watermark = begin_export(conn)
+        cursor = conn.cursor()
+        sink = _Discard()
+        cursor.copy_expert(export_sql(cursor, fmt, watermark, include_content=include_content), sink)
+        conn.commit()
+        wall = time.perf_counter() - start
+    finally:
+        conn.close()
+    rows = sink.rows - (1 if fmt == 'csv' else 0)
+    return _result(rows, sink.bytes, wall)
+
+
+def bench_http(base_url: str, path: str, gzip: bool, master_pid: int) -> dict:
+    headers = {'Accept-Encoding': 'gzip' if gzip else 'identity'}
+    sampler = MemorySampler(master_pid, interval=0.2)
+    sampler.start()
+    start = time.perf_counter()
+    response = requests.get(base_url + path, headers=headers, stream=True, timeout=3600)
+    response.raise_for_status()
+    sink = _Discard()
+    body = bytearray() if path.startswith('/api/articles') else None
+    decoder = zlib.decompressobj(31) if response.headers.get('Content-Encoding') == 'gzip' else None
+    wire_bytes = 0
+    for chunk in response.raw.stream(1 << 16, decode_content=False):
+        wire_bytes += len(chunk)
+        if decoder is not None:
+            chunk = decoder.decompress(chunk)
+        sink.write(chunk)
+        if body is not None:
+            body += chunk
+    wall = time.perf_counter() - start
+    sampler.stop()
+
+    if body is not None:
+        rows = len(json.loads(body)['articles'])
+    else:
+        rows = sink.rows - (1 if 'format=csv' in path else 0)
+    result = _result(rows, sink.bytes, wall)
+    result.update({
+        'wire_mb': round(wire_bytes / 1_048_576, 2),
+        'peak_worker_rss_mb': round(sampler.peak_worker_mb, 1),
+        'watermark': response.headers.get('X-Export-Watermark'),
+    })
+    return result
+
+
+def _result(rows: int, size: int, wall: float) -> dict:
+    return {
+        'rows': rows,
+        'seconds': round(wall, 3),
+        'rows_per_second': round(rows / wall, 1) if wall else None,
+        'mb_per_second': round(size / 1_048_576 / wall, 2) if wall else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000, help='pdf_content rows to seed')
+    parser.add_argument('--feeds', type=int, default=20, help='Number of synthetic feeds')
+    parser.add_argument('--mean-chars', type=int, default=8_000,
+                        help='Median content size in characters')
+    parser.add_argument('--reset', action='store_true', help='Regenerate the seeded corpus')
+    parser.add_argument('--include-content', action='store_true',
+                        help='Export full document bodies, not just excerpts')
+    parser.add_argument('--skip-articles-all', action='store_true',
+                        help='Skip /api/articles/all, which is slow on large corpora')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    content = '&include_content=true' if args.include_content else ''
+    report = {'options': vars(args), 'results': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        _ensure_schema(workdir)
+        seed_corpus(args.rows, args.feeds, args.mean_chars, args.reset)
+        for fmt in ('csv', 'ndjson'):
+            report['results'][f'raw_copy_{fmt}'] = bench_raw_copy(fmt, args.include_content)
+
+        process, base_url = start_gunicorn(workdir, args.workers, threads=2)
+        try:
+            scenarios = [
+                (f'export_{fmt}{"_gzip" if gzip else ""}', f'/api/export?format={fmt}{content}', gzip)
+                for fmt in ('csv', 'ndjson') for gzip in (False, True)
+            ]
+            if not args.skip_articles_all:
+                scenarios.append((
+                    'articles_all', '/api/articles/all' + content.replace('&', '?'), False))
+            for name, path, gzip in scenarios:
+                report['results'][name] = bench_http(base_url, path, gzip, process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    for name, result in report['results'].items():
+        print(f"{name:<20} {result['seconds']:>8.2f}s  {result['rows_per_second'] or 0:>10.0f} rows/s  "
+              f"{result['mb_per_second'] or 0:>8.2f} MB/s  "
+              + (f"worker RSS {result['peak_worker_rss_mb']:>7.1f} MB"
+                 if 'peak_worker_rss_mb' in result else ''),
+              file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Logging overhead benchmark.
+
+Runs the same work under several logging configurations and reports the cost of each:
+
+- emit: threads logging per-link debug events as fast as they can, measured as the
+  time each call takes in the logging thread
+- crawl: the synthetic crawl from benchmarks.crawl_throughput
+- api: the API under gunicorn, driving endpoints that log on every request
+
+Modes are set through the LOG_LEVEL, LOG_FORMAT, LOG_ASYNC and LOG_LINK_SAMPLE_RATE
+variables, as in production. 'sync-debug' writes from the logging thread at DEBUG
+without sampling, which is how the crawler logged before the queue was added.
+Console output is discarded in every mode.
+
+Requires a scratch PostgreSQL database for the crawl and API parts, configured as for
+the other benchmarks.
+
+Usage:
+    python -m benchmarks.logging_overhead --parts emit,crawl,api --documents 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+MODES = {
+    'off': {'LOG_LEVEL': 'CRITICAL'},
+    'sync-debug': {'LOG_LEVEL': 'DEBUG', 'LOG_ASYNC': '0', 'LOG_LINK_SAMPLE_RATE': '1'},
+    'queue-debug': {'LOG_LEVEL': 'DEBUG', 'LOG_LINK_SAMPLE_RATE': '1'},
+    'queue-debug-sampled': {'LOG_LEVEL': 'DEBUG', 'LOG_LINK_SAMPLE_RATE': '0.01'},
+    'queue-json-sampled': {'LOG_LEVEL': 'DEBUG', 'LOG_FORMAT': 'json',
+                           'LOG_LINK_SAMPLE_RATE': '0.01'},
+    'queue-info': {'LOG_LEVEL': 'INFO'},
+}
+_MODE_VARIABLES = ('LOG_LEVEL', 'LOG_FORMAT', 'LOG_ASYNC', 'LOG_LINK_SAMPLE_RATE')
+
+
+def _apply_mode(name: str):
+    for variable in _MODE_VARIABLES:
+        os.environ.pop(variable, None)
+    os.environ.update(MODES[name])
+
+
+def _silence_console():
+    # StreamHandler binds sys.stderr when created, so this must run before loggers are set up
+    sys.stderr = open(os.devnull, 'w')
+
+
+def bench_emit(workdir: str, threads: int, events: int) -> dict:
+    """Logs `events` per-link debug events from each of `threads` threads."""
+    from app import log
+
+    stderr = sys.stderr
+    _silence_console()
+    try:
+        logger = log.configure_logger(
+            'bench.logging', os.path.join(workdir, 'emit.log'), level=log.level_from_env())
+        link_logger = log.SampledLogger(logger, float(os.getenv('LOG_LINK_SAMPLE_RATE', '0.01')))
+        timings = []
+
+        def run(thread_index: int):
+            start = time.perf_counter()
+            for i in range(events):
+                url = f"https://bench.invalid/{thread_index}/AgendaCenter/ViewFile/_{i}.pdf"
+                link_logger.debug("Checking if URL is a PDF: %s", url)
+                link_logger.debug("URL: %s | Content-Type: %s", url, 'application/pdf')
+            timings.append(time.perf_counter() - start)
+
+        workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+        wall_start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - wall_start
+        # Stopping the listener drains the queue, so this includes the deferred writes
+        log.configure_logger('bench.logging', console=False, level=log.level_from_env())
+        drained = time.perf_counter() - wall_start
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+
+    calls = threads * events * 2
+    return {
+        'calls': calls,
+        'caller_us_per_call': round(max(timings) / (events * 2) * 1e6, 3),
+        'calls_per_second': round(calls / wall, 1),
+        'seconds_until_written': round(drained, 3),
+        # Includes the files rotated out along the way
+        'log_bytes': sum(os.path.getsize(os.path.join(workdir, name))
+                         for name in os.listdir(workdir) if name.startswith('emit.log')),
+    }
+
+
+def _run_corpus_quiet(index_url: str, options: dict, results):
+    from benchmarks.crawl_throughput import _run_corpus
+
+    _silence_console()
+    _run_corpus(index_url, options, results)
+
+
+def bench_crawl(documents: int, llm_latency: float) -> dict:
+    from benchmarks.crawl_throughput import run_benchmark
+
+    options = {
+        'pages': 2,
+        'scanned_ratio': 0.0,
+        'llm_latency': llm_latency,
+        'llm_seconds_per_char': 0.0,
+        'server_latency': 0.0,
+        'link_dedup': 'memory',
+        # Taken from the environment set for the mode
+        'log_level': None,
+        'link_log_sample_rate': float(os.getenv('LOG_LINK_SAMPLE_RATE', '0.01')),
+    }
+    result = run_benchmark([documents], options, target=_run_corpus_quiet)[0]
+    return {key: result[key] for key in ('wall_seconds', 'docs_per_second', 'pdfs_processed')}
+
+
+def bench_api(base_url: str, concurrency: int, duration: float) -> dict:
+    from benchmarks.api_load import drive
+
+    today = datetime.now().date()
+    # The index logs at INFO and the date range endpoint at DEBUG on every request
+    paths = ['/', f'/api/articles/date_range?start={today}&end={today + timedelta(days=1)}']
+    drive(base_url, paths, concurrency, duration=2.0, max_requests=concurrency * 2)
+    result = drive(base_url, paths, concurrency, duration, max_requests=1_000_000)
+    return {key: result[key] for key in ('requests', 'errors', 'throughput_rps', 'p50_ms', 'p99_ms')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES),
+                        help=f"Comma-separated modes from {', '.join(MODES)}")
+    parser.add_argument('--parts', default='emit,crawl,api', help='Comma-separated parts to run')
+    parser.add_argument('--threads', type=int, default=4, help='Logging threads for emit')
+    parser.add_argument('--events', type=int, default=20_000, help='Events per thread for emit')
+    parser.add_argument('--documents', type=int, default=50, help='PDFs in the crawl corpus')
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help='Fixed latency of the fake LLM per call, in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='API client threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per API run')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    modes = [name.strip() for name in args.modes.split(',') if name.strip()]
+    parts = [name.strip() for name in args.parts.split(',') if name.strip()]
+    for name in modes:
+        if name not in MODES:
+            parser.error(f"Unknown mode '{name}'")
+
+    saved_environment = {variable: os.environ.get(variable) for variable in _MODE_VARIABLES}
+    report = {'options': vars(args), 'results': {}}
+    try:
+        for name in modes:
+            _apply_mode(name)
+            result = report['results'][name] = {}
+            with tempfile.TemporaryDirectory() as workdir:
+                if 'emit' in parts:
+                    result['emit'] = bench_emit(workdir, args.threads, args.events)
+                if 'crawl' in parts:
+                    result['crawl'] = bench_crawl(args.documents, args.llm_latency)
+                if 'api' in parts:
+                    from benchmarks.api_load import _ensure_schema, start_gunicorn
+
+                    _ensure_schema(workdir)
+                    process, base_url = start_gunicorn(workdir, args.workers, threads=2)
+                    try:
+                        result['api'] = bench_api(base_url, args.concurrency, args.duration)
+                    finally:
+                        process.terminate()
+                        process.wait(timeout=30)
+
+            print(f"{name:<20} " + '  '.join(
+                f"{part}: " + ', '.join(f"{key}={value}" for key, value in values.items())
+                for part, values in result.items()
+            ), file=sys.stderr)
+    finally:
+        for variable, value in saved_environment.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
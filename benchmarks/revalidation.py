@@ -0,0 +1,150 @@
+"""
+Stored document revalidation benchmark.
+
+Crawls a synthetic AgendaCenter site once, republishes a fraction of its PDFs at the same
+URLs, then compares two ways of picking up the changes:
+
+- revalidate: WebRSSCrawler.revalidate_documents with conditional requests
+- rebuild: deleting the feed's documents and crawling it again, the previous fix
+
+For each it reports wall time, PDF bytes sent by the site and LLM cleanup calls, and it
+checks that exactly the republished documents got a new version. Pass --no-etags to serve
+PDFs without validators, which exercises the digest comparison.
+
+Requires a scratch PostgreSQL database configured as for the other benchmarks.
+
+Usage:
+    python -m benchmarks.revalidation --documents 100 --changed 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.crawl_throughput import _cleanup
+from benchmarks.synthetic import FakeCleanupChain, SyntheticAgendaSite
+
+
+def _make_crawler(workdir: str, index_url: str, feed_title: str, llm_latency: float):
+    from app.scraper import WebRSSCrawler
+
+    config_path = os.path.join(workdir, 'crawler_config.json')
+    with open(config_path, 'w') as f:
+        json.dump([{
+            'source_url': index_url,
+            'feed_title': feed_title,
+            'feed_description': 'Synthetic benchmark feed',
+            'link_selector': 'a',
+            'pdf_only': True,
+            'output_filename': 'bench.xml',
+        }], f)
+    crawler = WebRSSCrawler(
+        config_file=config_path,
+        log_level=logging.WARNING,
+        log_file=os.path.join(workdir, 'crawler.log'),
+        rss_directory=os.path.join(workdir, 'rss'),
+        state_directory=os.path.join(workdir, 'state'),
+        archive_directory=os.path.join(workdir, 'archive'),
+        # Revalidation is measured separately, not as part of the crawls
+        revalidate_after_seconds=0,
+    )
+    crawler.cleanup_chain = crawler.packed_cleanup_chain = FakeCleanupChain(latency=llm_latency)
+    return crawler
+
+
+def _measure(site: SyntheticAgendaSite, crawler, run) -> dict:
+    site.pdf_bytes_served = 0
+    calls_before = crawler.cleanup_chain.calls
+    start = time.perf_counter()
+    result = run()
+    wall = time.perf_counter() - start
+    return {
+        'seconds': round(wall, 3),
+        'pdf_mb_served': round(site.pdf_bytes_served / 1_048_576, 3),
+        'llm_calls': crawler.cleanup_chain.calls - calls_before,
+        **({'outcomes': result} if result else {}),
+    }
+
+
+def _versions(crawler, feed_title: str) -> dict:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.pdf_url, COUNT(v.id)
+        FROM pdf_content p
+        LEFT JOIN pdf_versions v ON v.pdf_id = p.id
+        WHERE p.feed_title = %s
+        GROUP BY p.pdf_url
+    """, (feed_title,))
+    versions = dict(cursor.fetchall())
+    cursor.close()
+    conn.close()
+    return versions
+
+
+def run(documents: int, changed: float, etags: bool, llm_latency: float) -> dict:
+    site = SyntheticAgendaSite(documents=documents, scanned_ratio=0.0, etags=etags).start()
+    feed_title = f"bench-revalidate-{uuid.uuid4().hex[:8]}"
+    report = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            crawler = _make_crawler(workdir, site.index_url, feed_title, llm_latency)
+            try:
+                report['initial_crawl'] = _measure(site, crawler, crawler.generate_rss_feeds)
+
+                pdf_paths = sorted(path for path in site.files if path.endswith('.pdf'))
+                republished = random.Random(1).sample(pdf_paths, int(len(pdf_paths) * changed))
+                for i, path in enumerate(republished):
+                    site.replace(path, seed=10_000 + i)
+
+                report['revalidate'] = _measure(site, crawler, lambda: crawler.revalidate_documents(
+                    feed_title=feed_title, older_than=0, limit=documents))
+                versioned = {url for url, count in _versions(crawler, feed_title).items() if count}
+                expected = {site.base_url + path for path in republished}
+                report['revalidate']['versions_match_republished'] = versioned == expected
+
+                def rebuild():
+                    _cleanup(crawler, feed_title)
+                    crawler.generate_rss_feeds()
+                report['rebuild'] = _measure(site, crawler, rebuild)
+            finally:
+                _cleanup(crawler, feed_title)
+    finally:
+        site.stop()
+    report['republished'] = len(republished)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100, help='PDFs on the synthetic site')
+    parser.add_argument('--changed', type=float, default=0.1,
+                        help='Fraction of PDFs republished before revalidating')
+    parser.add_argument('--no-etags', action='store_true', help='Serve PDFs without ETags')
+    parser.add_argument('--llm-latency', type=float, default=0.05,
+                        help='Fixed latency of the fake LLM per call, in seconds')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {'options': vars(args)}
+    report.update(run(args.documents, args.changed, not args.no_etags, args.llm_latency))
+    for name in ('revalidate', 'rebuild'):
+        result = report[name]
+        print(f"{name:<12} {result['seconds']:>8.2f}s  {result['pdf_mb_served']:>8.3f} MB served  "
+              f"{result['llm_calls']:>5} LLM calls", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Article stream benchmark.
+
+Starts the API under gunicorn, opens several /api/stream clients (spread over the
+workers) and commits synthetic articles from a separate connection the way the crawler
+does, with NOTIFY in the storing transaction. It reports the delay from commit to
+receipt at each client and checks that every client saw every article exactly once.
+
+It then disconnects one client, commits more articles and reconnects it with
+Last-Event-ID to check that resuming misses nothing. Finally it compares the database
+queries the streams needed with polling /api/articles/feed at --poll-interval for the
+same period.
+
+Articles are written under feed titles prefixed 'bench-stream-' and removed afterwards.
+
+Usage:
+    python -m benchmarks.stream_latency --clients 6 --articles 200 --rate 20
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+from benchmarks.api_load import _connect, _ensure_schema, _percentile, start_gunicorn
+
+FEED_PREFIX = 'bench-stream-'
+
+
+class StreamClient(threading.Thread):
+    """Reads an /api/stream response and records when each article arrived."""
+
+    def __init__(self, url: str, last_event_id: str = None):
+        super().__init__(daemon=True)
+        self.url = url
+        self.headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+        self.received = {}
+        self.duplicates = 0
+        self.last_event_id = last_event_id
+        self.ready = threading.Event()
+        self._response = None
+
+    def run(self):
+        self._response = requests.get(self.url, headers=self.headers, stream=True, timeout=60)
+        event_id, data = None, None
+        try:
+            # chunk_size=None hands over data as it arrives instead of waiting for full chunks
+            for line in self._response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line.startswith('id: '):
+                    event_id = line[4:]
+                elif line.startswith('data: '):
+                    data = line[6:]
+                elif line == '':
+                    if event_id is not None:
+                        self.last_event_id = event_id
+                        self.ready.set()
+                    if data is not None:
+                        article = json.loads(data)
+                        if article['id'] in self.received:
+                            self.duplicates += 1
+                        self.received[article['id']] = time.time()
+                    event_id, data = None, None
+        except (requests.RequestException, AttributeError):
+            # Closing the response from another thread ends iteration one way or another
+            pass
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+
+
+def _insert_articles(feed_title: str, count: int, rate: float) -> dict:
+    """Commits `count` articles at `rate` per second and returns their commit times by id."""
+    from app.stream import notify_new_article
+
+    conn = _connect()
+    cursor = conn.cursor()
+    committed = {}
+    interval = 1.0 / rate if rate else 0
+    for i in range(count):
+        pdf_url = f"https://bench.invalid/stream/{uuid.uuid4().hex}.pdf"
+        cursor.execute("""
+            INSERT INTO all_links (feed_title, link, source_url, is_pdf, content_type)
+            VALUES (%s, %s, %s, TRUE, 'application/pdf')
+        """, (feed_title, pdf_url, 'https://bench.invalid/stream'))
+        cursor.execute("""
+            INSERT INTO pdf_content (feed_title, source_link, pdf_url, title, number_of_pages)
+            VALUES (%s, %s, %s, %s, 1)
+            RETURNING id
+        """, (feed_title, 'https://bench.invalid/stream', pdf_url, f"Agenda {i}"))
+        pdf_id = cursor.fetchone()[0]
+        notify_new_article(cursor, pdf_id)
+        conn.commit()
+        committed[pdf_id] = time.time()
+        if interval:
+            time.sleep(interval)
+    cursor.close()
+    conn.close()
+    return committed
+
+
+def _cleanup():
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM pdf_content WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    cursor.execute("DELETE FROM all_links WHERE feed_title LIKE %s", (FEED_PREFIX + '%',))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def _wait_for(clients, ids, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(set(ids) <= set(client.received) for client in clients):
+            return
+        time.sleep(0.05)
+
+
+def run(base_url: str, clients: int, articles: int, rate: float, poll_interval: float) -> dict:
+    feed_title = f"{FEED_PREFIX}{uuid.uuid4().hex[:8]}"
+    url = f"{base_url}/api/stream?feed_title={feed_title}"
+    readers = [StreamClient(url) for _ in range(clients)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        if not reader.ready.wait(10):
+            raise RuntimeError('stream did not open')
+
+    start = time.time()
+    committed = _insert_articles(feed_title, articles, rate)
+    _wait_for(readers, committed)
+    duration = time.time() - start
+    delays = sorted(
+        (reader.received[pdf_id] - committed_at) * 1000
+        for reader in readers for pdf_id, committed_at in committed.items()
+        if pdf_id in reader.received
+    )
+    report = {
+        'articles': articles,
+        'clients': clients,
+        'complete': all(set(committed) <= set(reader.received) for reader in readers),
+        'duplicates': sum(reader.duplicates for reader in readers),
+        'p50_ms': round(_percentile(delays, 0.50), 2),
+        'p99_ms': round(_percentile(delays, 0.99), 2),
+        'max_ms': round(delays[-1], 2) if delays else None,
+    }
+
+    # Resume: drop one client, commit more, reconnect with its last event id
+    dropped = readers[0]
+    dropped.close()
+    dropped.join(5)
+    missed = _insert_articles(feed_title, max(1, articles // 10), 0)
+    resumed = StreamClient(url, last_event_id=dropped.last_event_id)
+    resumed.start()
+    _wait_for([resumed], missed)
+    report['resume_complete'] = set(missed) <= set(resumed.received)
+    report['resume_duplicates'] = len(set(resumed.received) & set(dropped.received))
+    resumed.close()
+    for reader in readers[1:]:
+        reader.close()
+
+    # Each stream opening costs one query; each poll costs one per client
+    report['stream_queries'] = clients + 1
+    report['equivalent_poll_queries'] = int(clients * duration / poll_interval)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=6, help='Concurrent stream clients')
+    parser.add_argument('--articles', type=int, default=200, help='Articles committed')
+    parser.add_argument('--rate', type=float, default=20.0, help='Articles committed per second')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='Polling interval the streams are compared with, in seconds')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {'options': vars(args)}
+    with tempfile.TemporaryDirectory() as workdir:
+        _ensure_schema(workdir)
+        process, base_url = start_gunicorn(workdir, args.workers, args.threads)
+        try:
+            report['results'] = run(
+                base_url, args.clients, args.articles, args.rate, args.poll_interval)
+        finally:
+            # Open streams would hold up a graceful shutdown for the full graceful timeout
+            process.kill()
+            process.wait(timeout=30)
+            _cleanup()
+
+    results = report['results']
+    print(f"{results['clients']} clients  p50 {results['p50_ms']:.1f}ms  p99 {results['p99_ms']:.1f}ms  "
+          f"complete={results['complete']}  resume_complete={results['resume_complete']}",
+          file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
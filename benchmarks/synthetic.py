@@ -0,0 +1,250 @@
+"""
+Synthetic stand-ins for municipal AgendaCenter sites, used by the offline benchmarks.
+
+Nothing here touches the network beyond the loopback interface.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+WORDS = (
+    "council meeting agenda minutes resolution ordinance approval budget public hearing "
+    "township committee motion seconded carried planning board zoning variance application "
+    "presentation discussion consent item report engineer attorney clerk mayor roll call "
+    "adjournment executive session payment bills capital improvement road repair library"
+).split()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _assemble_pdf(objects: List[bytes]) -> bytes:
+    """Serializes numbered PDF objects (1-based, object 1 is the catalog) with an xref table."""
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref_offset = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n'.encode()
+    out += b'0000000000 65535 f \n'
+    for offset in offsets:
+        out += f'{offset:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'.encode()
+    out += f'startxref\n{xref_offset}\n%%EOF\n'.encode()
+    return bytes(out)
+
+
+def _stream(dictionary: str, data: bytes) -> bytes:
+    return f'<< {dictionary} /Length {len(data)} >>\nstream\n'.encode() + data + b'\nendstream'
+
+
+def make_text_pdf(pages: int, words_per_page: int = 400, seed: int = 0) -> bytes:
+    """Generates a PDF with an extractable text layer."""
+    rng = random.Random(seed)
+    # 1 catalog, 2 page tree, 3 font, then a page and a content stream per page
+    objects: List[bytes] = [b'', b'', b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for _ in range(pages):
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        lines = [' '.join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        content = 'BT /F1 10 Tf 12 TL 50 750 Td\n' + '\n'.join(
+            f'({_pdf_escape(line)}) Tj T*' for line in lines
+        ) + '\nET'
+        objects.append(_stream('', content.encode('latin-1')))
+        content_ref = len(objects)
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>'.encode()
+        )
+        kids.append(len(objects))
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = (
+        f'<< /Type /Pages /Kids [{" ".join(f"{k} 0 R" for k in kids)}] /Count {pages} >>'
+    ).encode()
+    return _assemble_pdf(objects)
+
+
+def make_scanned_pdf(pages: int, width: int = 850, height: int = 1100, seed: int = 0) -> bytes:
+    """Generates an image-only PDF, which has no text layer and forces the OCR path."""
+    rng = random.Random(seed)
+    objects: List[bytes] = [b'', b'']
+    kids = []
+    for _ in range(pages):
+        # Horizontal dark bands on a light background, roughly resembling lines of print
+        rows = bytearray()
+        for y in range(height):
+            shade = 40 if (y // 14) % 2 and rng.random() < 0.9 else 235
+            rows += bytes([shade]) * width
+        image = zlib.compress(bytes(rows), 6)
+        objects.append(_stream(
+            f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode',
+            image
+        ))
+        image_ref = len(objects)
+        objects.append(_stream('', 'q 612 0 0 792 0 0 cm /Im1 Do Q'.encode()))
+        content_ref = len(objects)
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /XObject << /Im1 {image_ref} 0 R >> >> '
+            f'/Contents {content_ref} 0 R >>'.encode()
+        )
+        kids.append(len(objects))
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = (
+        f'<< /Type /Pages /Kids [{" ".join(f"{k} 0 R" for k in kids)}] /Count {pages} >>'
+    ).encode()
+    return _assemble_pdf(objects)
+
+
+class SyntheticAgendaSite:
+    """
+    A loopback HTTP server exposing an AgendaCenter-style index page that links to
+    generated PDFs, plus a handful of ordinary HTML pages.
+
+    With `etags` the server sends an ETag for every file and answers a matching
+    If-None-Match with 304, as most CMSs do. `replace` swaps a file's body in place, the
+    way sites republish an amended agenda at the same URL.
+    """
+
+    def __init__(self, documents: int, pages_per_document: int = 2,
+                 scanned_ratio: float = 0.2, html_links: int = 10,
+                 latency: float = 0.0, seed: int = 0, etags: bool = True):
+        rng = random.Random(seed)
+        self.latency = latency
+        self.etags = etags
+        self.pages_per_document = pages_per_document
+        # Body bytes sent for PDFs, to compare full and conditional refreshes
+        self.pdf_bytes_served = 0
+        self._served_lock = threading.Lock()
+        self.files: Dict[str, bytes] = {}
+        anchors = []
+
+        for i in range(documents):
+            path = f'/AgendaCenter/ViewFile/Agenda/_{i:06d}.pdf'
+            if rng.random() < scanned_ratio:
+                self.files[path] = make_scanned_pdf(pages_per_document, seed=seed + i)
+            else:
+                self.files[path] = make_text_pdf(pages_per_document, seed=seed + i)
+            anchors.append(f'<a href="{path}">Agenda {i}</a>')
+
+        for i in range(html_links):
+            path = f'/AgendaCenter/Category/{i}'
+            self.files[path] = f'<html><body>Category {i}</body></html>'.encode()
+            anchors.append(f'<a href="{path}">Category {i}</a>')
+
+        rng.shuffle(anchors)
+        self.files['/AgendaCenter'] = (
+            '<html><head><title>Agenda Center</title></head><body>'
+            + '\n'.join(anchors) + '</body></html>'
+        ).encode()
+
+        self.pdf_count = documents
+        self.pdf_bytes = sum(len(body) for path, body in self.files.items() if path.endswith('.pdf'))
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def index_url(self) -> str:
+        return f'{self.base_url}/AgendaCenter'
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = site.files.get(self.path)
+                if site.latency:
+                    time.sleep(site.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                content_type = 'application/pdf' if self.path.endswith('.pdf') else 'text/html; charset=utf-8'
+                etag = f'"{hashlib.sha1(body).hexdigest()}"' if site.etags else None
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+                if self.path.endswith('.pdf'):
+                    with site._served_lock:
+                        site.pdf_bytes_served += len(body)
+
+            def handle(self):
+                # The crawler closes responses early when it only needs the headers
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def replace(self, path: str, seed: int):
+        """Republishes the PDF at `path` with different text of the same page count."""
+        self.files[path] = make_text_pdf(self.pages_per_document, seed=seed)
+
+    def start(self) -> 'SyntheticAgendaSite':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_PACKED_SECTION_RE = re.compile(
+    r'(<<<SECTION (\d+)>>>)(.*?)(<<<END SECTION \2>>>)', re.DOTALL)
+
+
+class FakeCleanupChain:
+    """
+    A deterministic stand-in for the LLM cleanup chain. It sleeps for a fixed latency
+    (plus an optional per-character cost) and returns the input wrapped in a paragraph.
+    Packed requests, which carry a section `count`, get each section wrapped instead.
+    """
+
+    def __init__(self, latency: float = 0.05, seconds_per_char: float = 0.0):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, inputs: Dict) -> Dict:
+        text = inputs["text"]
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.seconds_per_char * len(text))
+        if "count" in inputs:
+            return {"text": _PACKED_SECTION_RE.sub(
+                lambda m: f"{m.group(1)}\n<p>{m.group(3).strip()}</p>\n{m.group(4)}", text)}
+        return {"text": f"<p>{text.strip()}</p>"}
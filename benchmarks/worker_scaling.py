@@ -0,0 +1,229 @@
+"""
+Crawl worker scaling benchmark.
+
+Serves several synthetic AgendaCenter sites on loopback, queues one crawl of all of
+them and runs N local `app.worker` processes against the same PostgreSQL database
+until the queue drains. Reports wall time and how the feed tasks and PDF jobs were
+spread across workers, and checks that every PDF was stored exactly once.
+
+With --kill-after one worker is SIGKILLed mid-crawl; the others must take over its
+claims once its heartbeat goes stale.
+
+Requires a scratch PostgreSQL database configured through the usual POSTGRES_*
+environment variables. Rows written by the benchmark are removed afterwards. Exits
+non-zero if a check fails.
+
+Usage:
+    python -m benchmarks.worker_scaling --workers 1,2,4 --feeds 4 --documents 25
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.crawl_throughput import _cleanup
+from benchmarks.synthetic import FakeCleanupChain, SyntheticAgendaSite
+
+
+def _make_crawler(workdir: str, options: dict):
+    from app.scraper import WebRSSCrawler
+
+    crawler = WebRSSCrawler(
+        config_file=os.path.join(workdir, 'crawler_config.json'),
+        log_level=logging.WARNING,
+        log_file=os.path.join(workdir, 'crawler.log'),
+        rss_directory=os.path.join(workdir, 'rss'),
+        state_directory=os.path.join(workdir, 'state'),
+        archive_directory=os.path.join(workdir, 'archive'),
+        pdf_job_concurrency=options['pdf_job_concurrency'],
+    )
+    crawler.cleanup_chain = crawler.packed_cleanup_chain = FakeCleanupChain(
+        latency=options['llm_latency'])
+    return crawler
+
+
+def _run_worker(workdir: str, options: dict):
+    from app.worker import CrawlWorker
+
+    crawler = _make_crawler(workdir, options)
+    CrawlWorker(
+        crawler,
+        poll_interval=0.2,
+        heartbeat_interval=options['heartbeat_interval'],
+        stale_after=options['stale_after'],
+    ).run(exit_when_idle=True)
+
+
+def _queue_state(crawler, run_id: int, feed_titles: list) -> dict:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT status, COUNT(*), COUNT(DISTINCT claimed_by)
+        FROM crawl_tasks WHERE run_id = %s GROUP BY status
+    """, (run_id,))
+    tasks = {status: count for status, count, _ in cursor.fetchall()}
+    cursor.execute("""
+        SELECT status, COUNT(*) FROM pdf_jobs WHERE feed_title = ANY(%s) GROUP BY status
+    """, (feed_titles,))
+    jobs = dict(cursor.fetchall())
+    cursor.execute("""
+        SELECT claimed_by, COUNT(*) FROM pdf_jobs
+        WHERE feed_title = ANY(%s) AND status = 'done'
+        GROUP BY claimed_by ORDER BY 2 DESC
+    """, (feed_titles,))
+    jobs_per_worker = [count for _, count in cursor.fetchall()]
+    cursor.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT (feed_title, pdf_url))
+        FROM pdf_content WHERE feed_title = ANY(%s)
+    """, (feed_titles,))
+    stored, distinct = cursor.fetchone()
+    cursor.execute("SELECT status FROM crawl_runs WHERE id = %s", (run_id,))
+    run_status = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    return {
+        'tasks': tasks,
+        'jobs': jobs,
+        'jobs_per_worker': jobs_per_worker,
+        'pdfs_stored': stored,
+        'pdfs_distinct': distinct,
+        'run_status': run_status,
+    }
+
+
+def run_scenario(workers: int, sites: list, options: dict) -> dict:
+    context = multiprocessing.get_context('spawn')
+    suffix = uuid.uuid4().hex[:8]
+    feed_titles = [f"bench-worker-{suffix}-{i}" for i in range(len(sites))]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'crawler_config.json'), 'w') as f:
+            json.dump([{
+                'source_url': site.index_url,
+                'feed_title': feed_title,
+                'feed_description': 'Synthetic worker benchmark feed',
+                'link_selector': 'a',
+                'pdf_only': True,
+                'output_filename': f'{feed_title}.xml',
+            } for site, feed_title in zip(sites, feed_titles)], f)
+
+        crawler = _make_crawler(workdir, options)
+        try:
+            start = time.perf_counter()
+            run_id = crawler.enqueue_crawl()
+            processes = [
+                context.Process(target=_run_worker, args=(workdir, options))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+
+            killed = False
+            if options['kill_after'] is not None and workers > 1:
+                time.sleep(options['kill_after'])
+                if processes[0].is_alive():
+                    processes[0].kill()
+                    killed = True
+
+            for process in processes:
+                process.join()
+            wall = time.perf_counter() - start
+            state = _queue_state(crawler, run_id, feed_titles)
+        finally:
+            for feed_title in feed_titles:
+                _cleanup(crawler, feed_title)
+
+    expected = sum(site.pdf_count for site in sites)
+    failures = []
+    if state['pdfs_stored'] != expected:
+        failures.append(f"stored {state['pdfs_stored']} PDFs, expected {expected}")
+    if state['pdfs_distinct'] != state['pdfs_stored']:
+        failures.append("some PDFs were stored more than once")
+    if set(state['jobs']) != {'done'}:
+        failures.append(f"PDF jobs not all done: {state['jobs']}")
+    if set(state['tasks']) != {'completed'}:
+        failures.append(f"crawl tasks not all completed: {state['tasks']}")
+    if state['run_status'] != 'completed':
+        failures.append(f"crawl run is '{state['run_status']}'")
+
+    return {
+        'workers': workers,
+        'killed_worker': killed,
+        'wall_seconds': round(wall, 3),
+        'documents': expected,
+        'docs_per_second': round(expected / wall, 2) if wall else None,
+        **state,
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    parser.add_argument('--feeds', type=int, default=4, help='Number of synthetic sites')
+    parser.add_argument('--documents', type=int, default=25, help='PDFs per site')
+    parser.add_argument('--pages', type=int, default=2, help='Pages per generated PDF')
+    parser.add_argument('--server-latency', type=float, default=0.02,
+                        help='Latency added by the synthetic sites to every response')
+    parser.add_argument('--llm-latency', type=float, default=0.05,
+                        help='Fixed latency of the fake LLM per call, in seconds')
+    parser.add_argument('--pdf-job-concurrency', type=int, default=2,
+                        help='PDF jobs each worker runs at once')
+    parser.add_argument('--heartbeat-interval', type=float, default=1.0)
+    parser.add_argument('--stale-after', type=float, default=5.0)
+    parser.add_argument('--kill-after', type=float,
+                        help='SIGKILL one worker this many seconds into each scenario')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    options = {
+        'llm_latency': args.llm_latency,
+        'pdf_job_concurrency': args.pdf_job_concurrency,
+        'heartbeat_interval': args.heartbeat_interval,
+        'stale_after': args.stale_after,
+        'kill_after': args.kill_after,
+    }
+    sites = [
+        SyntheticAgendaSite(
+            documents=args.documents,
+            pages_per_document=args.pages,
+            scanned_ratio=0.0,
+            latency=args.server_latency,
+            seed=i * 10_000,
+        ).start()
+        for i in range(args.feeds)
+    ]
+    report = []
+    try:
+        for workers in (int(count) for count in args.workers.split(',') if count.strip()):
+            result = run_scenario(workers, sites, options)
+            report.append(result)
+            print(
+                f"{workers:>3} workers  {result['wall_seconds']:>8.2f}s  "
+                f"{result['docs_per_second'] or 0:>7.2f} docs/s  "
+                f"jobs per worker {result['jobs_per_worker']}"
+                + ('  (one worker killed)' if result['killed_worker'] else '')
+                + ''.join(f"\n    FAILED: {failure}" for failure in result['failures']),
+                file=sys.stderr
+            )
+    finally:
+        for site in sites:
+            site.stop()
+
+    output = json.dumps({'options': options, 'results': report}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if any(result['failures'] for result in report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
+import os
+
 bind = "0.0.0.0:10000"
 workers = 4
-threads = 2
+# /api/stream clients each hold a thread (see STREAM_MAX_CLIENTS), so keep a few spare
+threads = int(os.getenv('GUNICORN_THREADS', 8))
 timeout = 120
@@ -1,16 +1,30 @@
-from flask import Flask, jsonify, request, send_from_directory, abort
+from flask import Flask, Response, jsonify, request, send_from_directory, abort, g
 import psycopg2
 import psycopg2.extras
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from flask_cors import CORS
 import os
+from functools import wraps
 from dotenv import load_dotenv
-import logging
-import logging.handlers
+import threading
+import time
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from app.scraper import run_scraper
 from app.error_handler import APIErrorHandler
+from app.log import configure_logger
+from app.rollups import ROLLUP_PERIODS
+from app.changes import format_cursor, horizon_cursor, parse_cursor
+from app.stream import RESYNC, ArticleStream, replay_articles
+from app.export import (
+    EXPORT_FORMATS, EXPORT_MIMETYPES, begin_export, export_sql, parse_since, stream_copy
+)
+from app.metrics import REGISTRY, DEFAULT_SIZE_BUCKETS, TimedDictCursor
+from app.cache import CrawlGenerationTracker, ResponseCache
+from app.encoding import (
+    MIN_COMPRESS_BYTES, MSGPACK_MIMETYPE, accepts_coding, compress, negotiate_encoding,
+    pack_msgpack, wants_msgpack
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,37 +43,160 @@ CORS(app, resources={
 
 
 def setup_logger():
-    logger = logging.getLogger('WebRSSCrawlerAPI')
-    logger.setLevel(logging.DEBUG)
-
-    # Console Handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-
-    # File Handler
-    log_directory = 'logs'
-    os.makedirs(log_directory, exist_ok=True)
-    file_handler = logging.handlers.RotatingFileHandler(
-        os.path.join(log_directory, 'web_rss_crawler_api.log'),
-        maxBytes=1_000_000,
-        backupCount=5
+    # Written by a background QueueListener; level and format come from LOG_LEVEL/LOG_FORMAT
+    return configure_logger(
+        'WebRSSCrawlerAPI',
+        os.path.join('logs', 'web_rss_crawler_api.log'),
+        fmt='%(asctime)s - %(levelname)s - %(message)s'
     )
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-
-    return logger
 
 
 logger = setup_logger()
 error_handler = APIErrorHandler(logger)
 
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'API request latency by route',
+    ['method', 'route', 'status']
+)
+RESPONSE_CACHE_STATS = REGISTRY.gauge(
+    'response_cache',
+    'Response cache entries, bytes and lookup totals for this worker',
+    ['stat']
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    'http_response_size_bytes',
+    'API response body size by route',
+    ['method', 'route'],
+    buckets=DEFAULT_SIZE_BUCKETS
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Records latency and response size for every request, labelled by the matched
+    route pattern rather than the raw path to keep label cardinality bounded.
+    """
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(
+        time.perf_counter() - start,
+        method=request.method, route=route, status=str(response.status_code)
+    )
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(
+            response.content_length, method=request.method, route=route)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Compresses response bodies with gzip or brotli according to Accept-Encoding.
+    Registered after record_request_metrics so that it runs first and the recorded
+    response size is the size on the wire.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code == 204):
+        return response
+    if response.content_length is None or response.content_length < MIN_COMPRESS_BYTES:
+        return response
+
+    coding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if coding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), coding))
+    response.headers['Content-Encoding'] = coding
+    return response
+
+
+def articles_response(payload):
+    """
+    Serializes an article payload as JSON, or as msgpack when the client sends
+    `Accept: application/msgpack`.
+    """
+    if wants_msgpack(request.headers.get('Accept', '')):
+        response = Response(pack_msgpack(payload), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(payload)
+    response.vary.add('Accept')
+    return response
+
+
+def article_select(include_content: bool) -> str:
+    """
+    Builds the SELECT ... FROM clause shared by the article endpoints. The full body
+    is only joined in from pdf_body when requested; otherwise the stored excerpt is returned.
+    """
+    query = """
+        SELECT
+            p.id,
+            p.feed_title,
+            p.source_link,
+            p.pdf_url,
+            p.excerpt,
+            p.word_count,
+            p.title,
+            p.page_title,
+            p.author,
+            p.creation_date,
+            p.modification_date,
+            p.number_of_pages,
+            p.file_size_bytes,
+            p.version,
+            p.duplicate_of,
+            p.duplicate_similarity,
+            p.date_processed
+    """
+    if include_content:
+        query += """,
+            b.content
+        FROM pdf_content p
+        LEFT JOIN pdf_body b ON b.id = p.id
+        """
+    else:
+        query += """
+        FROM pdf_content p
+        """
+    return query
+
+
+def include_content_requested() -> bool:
+    """True if the request asks for full document bodies via `include_content=true`."""
+    return request.args.get('include_content', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def group_duplicates_requested() -> bool:
+    """True if the request asks for near-duplicates nested under their originals via `group_duplicates=true`."""
+    return request.args.get('group_duplicates', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def group_duplicates(articles: list) -> list:
+    """
+    Moves each near-duplicate into a `duplicates` list on its original when the original
+    is in the same list. Duplicates whose original is not listed stay where they are.
+    """
+    by_id = {article['id']: article for article in articles}
+    grouped = []
+    for article in articles:
+        original = by_id.get(article.get('duplicate_of'))
+        if original is not None:
+            original.setdefault('duplicates', []).append(article)
+        else:
+            grouped.append(article)
+    return grouped
 
 
 def get_db_connection():
@@ -74,16 +211,97 @@ def get_db_connection():
             dbname=os.getenv('POSTGRES_DB'),
             user=os.getenv('POSTGRES_USER'),
             password=os.getenv('POSTGRES_PASSWORD'),
-            sslmode='require'  # Ensure SSL is used
+            sslmode=os.getenv('POSTGRES_SSLMODE', 'require')  # SSL is required unless overridden
         )
         return conn
     except psycopg2.Error as e:
-        logger.error(f"Error connecting to PostgreSQL: {e}")
+        logger.error("Error connecting to PostgreSQL: %s", e)
         raise
 
 
+crawl_generation = CrawlGenerationTracker(
+    get_db_connection,
+    check_interval=float(os.getenv('CRAWL_GENERATION_CHECK_SECONDS', 5)),
+    logger=logger
+)
+
+response_cache = ResponseCache(
+    crawl_generation,
+    max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 300))
+)
+
+
+def record_response_cache_stats():
+    stats = response_cache.stats()
+    for name in ('entries', 'bytes', 'hits', 'misses', 'evictions', 'invalidations'):
+        RESPONSE_CACHE_STATS.set(stats[name], stat=name)
+
+
+REGISTRY.on_collect(record_response_cache_stats)
+
+# With METRICS_DIR set, each gunicorn worker, and any crawl worker on this host given the
+# same directory, writes its metrics there, and /metrics reports them all
+METRICS_DIR = os.getenv('METRICS_DIR')
+if METRICS_DIR:
+    REGISTRY.share(METRICS_DIR)
+
+
+article_stream = ArticleStream(get_db_connection, logger)
+
+# Each stream holds a gunicorn thread for its whole life, so streams are capped per worker
+# to leave threads for ordinary requests, and closed after a while so that clients
+# reconnect (with Last-Event-ID) and spread across workers
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 6))
+STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', 600))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', 15))
+
+
+def cached_response(f=None, defaults=None):
+    """
+    Serves successful responses of an endpoint from the per-worker response cache,
+    keyed by route, query parameters and negotiated body format.
+
+    `defaults` returns the values an endpoint uses for query parameters a request
+    leaves out, for endpoints whose defaults change over time (such as today's date);
+    they are keyed like parameters the request gave.
+    """
+    if f is None:
+        return lambda f: cached_response(f, defaults)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        body_format = 'msgpack' if wants_msgpack(request.headers.get('Accept', '')) else 'json'
+        params = list(request.args.items(multi=True))
+        if defaults is not None:
+            params.extend((name, value) for name, value in defaults().items()
+                          if not request.args.get(name))
+        key = '|'.join((
+            request.path,
+            body_format,
+            '&'.join(f"{name}={value}" for name, value in sorted(params))
+        ))
+
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.vary.add('Accept')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        generation = response_cache.current_generation
+        response = f(*args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+            response_cache.put(key, response.get_data(), response.mimetype, generation)
+            response.headers['X-Cache'] = 'MISS'
+        return response
+    return decorated_function
+
+
 @app.route('/api/articles/date_range', methods=['GET'])
 @error_handler.handle_endpoint
+@cached_response
 def get_by_last_date_range():
     """
     Get PDF articles by date_processed range from the pdf_content table
@@ -91,12 +309,14 @@ def get_by_last_date_range():
     Query parameters:
     - start: Start date in YYYY-MM-DD format (required)
     - end: End date in YYYY-MM-DD format (required)
+    - include_content: Return full document bodies instead of excerpts (optional)
+    - group_duplicates: Nest near-duplicates under their original's `duplicates` (optional)
     """
     start_date = request.args.get('start', '').strip()
     end_date = request.args.get('end', '').strip()
 
-    logger.debug(f"Start Date: {start_date}")
-    logger.debug(f"End Date: {end_date}")
+    logger.debug("Start Date: %s", start_date)
+    logger.debug("End Date: %s", end_date)
 
     if not start_date or not end_date:
         return jsonify({'error': 'start and end parameters are required'}), 400
@@ -108,98 +328,79 @@ def get_by_last_date_range():
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
 
+    include_content = include_content_requested()
+
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT 
-                id,
-                feed_title,
-                source_link,
-                pdf_url,
-                content,
-                title,
-                page_title,
-                author,
-                creation_date,
-                modification_date,
-                number_of_pages,
-                file_size_bytes,
-                date_processed
-            FROM pdf_content
-            WHERE DATE(date_processed) BETWEEN DATE(%s) AND DATE(%s)
-            ORDER BY date_processed DESC
+        cursor = conn.cursor(cursor_factory=TimedDictCursor)
+
+        query = article_select(include_content) + """
+            WHERE DATE(p.date_processed) BETWEEN DATE(%s) AND DATE(%s)
+            ORDER BY p.date_processed DESC
         """
 
         cursor.execute(query, (start_date, end_date))
         rows = cursor.fetchall()
 
         articles = [dict(row) for row in rows]
+        if group_duplicates_requested():
+            articles = group_duplicates(articles)
 
         cursor.close()
         conn.close()
-        return jsonify({'articles': articles})
+        return articles_response({'articles': articles})
 
     except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return jsonify({'error': str(e)}), 500
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/articles', methods=['GET'])
 @error_handler.handle_endpoint
+@cached_response
 def get_all_articles_by_source_url():
     """
     Get all PDF articles filtered by source_url from the pdf_content table
 
     Query parameters:
     - source_url: The source URL to filter articles by (required)
+    - include_content: Return full document bodies instead of excerpts (optional)
+    - group_duplicates: Nest near-duplicates under their original's `duplicates` (optional)
     """
     source_url = request.args.get('source_url', '').strip()
     if not source_url:
         return jsonify({'error': 'source_url parameter is required'}), 400
 
+    include_content = include_content_requested()
+
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT 
-                id,
-                feed_title,
-                source_link,
-                pdf_url,
-                content,
-                title,
-                page_title,
-                author,
-                creation_date,
-                modification_date,
-                number_of_pages,
-                file_size_bytes,
-                date_processed
-            FROM pdf_content
-            WHERE source_link = %s
-            ORDER BY date_processed DESC
+        cursor = conn.cursor(cursor_factory=TimedDictCursor)
+
+        query = article_select(include_content) + """
+            WHERE p.source_link = %s
+            ORDER BY p.date_processed DESC
         """
 
         cursor.execute(query, (source_url,))
         rows = cursor.fetchall()
 
         articles = [dict(row) for row in rows]
+        if group_duplicates_requested():
+            articles = group_duplicates(articles)
 
         cursor.close()
         conn.close()
-        return jsonify({'articles': articles})
+        return articles_response({'articles': articles})
 
     except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return jsonify({'error': str(e)}), 500
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -208,100 +409,85 @@ def get_all_articles_by_source_url():
 def get_all_articles():
     """
     Get all PDF articles from the pdf_content table
+
+    Query parameters:
+    - include_content: Return full document bodies instead of excerpts (optional)
+    - group_duplicates: Nest near-duplicates under their original's `duplicates` (optional)
     """
+    include_content = include_content_requested()
+
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT 
-                id,
-                feed_title,
-                source_link,
-                pdf_url,
-                content,
-                title,
-                page_title,
-                author,
-                creation_date,
-                modification_date,
-                number_of_pages,
-                file_size_bytes,
-                date_processed
-            FROM pdf_content
-            ORDER BY date_processed DESC
+        cursor = conn.cursor(cursor_factory=TimedDictCursor)
+
+        query = article_select(include_content) + """
+            ORDER BY p.date_processed DESC
         """
 
         cursor.execute(query)
         rows = cursor.fetchall()
 
         articles = [dict(row) for row in rows]
+        if group_duplicates_requested():
+            articles = group_duplicates(articles)
 
         cursor.close()
         conn.close()
-        return jsonify({'articles': articles})
+        return articles_response({'articles': articles})
 
     except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return jsonify({'error': str(e)}), 500
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/articles/feed', methods=['GET'])
 @error_handler.handle_endpoint
+@cached_response
 def get_articles_by_feed_title():
     """
     Get all PDF articles filtered by feed_title from the pdf_content table
 
     Query parameters:
     - feed_title: The feed title to filter articles by (required)
+    - include_content: Return full document bodies instead of excerpts (optional)
+    - group_duplicates: Nest near-duplicates under their original's `duplicates` (optional)
     """
     feed_title = request.args.get('feed_title', '').strip()
     if not feed_title:
         return jsonify({'error': 'feed_title parameter is required'}), 400
-    
-    print(feed_title)
+
+    logger.debug("Feed title: %s", feed_title)
+
+    include_content = include_content_requested()
 
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT 
-                id,
-                feed_title,
-                source_link,
-                pdf_url,
-                content,
-                title,
-                page_title,
-                author,
-                creation_date,
-                modification_date,
-                number_of_pages,
-                file_size_bytes,
-                date_processed
-            FROM pdf_content
-            WHERE feed_title = %s
-            ORDER BY date_processed DESC
+        cursor = conn.cursor(cursor_factory=TimedDictCursor)
+
+        query = article_select(include_content) + """
+            WHERE p.feed_title = %s
+            ORDER BY p.date_processed DESC
         """
 
         cursor.execute(query, (feed_title,))
         rows = cursor.fetchall()
 
         articles = [dict(row) for row in rows]
+        if group_duplicates_requested():
+            articles = group_duplicates(articles)
 
         cursor.close()
         conn.close()
-        return jsonify({'articles': articles})
+        return articles_response({'articles': articles})
 
     except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return jsonify({'error': str(e)}), 500
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # New Routes to Serve RSS Feeds
@@ -309,38 +495,27 @@ def get_articles_by_feed_title():
 
 @app.route('/api/article', methods=['GET'])
 @error_handler.handle_endpoint
+@cached_response
 def get_article_by_id():
     """
     Get a specific PDF article by id from the pdf_content table.
 
     Query parameters:
     - id: The unique identifier of the article (required)
+    - include_content: Join in the full document body (optional)
     """
     article_id = request.args.get('id', '').strip()
     if not article_id:
         return jsonify({'error': 'id parameter is required'}), 400
 
+    include_content = include_content_requested()
+
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT 
-                id,
-                feed_title,
-                source_link,
-                pdf_url,
-                content,
-                title,
-                page_title,
-                author,
-                creation_date,
-                modification_date,
-                number_of_pages,
-                file_size_bytes,
-                date_processed
-            FROM pdf_content
-            WHERE id = %s
+        cursor = conn.cursor(cursor_factory=TimedDictCursor)
+
+        query = article_select(include_content) + """
+            WHERE p.id = %s
             LIMIT 1
         """
 
@@ -356,18 +531,116 @@ def get_article_by_id():
 
         cursor.close()
         conn.close()
-        return jsonify(article)
+        return articles_response(article)
 
     except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return jsonify({'error': str(e)}), 500
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 
 
+@app.route('/api/article/versions', methods=['GET'])
+@error_handler.handle_endpoint
+@cached_response
+def get_article_versions():
+    """
+    Get the earlier versions of a PDF article that its site has since replaced, newest first
+
+    Query parameters:
+    - id: The unique identifier of the article (required)
+    - include_content: Return the full text of each version (optional)
+    """
+    article_id = request.args.get('id', '').strip()
+    if not article_id.isdigit():
+        return jsonify({'error': 'id parameter is required'}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute("SELECT version FROM pdf_content WHERE id = %s", (article_id,))
+    row = cursor.fetchone()
+    if not row:
+        cursor.close()
+        conn.close()
+        return jsonify({'error': 'Article not found'}), 404
+
+    cursor.execute(f"""
+        SELECT
+            version,
+            content_sha256,
+            etag,
+            last_modified,
+            title,
+            author,
+            creation_date,
+            modification_date,
+            number_of_pages,
+            file_size_bytes,
+            word_count,
+            excerpt,
+            {'content,' if include_content_requested() else ''}
+            fetched_at,
+            replaced_at
+        FROM pdf_versions
+        WHERE pdf_id = %s
+        ORDER BY version DESC
+    """, (article_id,))
+    versions = [dict(version) for version in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+    return articles_response({
+        'id': int(article_id),
+        'current_version': row['version'],
+        'versions': versions,
+    })
+
+
+@app.route('/api/article/duplicates', methods=['GET'])
+@error_handler.handle_endpoint
+@cached_response
+def get_article_duplicates():
+    """
+    Get the group of near-duplicate PDF articles an article belongs to: the original,
+    followed by every document linked to it through duplicate_of, oldest first
+
+    Query parameters:
+    - id: The unique identifier of any article in the group (required)
+    - include_content: Return full document bodies instead of excerpts (optional)
+    """
+    article_id = request.args.get('id', '').strip()
+    if not article_id.isdigit():
+        return jsonify({'error': 'id parameter is required'}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute(
+        "SELECT COALESCE(duplicate_of, id) AS original_id FROM pdf_content WHERE id = %s",
+        (article_id,))
+    row = cursor.fetchone()
+    if not row:
+        cursor.close()
+        conn.close()
+        return jsonify({'error': 'Article not found'}), 404
+
+    cursor.execute(article_select(include_content_requested()) + """
+        WHERE p.id = %(original_id)s OR p.duplicate_of = %(original_id)s
+        ORDER BY p.id
+    """, {'original_id': row['original_id']})
+    articles = [dict(article) for article in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+    return articles_response({
+        'id': int(article_id),
+        'original_id': row['original_id'],
+        'articles': articles,
+    })
+
+
 @app.route('/rss/<path:filename>', methods=['GET'])
 @error_handler.handle_endpoint
 def serve_rss_feed(filename):
@@ -381,15 +654,31 @@ def serve_rss_feed(filename):
 
     # Security: Ensure that only .xml files are served
     if not filename.lower().endswith('.xml'):
-        logger.warning(f"Attempt to access non-XML file: {filename}")
+        logger.warning("Attempt to access non-XML file: %s", filename)
         abort(404)
 
     # Prevent directory traversal attacks
     if '..' in filename or filename.startswith('/'):
-        logger.warning(f"Attempted directory traversal with filename: {filename}")
+        logger.warning("Attempted directory traversal with filename: %s", filename)
         abort(404)
 
     try:
+        # Serve the crawler's precompressed sibling when the client accepts gzip
+        # and the sibling is at least as new as the feed itself
+        xml_path = os.path.join(rss_directory, filename)
+        gz_path = f"{xml_path}.gz"
+        if (accepts_coding(request.headers.get('Accept-Encoding', ''), 'gzip')
+                and os.path.isfile(gz_path)
+                and os.path.getmtime(gz_path) >= os.path.getmtime(xml_path)):
+            response = send_from_directory(
+                directory=rss_directory,
+                path=f"{filename}.gz",
+                mimetype='application/rss+xml',
+                as_attachment=False
+            )
+            response.headers['Content-Encoding'] = 'gzip'
+            return response
+
         return send_from_directory(
             directory=rss_directory,
             path=filename,
@@ -397,7 +686,7 @@ def serve_rss_feed(filename):
             as_attachment=False
         )
     except FileNotFoundError:
-        logger.error(f"RSS feed file not found: {filename}")
+        logger.error("RSS feed file not found: %s", filename)
         abort(404)
 
 
@@ -422,9 +711,524 @@ def list_rss_feeds():
         xml_files = [f for f in files if f.lower().endswith('.xml')]
         return jsonify({'feeds': xml_files})
     except Exception as e:
-        logger.error(f"Error listing RSS feeds: {e}")
+        logger.error("Error listing RSS feeds: %s", e)
         return jsonify({'error': 'Unable to list RSS feeds'}), 500
 
+
+def stream_resume_cursor(last_event_id: str) -> str:
+    """
+    Returns the change cursor a stream starts from: the client's Last-Event-ID, or the
+    current horizon for a new client. A bare number is an article id sent as event id by
+    earlier versions, and resumes from that article's cursor.
+    """
+    if last_event_id and not last_event_id.isdigit():
+        return last_event_id
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if last_event_id:
+            cursor.execute(
+                "SELECT change_xid::text, change_seq FROM pdf_content WHERE id = %s",
+                (int(last_event_id),))
+            row = cursor.fetchone()
+            if row:
+                return format_cursor(*row)
+        return horizon_cursor(cursor)
+    finally:
+        conn.close()
+
+
+@app.route('/api/stream', methods=['GET'])
+@error_handler.handle_endpoint
+def stream_articles():
+    """
+    Stream newly stored articles as server-sent events, as the crawler commits them
+
+    Each event is an `article` event whose data is the article's metadata as JSON. Its
+    event id is a change cursor up to which every committed article has been sent; a
+    client reconnecting with that id in the Last-Event-ID header first receives the
+    articles stored since. The stream catches up from the database every
+    STREAM_KEEPALIVE_SECONDS, which advances the id. Articles may be sent twice across a
+    reconnect, but none is skipped.
+
+    Query parameters:
+    - feed_title: Only stream articles of this feed (optional)
+    - last_event_id: Resume after this id, for clients that cannot set Last-Event-ID (optional)
+    """
+    feed_title = request.args.get('feed_title', '').strip() or None
+    last_event_id = (request.headers.get('Last-Event-ID')
+                     or request.args.get('last_event_id', '')).strip()
+    if last_event_id and not last_event_id.isdigit():
+        try:
+            parse_cursor(last_event_id)
+        except ValueError:
+            return jsonify({'error': 'Last-Event-ID must be an event id from this stream'}), 400
+    if article_stream.subscriber_count >= STREAM_MAX_CLIENTS:
+        response = jsonify({'error': 'Too many open streams on this worker'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    subscription = article_stream.subscribe(feed_title)
+
+    def events():
+        # Live notifications arrive in commit order, so the resume point only moves when
+        # a replay has passed every committed change up to it
+        resume = stream_resume_cursor(last_event_id)
+        # Ids sent recently, so articles delivered both by a replay and live go out once
+        sent = set()
+        synced_at = time.monotonic()
+
+        def event(article_id: int, payload: str) -> str:
+            sent.add(article_id)
+            if len(sent) > 10_000:
+                sent.clear()
+            return f"id: {resume}\nevent: article\ndata: {payload}\n\n"
+
+        def replay():
+            nonlocal resume, synced_at
+            start = resume
+            conn = get_db_connection()
+            try:
+                for cursor, article_id, payload in replay_articles(conn, resume, feed_title):
+                    resume = cursor
+                    if article_id not in sent:
+                        yield event(article_id, payload)
+            finally:
+                conn.close()
+            synced_at = time.monotonic()
+            if resume != start:
+                # Hands the client the new resume point even if every article was sent live
+                yield f"id: {resume}\n\n"
+
+        try:
+            # Ask EventSource clients to reconnect after 5 seconds when the stream ends, and
+            # hand them a resume point even if no article arrives before then
+            yield f"retry: 5000\nid: {resume}\n\n"
+            yield from replay()
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                item = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                if item is None:
+                    yield ": keepalive\n\n"
+                elif item is RESYNC:
+                    yield from replay()
+                    continue
+                elif item[0] not in sent:
+                    yield event(*item)
+                if time.monotonic() - synced_at >= STREAM_KEEPALIVE_SECONDS:
+                    yield from replay()
+        finally:
+            article_stream.unsubscribe(subscription)
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # A generator closed before it started skips its finally block
+    response.call_on_close(lambda: article_stream.unsubscribe(subscription))
+    return response
+
+
+@app.route('/api/export', methods=['GET'])
+@error_handler.handle_endpoint
+def export_articles():
+    """
+    Stream matching articles as CSV or NDJSON straight from Postgres COPY, gzip-compressed
+    when the client accepts it. The X-Export-Watermark header holds the value to pass as
+    `since` on the next export to get only articles stored or changed in between.
+
+    Query parameters:
+    - format: csv or ndjson (optional, default ndjson)
+    - feed_title: Only export this feed (optional)
+    - start: First date_processed day in YYYY-MM-DD format (optional)
+    - end: Last date_processed day in YYYY-MM-DD format (optional)
+    - since: Watermark of an earlier export (optional)
+    - include_content: Include full document bodies (optional)
+    """
+    fmt = request.args.get('format', 'ndjson').strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    start = request.args.get('start', '').strip()
+    end = request.args.get('end', '').strip()
+    since = request.args.get('since', '').strip() or None
+    try:
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+        if since is not None:
+            parse_since(since)
+    except ValueError:
+        return jsonify(
+            {'error': 'start and end must be YYYY-MM-DD and since an export watermark'}), 400
+
+    conn = get_db_connection()
+    try:
+        watermark = begin_export(conn)
+        sql = export_sql(
+            conn.cursor(), fmt, watermark,
+            feed_title=request.args.get('feed_title', '').strip() or None,
+            start=start, end=end, since=since,
+            include_content=include_content_requested()
+        )
+    except Exception:
+        conn.close()
+        raise
+
+    compressed = accepts_coding(request.headers.get('Accept-Encoding', ''), 'gzip')
+    response = Response(stream_copy(conn, sql, compress=compressed), mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['X-Export-Watermark'] = watermark
+    response.headers['Content-Disposition'] = f'attachment; filename="articles.{fmt}"'
+    response.vary.add('Accept-Encoding')
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _parse_limit(default: int = 20, maximum: int = 500) -> int:
+    """Reads the `limit` query parameter, clamped to [1, maximum]."""
+    limit = int(request.args.get('limit', default))
+    return max(1, min(limit, maximum))
+
+
+@app.route('/api/changes', methods=['GET'])
+@error_handler.handle_endpoint
+def get_changes():
+    """
+    Get the articles and links inserted or updated after a change cursor, oldest first
+
+    Every insert and update of an article or link is numbered by its transaction id and
+    a sequence, and returned once every transaction that began writing before it has
+    finished. Passing `next_cursor` back as `since` returns only what changed after the
+    previous page, with nothing skipped.
+
+    Query parameters:
+    - since: Cursor from an earlier response; 0 or omitted starts from the beginning (optional)
+    - limit: Maximum number of changes to return (optional, default 500, at most 5000)
+    - include_content: Return full document bodies instead of excerpts (optional)
+    """
+    since = request.args.get('since', '0').strip() or '0'
+    try:
+        since_xid, since_seq = parse_cursor(since)
+    except ValueError:
+        return jsonify({'error': 'since must be a cursor returned by this endpoint'}), 400
+    limit = _parse_limit(default=500, maximum=5000)
+    content_join = ("LEFT JOIN pdf_body b ON b.id = p.id" if include_content_requested()
+                    else "")
+    content_column = "b.content" if content_join else "p.excerpt"
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    # Each side is limited on its own (change_xid, change_seq) index before the two are
+    # merged. Rows of transactions at or above the snapshot's xmin may still have
+    # uncommitted neighbours below them in cursor order, so they wait for a later call.
+    cursor.execute(f"""
+        WITH horizon AS (SELECT pg_snapshot_xmin(pg_current_snapshot()) AS xmin)
+        SELECT change_xid::text AS change_xid, change_seq, kind, data FROM (
+            (SELECT p.change_xid, p.change_seq, 'article' AS kind, json_build_object(
+                'id', p.id,
+                'feed_title', p.feed_title,
+                'source_link', p.source_link,
+                'pdf_url', p.pdf_url,
+                'title', p.title,
+                'page_title', p.page_title,
+                'author', p.author,
+                'creation_date', p.creation_date,
+                'modification_date', p.modification_date,
+                'number_of_pages', p.number_of_pages,
+                'file_size_bytes', p.file_size_bytes,
+                'word_count', p.word_count,
+                '{'content' if content_join else 'excerpt'}', {content_column},
+                'version', p.version,
+                'duplicate_of', p.duplicate_of,
+                'date_processed', p.date_processed
+            ) AS data
+            FROM pdf_content p
+            {content_join}
+            WHERE (p.change_xid, p.change_seq) > (%(xid)s::xid8, %(seq)s)
+              AND p.change_xid < (SELECT xmin FROM horizon)
+            ORDER BY p.change_xid, p.change_seq
+            LIMIT %(limit)s)
+            UNION ALL
+            (SELECT l.change_xid, l.change_seq, 'link', json_build_object(
+                'id', l.id,
+                'feed_title', l.feed_title,
+                'link', l.link,
+                'source_url', l.source_url,
+                'is_pdf', l.is_pdf,
+                'content_type', l.content_type,
+                'first_seen', l.first_seen
+            )
+            FROM all_links l
+            WHERE (l.change_xid, l.change_seq) > (%(xid)s::xid8, %(seq)s)
+              AND l.change_xid < (SELECT xmin FROM horizon)
+            ORDER BY l.change_xid, l.change_seq
+            LIMIT %(limit)s)
+        ) changes
+        ORDER BY changes.change_xid, change_seq
+        LIMIT %(limit)s
+    """, {'xid': str(since_xid), 'seq': since_seq, 'limit': limit + 1})
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    has_more = len(rows) > limit
+    changes = [{'cursor': format_cursor(row['change_xid'], row['change_seq']),
+                'type': row['kind'], **row['data']}
+               for row in rows[:limit]]
+    return articles_response({
+        'changes': changes,
+        'next_cursor': changes[-1]['cursor'] if changes else since,
+        'has_more': has_more,
+    })
+
+
+@app.route('/api/crawl/runs', methods=['GET'])
+@error_handler.handle_endpoint
+def get_crawl_runs():
+    """
+    Get the most recent crawl runs with their run-level totals
+
+    Query parameters:
+    - limit: Maximum number of runs to return (optional, default 20)
+    """
+    limit = _parse_limit()
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute("""
+        SELECT
+            id,
+            started_at,
+            finished_at,
+            EXTRACT(EPOCH FROM (finished_at - started_at)) AS duration_seconds,
+            status,
+            feeds_total,
+            feeds_failed,
+            links_seen,
+            new_links,
+            pdfs_processed,
+            bytes_downloaded,
+            llm_calls,
+            llm_tokens,
+            pdfs_deferred,
+            failures,
+            llm_token_budget
+        FROM crawl_runs
+        ORDER BY started_at DESC
+        LIMIT %s
+    """, (limit,))
+    runs = [dict(row) for row in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+    return jsonify({'runs': runs})
+
+
+@app.route('/api/crawl/runs/<int:run_id>', methods=['GET'])
+@error_handler.handle_endpoint
+def get_crawl_run(run_id):
+    """
+    Get a single crawl run together with the per-feed results recorded for it
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute("""
+        SELECT
+            id,
+            started_at,
+            finished_at,
+            EXTRACT(EPOCH FROM (finished_at - started_at)) AS duration_seconds,
+            status,
+            feeds_total,
+            feeds_failed,
+            links_seen,
+            new_links,
+            pdfs_processed,
+            bytes_downloaded,
+            llm_calls,
+            llm_tokens,
+            pdfs_deferred,
+            failures,
+            llm_token_budget
+        FROM crawl_runs
+        WHERE id = %s
+    """, (run_id,))
+    run = cursor.fetchone()
+
+    if not run:
+        cursor.close()
+        conn.close()
+        return jsonify({'error': 'Crawl run not found'}), 404
+
+    cursor.execute("""
+        SELECT
+            id,
+            feed_title,
+            started_at,
+            finished_at,
+            EXTRACT(EPOCH FROM (finished_at - started_at)) AS duration_seconds,
+            status,
+            links_seen,
+            new_links,
+            pdfs_processed,
+            bytes_downloaded,
+            llm_calls,
+            llm_tokens,
+            pdfs_deferred,
+            failures,
+            stage_seconds,
+            error
+        FROM crawl_feed_runs
+        WHERE run_id = %s
+        ORDER BY started_at ASC
+    """, (run_id,))
+    feeds = [dict(row) for row in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+    return jsonify({'run': dict(run), 'feeds': feeds})
+
+
+@app.route('/api/crawl/runs/feed', methods=['GET'])
+@error_handler.handle_endpoint
+def get_feed_crawl_history():
+    """
+    Get the crawl history of a single feed, newest first, to spot feeds that have slowed down
+
+    Query parameters:
+    - feed_title: The feed title to report on (required)
+    - limit: Maximum number of feed runs to return (optional, default 20)
+    """
+    feed_title = request.args.get('feed_title', '').strip()
+    if not feed_title:
+        return jsonify({'error': 'feed_title parameter is required'}), 400
+    limit = _parse_limit()
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute("""
+        SELECT
+            id,
+            run_id,
+            started_at,
+            finished_at,
+            EXTRACT(EPOCH FROM (finished_at - started_at)) AS duration_seconds,
+            status,
+            links_seen,
+            new_links,
+            pdfs_processed,
+            bytes_downloaded,
+            llm_calls,
+            llm_tokens,
+            pdfs_deferred,
+            failures,
+            stage_seconds,
+            error
+        FROM crawl_feed_runs
+        WHERE feed_title = %s
+        ORDER BY started_at DESC
+        LIMIT %s
+    """, (feed_title, limit))
+    feed_runs = [dict(row) for row in cursor.fetchall()]
+
+    cursor.close()
+    conn.close()
+    return jsonify({'feed_title': feed_title, 'runs': feed_runs})
+
+
+@app.route('/api/stats', methods=['GET'])
+@error_handler.handle_endpoint
+@cached_response(defaults=lambda: {'end': date.today().isoformat()})
+def get_activity_stats():
+    """
+    Get documents, pages, bytes and new links per feed and period from the rollups the
+    crawler maintains, without scanning the stored documents
+
+    Query parameters:
+    - start: First day in YYYY-MM-DD format (optional, default 30 days before end)
+    - end: Last day in YYYY-MM-DD format (optional, default today)
+    - period: day, week or month (optional, default day)
+    - feed_title: Only report on this feed (optional)
+    """
+    period = request.args.get('period', 'day').strip().lower()
+    if period not in ROLLUP_PERIODS:
+        return jsonify({'error': f"Invalid period. Use one of {', '.join(ROLLUP_PERIODS)}."}), 400
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = (date.fromisoformat(request.args['start']) if request.args.get('start')
+                 else end - timedelta(days=29))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    feed_title = request.args.get('feed_title', '').strip()
+
+    filters, params = ["day BETWEEN %s AND %s"], [period, start, end]
+    if feed_title:
+        filters.append("feed_title = %s")
+        params.append(feed_title)
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute(f"""
+        SELECT
+            feed_title,
+            date_trunc(%s, day)::date AS period_start,
+            SUM(documents)::bigint AS documents,
+            SUM(pages)::bigint AS pages,
+            SUM(bytes)::bigint AS bytes,
+            SUM(new_links)::bigint AS new_links,
+            SUM(new_pdf_links)::bigint AS new_pdf_links
+        FROM feed_daily_stats
+        WHERE {' AND '.join(filters)}
+        GROUP BY 1, 2
+        ORDER BY 2, 1
+    """, params)
+    stats = [dict(row, period_start=row['period_start'].isoformat())
+             for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+
+    totals = {}
+    for row in stats:
+        period_totals = totals.setdefault(row['period_start'], {
+            'period_start': row['period_start'], 'documents': 0, 'pages': 0, 'bytes': 0,
+            'new_links': 0, 'new_pdf_links': 0,
+        })
+        for key in ('documents', 'pages', 'bytes', 'new_links', 'new_pdf_links'):
+            period_totals[key] += row[key]
+
+    return jsonify({
+        'period': period,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'feed_title': feed_title or None,
+        'stats': stats,
+        'totals': list(totals.values()),
+    })
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+@error_handler.handle_endpoint
+def get_cache_stats():
+    """
+    Get hit ratio and memory usage of this worker's response cache
+    """
+    return jsonify({'pid': os.getpid(), 'response_cache': response_cache.stats()})
+
+
+@app.route('/metrics', methods=['GET'])
+@error_handler.handle_endpoint
+def metrics():
+    """
+    Exposes request, database and crawler metrics in the Prometheus text format.
+
+    With METRICS_DIR set these are summed over every process sharing the directory;
+    otherwise each scrape reports the gunicorn worker that served it.
+    """
+    body = REGISTRY.render_shared(METRICS_DIR) if METRICS_DIR else REGISTRY.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 # Optional: Root Route for Basic Information
 
 
@@ -441,46 +1245,80 @@ def index():
             '/api/articles/date_range': 'Get articles by date range',
             '/api/articles': 'Get articles by source URL',
             '/api/article': 'Get article by ID',
+            '/api/article/versions': 'Get earlier versions of an article',
+            '/api/article/duplicates': 'Get the near-duplicate group of an article',
             '/api/articles/all': 'Get all articles',
             '/rss/<filename>': 'Access specific RSS feed',
             '/rss': 'List all RSS feeds',
             '/api/articles/feed': 'Get articles by feed title',
-            '/api/feeds': 'Get all feed titles'
+            '/api/export': 'Stream articles as CSV or NDJSON',
+            '/api/stream': 'Server-sent events for newly stored articles',
+            '/api/feeds': 'Get all feed titles',
+            '/api/changes': 'Get articles and links changed after a cursor',
+            '/api/crawl/runs': 'List recent crawl runs',
+            '/api/crawl/runs/<id>': 'Get a crawl run with per-feed timings',
+            '/api/crawl/runs/feed': 'Get the crawl history of a feed',
+            '/api/stats': 'Documents, pages, bytes and new links per feed and day, week or month',
+            '/api/cache/stats': 'Response cache statistics for this worker',
+            '/metrics': 'Prometheus metrics'
         }
     })
 
 
-@app.route('/api/feeds', methods=['GET'])
-@error_handler.handle_endpoint
-def get_all_feed_titles():
+_feeds_cache = {'generation': None, 'feeds': None}
+_feeds_cache_lock = threading.Lock()
+
+
+def load_feed_catalog():
     """
-    Get all unique feed titles from the all_links table
+    Returns the rows of the feeds catalog, cached in-process until the crawl
+    generation changes.
     """
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        query = """
-            SELECT DISTINCT feed_title
-            FROM all_links
-            ORDER BY feed_title ASC
-        """
+    generation = crawl_generation.current()
+    with _feeds_cache_lock:
+        if _feeds_cache['feeds'] is not None and _feeds_cache['generation'] == generation:
+            return _feeds_cache['feeds']
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=TimedDictCursor)
+    cursor.execute("""
+        SELECT
+            feed_title,
+            source_url,
+            feed_description,
+            output_filename,
+            link_count,
+            pdf_count,
+            last_crawled_at,
+            last_new_item_at
+        FROM feeds
+        ORDER BY feed_title ASC
+    """)
+    feeds = [dict(row) for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+
+    with _feeds_cache_lock:
+        _feeds_cache['generation'] = generation
+        _feeds_cache['feeds'] = feeds
+    return feeds
 
-        cursor.execute(query)
-        rows = cursor.fetchall()
 
-        feed_titles = [row['feed_title'] for row in rows]
+@app.route('/api/feeds', methods=['GET'])
+@error_handler.handle_endpoint
+def get_all_feed_titles():
+    """
+    Get all feed titles from the feeds catalog maintained by the crawler
 
-        cursor.close()
-        conn.close()
-        return jsonify({'feed_titles': feed_titles})
+    Query parameters:
+    - stats: Also return per-feed counts, crawl times and output filenames (optional)
+    """
+    feeds = load_feed_catalog()
+    feed_titles = [feed['feed_title'] for feed in feeds]
 
-    except psycopg2.Error as e:
-        logger.error(f"Database error: {e}")
-        return jsonify({'error': str(e)}), 500
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return jsonify({'error': str(e)}), 500
+    if request.args.get('stats', '').strip().lower() in ('1', 'true', 'yes'):
+        return jsonify({'feed_titles': feed_titles, 'feeds': feeds})
+    return jsonify({'feed_titles': feed_titles})
 
 
 def schedule_scraper():
@@ -524,7 +1362,7 @@ if __name__ == '__main__':
     rss_dir = 'rss'
     if not os.path.exists(rss_dir):
         os.makedirs(rss_dir)
-        logger.debug(f"Created RSS directory at {rss_dir}")
+        logger.debug("Created RSS directory at %s", rss_dir)
     
     initialize()
     logger.info("Starting server...")
@@ -0,0 +1,135 @@
+"""
+Shared fixtures for the tests.
+
+The crawl fixtures need a scratch PostgreSQL database configured through the usual
+POSTGRES_* environment variables (set POSTGRES_SSLMODE=disable for a local server);
+tests using them skip themselves when none is configured. Synthetic AgendaCenter sites
+are served on loopback and the LLM is replaced by a deterministic fake.
+"""
+import json
+import logging
+import multiprocessing
+import os
+
+import pytest
+
+from benchmarks.synthetic import FakeCleanupChain, SyntheticAgendaSite
+
+
+def _make_crawler(workdir: str, options: dict):
+    from app.scraper import WebRSSCrawler
+
+    crawler = WebRSSCrawler(
+        config_file=os.path.join(workdir, 'crawler_config.json'),
+        log_level=logging.WARNING,
+        log_file=os.path.join(workdir, 'crawler.log'),
+        rss_directory=os.path.join(workdir, 'rss'),
+        state_directory=os.path.join(workdir, 'state'),
+        archive_directory=os.path.join(workdir, 'archive'),
+        pdf_job_concurrency=options.get('pdf_job_concurrency', 2),
+    )
+    crawler.cleanup_chain = crawler.packed_cleanup_chain = FakeCleanupChain(
+        latency=options.get('llm_latency', 0.0))
+    return crawler
+
+
+def _run_worker(workdir: str, options: dict):
+    """Runs one worker until the queue drains. The target of worker processes."""
+    from app.worker import CrawlWorker
+
+    CrawlWorker(
+        _make_crawler(workdir, options),
+        poll_interval=0.2,
+        heartbeat_interval=options.get('heartbeat_interval', 1.0),
+        stale_after=options.get('stale_after', 5.0),
+    ).run(exit_when_idle=True)
+
+
+def _remove_feed(crawler, feed_title: str):
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE FROM crawl_runs WHERE id IN (
+            SELECT run_id FROM crawl_feed_runs WHERE feed_title = %s
+        )
+    """, (feed_title,))
+    cursor.execute("DELETE FROM pdf_content WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM pdf_jobs WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM all_links WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM feeds WHERE feed_title = %s", (feed_title,))
+    cursor.execute("DELETE FROM feed_daily_stats WHERE feed_title = %s", (feed_title,))
+    # Limits learned for the loopback sites' ephemeral ports are of no use afterwards
+    cursor.execute("DELETE FROM host_limits WHERE host LIKE '127.0.0.1:%%'")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+@pytest.fixture
+def agenda_sites():
+    """Starts SyntheticAgendaSites with the given arguments and stops them afterwards."""
+    started = []
+
+    def start(**kwargs) -> SyntheticAgendaSite:
+        site = SyntheticAgendaSite(**kwargs).start()
+        started.append(site)
+        return site
+
+    yield start
+    for site in started:
+        site.stop()
+
+
+@pytest.fixture
+def crawl(tmp_path):
+    """
+    Configures a crawl of {feed_title: site} in tmp_path and returns a crawler for it,
+    created with `options`. Rows of the crawled feeds are removed afterwards.
+    """
+    crawlers, feed_titles = [], []
+
+    def configure(feeds: dict, **options):
+        with open(tmp_path / 'crawler_config.json', 'w') as f:
+            json.dump([{
+                'source_url': site.index_url,
+                'feed_title': feed_title,
+                'link_selector': 'a',
+                'pdf_only': True,
+                'output_filename': f'{feed_title}.xml',
+            } for feed_title, site in feeds.items()], f)
+        feed_titles.extend(feeds)
+        crawler = _make_crawler(str(tmp_path), options)
+        crawlers.append(crawler)
+        return crawler
+
+    yield configure
+    if crawlers:
+        for feed_title in feed_titles:
+            _remove_feed(crawlers[0], feed_title)
+
+
+@pytest.fixture
+def run_workers(tmp_path):
+    """
+    Runs `count` worker processes with `options` against the crawl configured in
+    tmp_path until the queue drains, and returns their exit codes; None for a worker
+    still running after `timeout` seconds, which is then killed.
+    """
+    def run(count: int, options: dict, timeout: float = 300) -> list:
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_run_worker, args=(str(tmp_path), options))
+                     for _ in range(count)]
+        for process in processes:
+            process.start()
+        exit_codes = []
+        for process in processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+                exit_codes.append(None)
+            else:
+                exit_codes.append(process.exitcode)
+        return exit_codes
+
+    return run
@@ -0,0 +1,170 @@
+"""The per-worker response cache and crawl generation tracking."""
+import psycopg2
+import pytest
+
+from app import cache
+from app.cache import CrawlGenerationTracker, ResponseCache
+
+
+class FakeClock:
+    """Stands in for the time module so tests control time.monotonic()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeGeneration:
+    def __init__(self, generation=1):
+        self.generation = generation
+
+    def current(self):
+        return self.generation
+
+
+class FakeConnection:
+    """A connection whose crawl_state holds `generation`, or fails when it is an error."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        if isinstance(self.source.generation, Exception):
+            raise self.source.generation
+
+    def fetchone(self):
+        return (self.source.generation,)
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self, generation):
+        self.generation = generation
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def generation():
+    return FakeGeneration()
+
+
+def _lookup_and_put(response_cache, key, body=b'body'):
+    """Misses `key` and stores `body` for it, as the server's read-through does."""
+    assert response_cache.get(key) is None
+    response_cache.put(key, body, 'application/json', response_cache.current_generation)
+
+
+def test_stored_responses_are_served(clock, generation):
+    response_cache = ResponseCache(generation)
+    _lookup_and_put(response_cache, '/api/articles', b'[1, 2]')
+
+    entry = response_cache.get('/api/articles')
+    assert (entry.body, entry.mimetype) == (b'[1, 2]', 'application/json')
+    stats = response_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_ratio']) == (1, 1, 0.5)
+
+
+def test_entries_expire_after_ttl(clock, generation):
+    response_cache = ResponseCache(generation, ttl=60)
+    _lookup_and_put(response_cache, 'a')
+    clock.now += 60
+    assert response_cache.get('a') is not None
+    clock.now += 1
+    assert response_cache.get('a') is None
+    assert response_cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock, generation):
+    response_cache = ResponseCache(generation, max_entries=2)
+    _lookup_and_put(response_cache, 'a')
+    _lookup_and_put(response_cache, 'b')
+    response_cache.get('a')
+    _lookup_and_put(response_cache, 'c')
+
+    assert response_cache.get('b') is None
+    assert response_cache.get('a') is not None
+    assert response_cache.get('c') is not None
+    assert response_cache.stats()['evictions'] == 1
+
+
+def test_size_limit_counts_keys_and_bodies(clock, generation):
+    response_cache = ResponseCache(generation, max_bytes=20)
+    _lookup_and_put(response_cache, 'a', b'x' * 9)
+    _lookup_and_put(response_cache, 'b', b'x' * 9)
+    assert response_cache.stats()['bytes'] == 20
+    _lookup_and_put(response_cache, 'c', b'x' * 9)
+    assert response_cache.stats()['bytes'] == 20
+    assert response_cache.get('a') is None
+
+    # A body larger than the whole cache is not stored and evicts nothing
+    _lookup_and_put(response_cache, 'd', b'x' * 20)
+    assert response_cache.get('d') is None
+    assert response_cache.stats()['entries'] == 2
+
+
+def test_new_generation_drops_every_entry(clock, generation):
+    response_cache = ResponseCache(generation)
+    _lookup_and_put(response_cache, 'a')
+    generation.generation = 2
+
+    assert response_cache.get('a') is None
+    stats = response_cache.stats()
+    assert (stats['entries'], stats['generation'], stats['invalidations']) == (0, 2, 1)
+
+
+def test_bodies_from_a_superseded_generation_are_discarded(clock, generation):
+    response_cache = ResponseCache(generation)
+    assert response_cache.get('a') is None
+    computed_under = response_cache.current_generation
+    generation.generation = 2
+    assert response_cache.get('b') is None
+
+    response_cache.put('a', b'stale', 'application/json', computed_under)
+    assert response_cache.get('a') is None
+
+
+def test_generation_is_checked_once_per_interval(clock):
+    database = FakeDatabase(7)
+    tracker = CrawlGenerationTracker(database.connect, check_interval=5.0)
+    assert tracker.current() == 7
+
+    database.generation = 8
+    clock.now += 4
+    assert tracker.current() == 7
+    clock.now += 1
+    assert tracker.current() == 8
+    assert database.connections == 2
+
+
+def test_last_generation_is_kept_while_the_database_is_unreachable(clock):
+    database = FakeDatabase(7)
+    tracker = CrawlGenerationTracker(database.connect, check_interval=5.0)
+    assert tracker.current() == 7
+
+    database.generation = psycopg2.OperationalError('connection refused')
+    clock.now += 5
+    assert tracker.current() == 7
+    # The failed check waits a full interval before the next attempt
+    database.generation = 8
+    clock.now += 4
+    assert tracker.current() == 7
+    clock.now += 1
+    assert tracker.current() == 8
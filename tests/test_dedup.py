@@ -0,0 +1,86 @@
+"""Near-duplicate signatures and content-defined chunking."""
+import random
+
+from app.dedup import (
+    LSH_BANDS, NUM_PERM, lsh_buckets, minhash, similarity, split_chunks,
+)
+
+
+def _agenda(items: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ['council', 'motion', 'approve', 'budget', 'street', 'permit', 'zoning',
+             'hearing', 'minutes', 'contract', 'water', 'park', 'report', 'ordinance']
+    return ''.join(
+        f"{i}. {' '.join(rng.choice(words) for _ in range(rng.randint(4, 12)))}\n"
+        for i in range(1, items + 1)
+    )
+
+
+def test_split_chunks_returns_short_text_whole():
+    assert split_chunks('one line\nanother line\n', max_chars=100) == ['one line\nanother line\n']
+
+
+def test_split_chunks_covers_the_text_within_max_chars():
+    text = _agenda(300)
+    chunks = split_chunks(text, max_chars=1000)
+    assert len(chunks) > 1
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    # Chunks are cut between lines
+    assert all(chunk.endswith('\n') for chunk in chunks)
+
+
+def test_split_chunks_cuts_lines_longer_than_max_chars():
+    text = 'short\n' + 'x' * 250 + '\nend\n'
+    chunks = split_chunks(text, max_chars=100)
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
+def test_split_chunks_boundaries_follow_content():
+    text = _agenda(300)
+    revised = '0. Amended agenda, items renumbered below\n' + text
+    original_chunks = split_chunks(text, max_chars=1000)
+    revised_chunks = split_chunks(revised, max_chars=1000)
+    # An insertion at the start only changes the chunks around it
+    assert revised_chunks[-(len(original_chunks) - 1):] == original_chunks[1:]
+
+
+def test_minhash_ignores_case_punctuation_and_line_breaks():
+    signature = minhash('Approve the minutes of the March meeting.')
+    assert len(signature) == NUM_PERM
+    assert minhash('APPROVE the minutes,\nof the march meeting') == signature
+
+
+def test_minhash_of_text_without_words_is_none():
+    assert minhash('') is None
+    assert minhash(' -- \n ... ') is None
+
+
+def test_minhash_of_fewer_words_than_a_shingle():
+    assert len(minhash('Agenda')) == NUM_PERM
+
+
+def test_similarity_separates_revisions_from_other_documents():
+    text = _agenda(200)
+    lines = text.splitlines(keepends=True)
+    revision = ''.join(lines[:100] + ['100a. Added item on parking permits\n'] + lines[100:])
+    other = _agenda(200, seed=1)
+
+    assert similarity(minhash(text), minhash(text)) == 1.0
+    assert similarity(minhash(text), minhash(revision)) > 0.9
+    assert similarity(minhash(text), minhash(other)) < 0.3
+    assert similarity(minhash(text), []) == 0.0
+
+
+def test_lsh_buckets_match_for_identical_signatures():
+    signature = minhash(_agenda(50))
+    buckets = lsh_buckets(signature)
+    assert [band for band, _ in buckets] == list(range(LSH_BANDS))
+    assert lsh_buckets(list(signature)) == buckets
+    assert all(-2 ** 63 <= bucket < 2 ** 63 for _, bucket in buckets)
+    # Changing one value only changes the bucket of its band
+    changed = list(signature)
+    changed[0] += 1
+    assert lsh_buckets(changed)[1:] == buckets[1:]
+    assert lsh_buckets(changed)[0] != buckets[0]
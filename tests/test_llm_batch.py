@@ -0,0 +1,157 @@
+"""Packing of LLM cleanup requests, with fake LLM calls."""
+import pytest
+
+from app.llm_batch import (
+    CHARS_PER_TOKEN, CleanupBatcher, CleanupError, pack_sections, unpack_sections,
+)
+
+
+def _section(number: int, text: str) -> str:
+    return f"<<<SECTION {number}>>>\n{text}\n<<<END SECTION {number}>>>"
+
+
+class FakeLLM:
+    """Cleans text by upper-casing it and records the calls made."""
+
+    def __init__(self, tokens: int = 100, drop=(), fail_packed=False, fail_single=()):
+        self.tokens = tokens
+        self.drop = set(drop)
+        self.fail_packed = fail_packed
+        self.fail_single = set(fail_single)
+        self.packed_calls = []
+        self.single_calls = []
+
+    def invoke_packed(self, body: str, count: int):
+        self.packed_calls.append(count)
+        if self.fail_packed:
+            raise RuntimeError('packed call failed')
+        sections = [
+            _section(number, body.split(f"<<<SECTION {number}>>>\n")[1]
+                     .split(f"\n<<<END SECTION {number}>>>")[0].upper())
+            for number in range(1, count + 1) if number not in self.drop
+        ]
+        return '\n\n'.join(sections), self.tokens
+
+    def invoke_single(self, text: str):
+        self.single_calls.append(text)
+        if text in self.fail_single:
+            raise RuntimeError(f"single call failed for {text}")
+        return text.upper(), self.tokens
+
+
+def test_pack_sections_numbers_each_text():
+    assert pack_sections([' first ', 'second']) == (
+        _section(1, 'first') + '\n\n' + _section(2, 'second'))
+
+
+def test_unpack_sections_round_trip():
+    texts = ['first text', 'second text']
+    assert unpack_sections(pack_sections(texts), texts) == texts
+
+
+def test_unpack_sections_rejects_missing_and_empty_sections():
+    texts = ['first text', 'second text', 'third text']
+    response = _section(1, 'first text') + _section(3, '')
+    assert unpack_sections(response, texts) == ['first text', None, None]
+
+
+def test_unpack_sections_rejects_repeated_sections():
+    texts = ['first text', 'second text']
+    response = _section(1, 'first text') + _section(1, 'first again') + _section(2, 'second text')
+    assert unpack_sections(response, texts) == [None, 'second text']
+
+
+def test_unpack_sections_rejects_sections_containing_markers():
+    texts = ['first text', 'second text']
+    response = (_section(1, 'first text <<<SECTION 2>>> second text')
+                + _section(2, 'second text'))
+    assert unpack_sections(response, texts) == [None, 'second text']
+
+
+def test_unpack_sections_rejects_truncated_sections():
+    texts = ['a long paragraph of agenda text ' * 10, 'short']
+    # Markup does not count towards the cleaned length
+    response = _section(1, '<p>a long paragraph</p>') + _section(2, '<b>short</b>')
+    assert unpack_sections(response, texts) == [None, '<b>short</b>']
+
+
+def test_small_texts_share_one_packed_call():
+    llm = FakeLLM(tokens=90)
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, linger=0.01)
+    texts = ['a' * 40, 'b' * 80, 'c' * 120]
+
+    results = batcher.clean_many(texts)
+
+    assert llm.packed_calls == [3]
+    assert llm.single_calls == []
+    assert [cleaned for cleaned, _ in results] == [text.upper() for text in texts]
+    # Tokens are shared in proportion to the estimated size of each text
+    assert [used for _, used in results] == [15, 30, 44]
+
+
+def test_texts_over_half_the_budget_are_sent_alone():
+    llm = FakeLLM()
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, max_tokens=100,
+                             linger=0.01)
+    large = 'x' * (60 * CHARS_PER_TOKEN)
+
+    assert batcher.clean(large) == (large.upper(), 100)
+    assert llm.packed_calls == []
+    assert llm.single_calls == [large]
+
+
+def test_batches_are_split_by_token_budget_and_section_count():
+    llm = FakeLLM()
+    # Each text is estimated at 31 tokens, so three fit in a budget of 100
+    texts = [str(i) * (30 * CHARS_PER_TOKEN) for i in range(7)]
+
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, max_tokens=100,
+                             linger=0.01)
+    batcher.clean_many(texts)
+    assert llm.packed_calls == [3, 3]
+    assert llm.single_calls == [texts[6]]
+
+    llm.packed_calls.clear()
+    llm.single_calls.clear()
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, max_tokens=1000,
+                             max_sections=2, linger=0.01)
+    batcher.clean_many(texts)
+    assert llm.packed_calls == [2, 2, 2]
+    assert llm.single_calls == [texts[6]]
+
+
+def test_rejected_sections_fall_back_to_single_calls():
+    llm = FakeLLM(drop={2})
+    fallbacks = []
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, linger=0.01,
+                             on_fallback=fallbacks.append)
+
+    results = batcher.clean_many(['first text', 'second text', 'third text'])
+
+    assert [cleaned for cleaned, _ in results] == ['FIRST TEXT', 'SECOND TEXT', 'THIRD TEXT']
+    assert llm.single_calls == ['second text']
+    assert fallbacks == [1]
+
+
+def test_failed_packed_call_falls_back_for_every_text():
+    llm = FakeLLM(fail_packed=True)
+    fallbacks = []
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, linger=0.01,
+                             on_fallback=fallbacks.append)
+
+    results = batcher.clean_many(['first text', 'second text'])
+
+    assert results == [('FIRST TEXT', 100), ('SECOND TEXT', 100)]
+    assert fallbacks == [2]
+
+
+def test_failed_single_call_raises_with_the_tokens_used():
+    llm = FakeLLM(drop={1}, fail_single={'first text'})
+    batcher = CleanupBatcher(llm.invoke_packed, llm.invoke_single, linger=0.01)
+
+    with pytest.raises(CleanupError) as excinfo:
+        batcher.clean_many(['first text', 'second text'])
+
+    assert 'first text' in str(excinfo.value)
+    # The packed call's tokens count although one of its sections was rejected
+    assert excinfo.value.tokens == 100
@@ -0,0 +1,135 @@
+"""Per-host AIMD concurrency control."""
+import logging
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from app import throttle
+from app.throttle import HostThrottle, HostThrottled, parse_retry_after
+
+URL = 'http://agendas.example.com/doc.pdf'
+HOST = 'agendas.example.com'
+
+
+class FakeClock:
+    """Stands in for the time module so tests control time.monotonic()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(throttle, 'time', fake)
+    return fake
+
+
+def _request(host_throttle, clock, status=200, latency=0.1, headers=None):
+    with host_throttle.slot(URL) as outcome:
+        clock.now += latency
+        outcome.observe(FakeResponse(status, headers))
+    # Leave a round trip between requests, so every cut counts
+    clock.now += 2.0
+
+
+def _limit(host_throttle) -> float:
+    return host_throttle.snapshot()[HOST]['limit']
+
+
+def _interval(host_throttle) -> float:
+    return host_throttle.snapshot()[HOST]['interval']
+
+
+@pytest.fixture
+def host_throttle(clock):
+    return HostThrottle(logging.getLogger(__name__), initial_limit=2.0, min_limit=1.0,
+                        max_limit=4.0, max_wait=10.0)
+
+
+def test_healthy_responses_raise_the_limit_additively(host_throttle, clock):
+    _request(host_throttle, clock)
+    assert _limit(host_throttle) == 2.5
+    _request(host_throttle, clock)
+    assert _limit(host_throttle) == 2.9
+    for _ in range(20):
+        _request(host_throttle, clock)
+    assert _limit(host_throttle) == 4.0
+
+
+@pytest.mark.parametrize('status', [429, 503, 500])
+def test_overload_responses_halve_the_limit(host_throttle, clock, status):
+    for _ in range(10):
+        _request(host_throttle, clock)
+    _request(host_throttle, clock, status=status)
+    assert _limit(host_throttle) == 2.0
+
+
+def test_errors_within_one_round_trip_cut_once(host_throttle, clock):
+    for _ in range(10):
+        _request(host_throttle, clock)
+    for _ in range(3):
+        with host_throttle.slot(URL) as outcome:
+            outcome.observe(FakeResponse(503))
+    assert _limit(host_throttle) == 2.0
+
+
+def test_timeouts_count_as_congestion(host_throttle, clock):
+    with pytest.raises(requests.Timeout):
+        with host_throttle.slot(URL):
+            raise requests.Timeout()
+    assert _limit(host_throttle) == 1.0
+
+
+def test_requests_are_spaced_out_below_the_minimum_limit(host_throttle, clock):
+    _request(host_throttle, clock, status=429)
+    assert (_limit(host_throttle), _interval(host_throttle)) == (1.0, 0.0)
+    _request(host_throttle, clock, status=429)
+    assert (_limit(host_throttle), _interval(host_throttle)) == (1.0, 0.25)
+    _request(host_throttle, clock, status=429)
+    assert _interval(host_throttle) == 0.5
+    # Healthy responses shrink the interval before the limit grows again
+    _request(host_throttle, clock)
+    assert (_limit(host_throttle), _interval(host_throttle)) == (1.0, 0.45)
+
+
+def test_slow_first_bytes_cut_the_limit(host_throttle, clock):
+    for _ in range(10):
+        _request(host_throttle, clock, latency=0.1)
+    assert _limit(host_throttle) == 4.0
+    _request(host_throttle, clock, latency=2.0)
+    assert _limit(host_throttle) == 2.0
+
+
+def test_retry_after_blocks_the_host(host_throttle, clock):
+    _request(host_throttle, clock, status=429, headers={'Retry-After': '60'})
+    with pytest.raises(HostThrottled) as excinfo:
+        with host_throttle.slot(URL):
+            pass
+    assert excinfo.value.host == HOST
+    assert excinfo.value.retry_after == pytest.approx(58.0)
+
+    clock.now += 60
+    with host_throttle.slot(URL) as outcome:
+        outcome.observe(FakeResponse())
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+    future = datetime.now(timezone.utc) + timedelta(minutes=5)
+    assert 290 < parse_retry_after(format_datetime(future, usegmt=True)) <= 300
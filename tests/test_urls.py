@@ -0,0 +1,80 @@
+"""Link canonicalization."""
+import re
+
+import pytest
+
+from app.urls import canonicalize_url, matches_any
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM/a/b/', 'http://example.com/a/b'),
+    ('https://example.com:443/x', 'https://example.com/x'),
+    ('http://example.com:8080/x', 'http://example.com:8080/x'),
+    ('http://example.com/a/./b/../c', 'http://example.com/a/c'),
+    ('http://example.com/x#section', 'http://example.com/x'),
+    ('http://example.com', 'http://example.com/'),
+    ('http://example.com./x', 'http://example.com/x'),
+    ('http://user:pw@example.com/x', 'http://user:pw@example.com/x'),
+])
+def test_scheme_host_and_path_are_normalized(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_percent_escapes_are_normalized():
+    # Unreserved characters are decoded, reserved ones stay escaped in upper case
+    assert canonicalize_url('http://example.com/%7euser/a%2fb') == 'http://example.com/~user/a%2Fb'
+    assert canonicalize_url('http://example.com/a b') == 'http://example.com/a%20b'
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('http://[::1]:8080/x', 'http://[::1]:8080/x'),
+    ('https://[2001:DB8::1]/a/', 'https://[2001:db8::1]/a'),
+    ('http://[::1]:80/', 'http://[::1]/'),
+])
+def test_ipv6_hosts_keep_their_brackets(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_query_parameters_are_sorted_by_name_only():
+    assert (canonicalize_url('http://example.com/x?b=2&a=2&a=1')
+            == 'http://example.com/x?a=2&a=1&b=2')
+
+
+def test_bare_and_blank_parameters_stay_distinct():
+    assert canonicalize_url('http://example.com/x?foo') == 'http://example.com/x?foo'
+    assert canonicalize_url('http://example.com/x?foo=') == 'http://example.com/x?foo='
+
+
+def test_tracking_parameters_are_dropped():
+    assert (canonicalize_url('http://example.com/x?utm_source=mail&id=3&FBCLID=z')
+            == 'http://example.com/x?id=3')
+    assert canonicalize_url('http://example.com/x?utm_medium=a') == 'http://example.com/x'
+
+
+def test_query_values_are_requoted():
+    assert canonicalize_url('http://example.com/x?q=a+b') == 'http://example.com/x?q=a%20b'
+    assert canonicalize_url('http://example.com/x?a=%2F') == 'http://example.com/x?a=%2F'
+
+
+def test_relative_links_resolve_against_base():
+    assert (canonicalize_url('../doc.pdf', base='https://example.com/agendas/2024/')
+            == 'https://example.com/agendas/doc.pdf')
+
+
+@pytest.mark.parametrize('url', [
+    '', None, 'mailto:clerk@example.com', 'javascript:void(0)',
+    'ftp://example.com/x', 'http://example.com:notaport/x',
+])
+def test_uncrawlable_links_are_rejected(url):
+    assert canonicalize_url(url, base='http://example.com/') is None
+
+
+def test_bare_fragment_without_base_is_rejected():
+    assert canonicalize_url('#top') is None
+
+
+def test_matches_any():
+    patterns = [re.compile(r'/agendas/'), re.compile(r'\.pdf$')]
+    assert matches_any('http://example.com/agendas/1', patterns)
+    assert matches_any('http://example.com/x.pdf', patterns)
+    assert not matches_any('http://example.com/minutes', patterns)
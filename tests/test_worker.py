@@ -0,0 +1,124 @@
+"""
+Crawl worker tests against a real PostgreSQL database.
+
+Several `app.worker` processes share one queued crawl of synthetic sites served on
+loopback, with the LLM replaced by a deterministic fake. Needs a scratch database
+configured through the usual POSTGRES_* environment variables (set
+POSTGRES_SSLMODE=disable for a local server); skipped when none is configured.
+
+Usage:
+    python -m pytest tests
+"""
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip('psycopg2')
+pytest.importorskip('langchain_openai')
+if not os.getenv('POSTGRES_DB'):
+    pytest.skip('POSTGRES_DB is not set', allow_module_level=True)
+
+WORKERS = 2
+DOCUMENTS = 6
+OPTIONS = {
+    'llm_latency': 0.01,
+    'pdf_job_concurrency': 2,
+    'heartbeat_interval': 1.0,
+    'stale_after': 5.0,
+}
+
+
+def _generation(crawler) -> int:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT generation FROM crawl_state")
+    generation = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    return generation
+
+
+def _ledger(crawler, run_id: int) -> tuple:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT pdfs_processed, bytes_downloaded, llm_calls, llm_tokens "
+        "FROM crawl_runs WHERE id = %s",
+        (run_id,))
+    run = cursor.fetchone()
+    cursor.execute("""
+        SELECT feed_title, pdfs_processed FROM crawl_feed_runs WHERE run_id = %s
+    """, (run_id,))
+    feeds = dict(cursor.fetchall())
+    cursor.close()
+    conn.close()
+    return run, feeds
+
+
+def _queue_state(crawler, run_id: int, feed_titles: list) -> dict:
+    conn = crawler._get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT status, COUNT(*) FROM crawl_tasks WHERE run_id = %s GROUP BY status
+    """, (run_id,))
+    tasks = dict(cursor.fetchall())
+    cursor.execute("""
+        SELECT status, COUNT(*) FROM pdf_jobs WHERE feed_title = ANY(%s) GROUP BY status
+    """, (feed_titles,))
+    jobs = dict(cursor.fetchall())
+    cursor.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT (feed_title, pdf_url))
+        FROM pdf_content WHERE feed_title = ANY(%s)
+    """, (feed_titles,))
+    stored, distinct = cursor.fetchone()
+    cursor.execute("SELECT status FROM crawl_runs WHERE id = %s", (run_id,))
+    run_status = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+    return {
+        'tasks': tasks,
+        'jobs': jobs,
+        'pdfs_stored': stored,
+        'pdfs_distinct': distinct,
+        'run_status': run_status,
+    }
+
+
+def test_workers_share_a_queued_crawl(agenda_sites, crawl, run_workers):
+    suffix = uuid.uuid4().hex[:8]
+    sites = {
+        f"test-worker-{suffix}-{i}": agenda_sites(
+            documents=DOCUMENTS, pages_per_document=1, scanned_ratio=0.0, seed=i * 1000)
+        for i in range(2)
+    }
+    feed_titles = list(sites)
+    crawler = crawl(sites, **OPTIONS)
+
+    generation = _generation(crawler)
+    run_id = crawler.enqueue_crawl()
+    # Every worker exits once the queue has drained
+    assert run_workers(WORKERS, OPTIONS) == [0] * WORKERS
+
+    state = _queue_state(crawler, run_id, feed_titles)
+    run, feeds = _ledger(crawler, run_id)
+    final_generation = _generation(crawler)
+
+    expected = DOCUMENTS * len(sites)
+    assert state['pdfs_stored'] == expected
+    assert state['pdfs_distinct'] == expected
+    assert state['jobs'] == {'done': expected}
+    assert state['tasks'] == {'completed': len(sites)}
+    assert state['run_status'] == 'completed'
+
+    # PDF jobs run by workers are recorded against the feed runs that queued them
+    pdfs_processed, bytes_downloaded, llm_calls, llm_tokens = run
+    assert pdfs_processed == expected
+    assert bytes_downloaded > 0
+    assert llm_calls > 0
+    # Tokens are settled in the run row by the workers' shared budget
+    assert llm_tokens > 0
+    assert feeds == {feed_title: DOCUMENTS for feed_title in feed_titles}
+
+    # Cached API responses are invalidated by worker inserts, not only by feed crawls
+    assert final_generation > generation + len(sites)